@@ -0,0 +1,121 @@
+"""pack boards into binary
+
+Revision ID: 3b8e1f0c9a52
+Revises: 9d07abe998ed
+Create Date: 2026-10-17 10:12:31.418204
+
+"""
+import json
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e1f0c9a52'
+down_revision: Union[str, None] = '9d07abe998ed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Замороженная копия формата доски версии 1 на момент миграции:
+# [версия][размер][корабли LE][выстрелы LE], маски по (size * size + 7) // 8
+# байт, бит клетки (x, y) — x * size + y. Код приложения может меняться,
+# а миграция должна и дальше читать и писать именно этот формат.
+BOARD_FORMAT_VERSION = 1
+SHIP, HIT, MISS, WATER = "S", "X", "O", "~"
+
+
+def _encode_grid(grid) -> bytes:
+    """Доска-список списков символов в формат версии 1."""
+    size = len(grid)
+    ships = shots = 0
+    bit = 1
+    for row in grid:
+        for cell in row:
+            if cell in (SHIP, HIT):
+                ships |= bit
+            if cell in (HIT, MISS):
+                shots |= bit
+            bit <<= 1
+    length = (size * size + 7) // 8
+    return (
+        bytes((BOARD_FORMAT_VERSION, size))
+        + ships.to_bytes(length, "little")
+        + shots.to_bytes(length, "little")
+    )
+
+
+def _decode_grid(data) -> list:
+    """Формат версии 1 в доску-список списков символов."""
+    data = bytes(data)
+    if data[0] != BOARD_FORMAT_VERSION:
+        raise ValueError(f"Unsupported board format version: {data[0]}")
+    size = data[1]
+    length = (size * size + 7) // 8
+    ships = int.from_bytes(data[2 : 2 + length], "little")
+    shots = int.from_bytes(data[2 + length : 2 + 2 * length], "little")
+    grid = []
+    bit = 1
+    for _ in range(size):
+        row = []
+        for _ in range(size):
+            if shots & bit:
+                row.append(HIT if ships & bit else MISS)
+            else:
+                row.append(SHIP if ships & bit else WATER)
+            bit <<= 1
+        grid.append(row)
+    return grid
+
+
+def _convert_boards(source_type, target_type, convert) -> None:
+    """Перекодирование досок через временные колонки нового типа."""
+    op.add_column('games', sa.Column('board_player1_new', target_type, nullable=True))
+    op.add_column('games', sa.Column('board_player2_new', target_type, nullable=True))
+
+    games = sa.table(
+        'games',
+        sa.column('id', sa.Integer()),
+        sa.column('board_player1', source_type),
+        sa.column('board_player2', source_type),
+        sa.column('board_player1_new', target_type),
+        sa.column('board_player2_new', target_type),
+    )
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(games.c.id, games.c.board_player1, games.c.board_player2)
+    ).fetchall()
+    updates = [
+        {
+            'game_id': row.id,
+            'board1': convert(row.board_player1) if row.board_player1 else None,
+            'board2': convert(row.board_player2) if row.board_player2 else None,
+        }
+        for row in rows
+    ]
+    if updates:
+        connection.execute(
+            games.update()
+            .where(games.c.id == sa.bindparam('game_id'))
+            .values(
+                board_player1_new=sa.bindparam('board1'),
+                board_player2_new=sa.bindparam('board2'),
+            ),
+            updates,
+        )
+
+    op.drop_column('games', 'board_player1')
+    op.drop_column('games', 'board_player2')
+    op.alter_column('games', 'board_player1_new', new_column_name='board_player1')
+    op.alter_column('games', 'board_player2_new', new_column_name='board_player2')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _convert_boards(sa.Text(), sa.LargeBinary(), lambda text: _encode_grid(json.loads(text)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _convert_boards(sa.LargeBinary(), sa.Text(), lambda data: json.dumps(_decode_grid(data)))
@@ -0,0 +1,47 @@
+"""add user is_bot
+
+Revision ID: 4c1d7e2b9f30
+Revises: e2a9c4f61d58
+Create Date: 2026-10-17 18:42:10.264518
+
+"""
+import os
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1d7e2b9f30'
+down_revision: Union[str, None] = 'e2a9c4f61d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('is_bot', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    # Прежде бот находился по имени. Пользователь с этим именем — бот, если
+    # он ни разу не создавал игру: бот только присоединяется вторым игроком.
+    users = sa.table(
+        'users',
+        sa.column('id', sa.Integer()),
+        sa.column('username', sa.String()),
+        sa.column('is_bot', sa.Boolean()),
+    )
+    games = sa.table('games', sa.column('player1_id', sa.Integer()))
+    op.execute(
+        users.update()
+        .where(
+            users.c.username == os.getenv('BOT_USERNAME', 'bot'),
+            ~sa.exists().where(games.c.player1_id == users.c.id),
+        )
+        .values(is_bot=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'is_bot')
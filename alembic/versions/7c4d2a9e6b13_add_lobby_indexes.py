@@ -0,0 +1,41 @@
+"""add lobby indexes
+
+Revision ID: 7c4d2a9e6b13
+Revises: 3b8e1f0c9a52
+Create Date: 2026-10-17 11:02:47.903115
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4d2a9e6b13'
+down_revision: Union[str, None] = '3b8e1f0c9a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+WAITING_CONDITION = "status = 'waiting' AND player2_id IS NULL"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_games_player1_id_status', 'games', ['player1_id', 'status'], unique=False)
+    op.create_index('ix_games_player2_id_status', 'games', ['player2_id', 'status'], unique=False)
+    op.create_index(
+        'ix_games_waiting',
+        'games',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text(WAITING_CONDITION),
+        sqlite_where=sa.text(WAITING_CONDITION),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_games_waiting', table_name='games')
+    op.drop_index('ix_games_player2_id_status', table_name='games')
+    op.drop_index('ix_games_player1_id_status', table_name='games')
@@ -0,0 +1,28 @@
+"""add game version
+
+Revision ID: b5f0e3d1c7a4
+Revises: 7c4d2a9e6b13
+Create Date: 2026-10-17 12:20:05.117342
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5f0e3d1c7a4'
+down_revision: Union[str, None] = '7c4d2a9e6b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('games', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('games', 'version')
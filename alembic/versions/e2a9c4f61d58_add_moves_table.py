@@ -0,0 +1,40 @@
+"""add moves table
+
+Revision ID: e2a9c4f61d58
+Revises: b5f0e3d1c7a4
+Create Date: 2026-10-17 14:05:41.532907
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9c4f61d58'
+down_revision: Union[str, None] = 'b5f0e3d1c7a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'moves',
+        sa.Column('game_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('x', sa.SmallInteger(), nullable=False),
+        sa.Column('y', sa.SmallInteger(), nullable=False),
+        sa.Column('result', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.ForeignKeyConstraint(['player_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('game_id', 'seq')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('moves')
@@ -0,0 +1,212 @@
+# app/broadcast.py
+
+import asyncio
+import os
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional
+
+import redis.asyncio as redis
+
+from app.json_codec import dumps, loads
+
+# URL брокера для рассылки между воркерами, например redis://redis:6379/0.
+# Если не задан, сообщения доставляются только внутри процесса.
+BROADCAST_URL = os.getenv("BROADCAST_URL")
+
+# Обработчик сообщения, пришедшего от другого воркера
+RemoteHandler = Callable[[dict], Awaitable[None]]
+
+# Захват игры воркером: ключ свободен, уже наш или принадлежал воркеру,
+# который перестал отвечать (ARGV[3]). Возвращает владельца после захвата.
+CLAIM_SCRIPT = """
+local owner = redis.call('get', KEYS[1])
+if not owner or owner == ARGV[1] or owner == ARGV[3] then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return ARGV[1]
+end
+return owner
+"""
+# Освобождение игры, только если ею всё ещё владеет этот воркер
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class InProcessBroadcast:
+    """Рассылка внутри одного процесса.
+
+    Все соединения живут в ConnectionManager этого же процесса, поэтому
+    доставлять наружу нечего, а все игры принадлежат этому процессу.
+    """
+
+    origin = "local"
+
+    async def start(self, handler: RemoteHandler):
+        pass
+
+    async def publish(
+        self,
+        game_id: int,
+        message: str,
+        user_id: Optional[int] = None,
+        exclude_user: Optional[int] = None,
+    ):
+        pass
+
+    async def claim(self, game_id: int, ttl: float, stale: Optional[str] = None) -> str:
+        return self.origin
+
+    async def owner(self, game_id: int) -> Optional[str]:
+        return None
+
+    async def refresh(self, game_ids: Iterable[int], ttl: float):
+        pass
+
+    async def release(self, game_id: int):
+        pass
+
+    async def send(self, worker: str, envelope: dict) -> bool:
+        return False
+
+    async def announce(self, envelope: dict):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisBroadcast:
+    """Рассылка между воркерами через Redis pub/sub.
+
+    Каждый воркер подписан на канал всех игр, доставляет сообщение своим
+    соединениям и пропускает сообщения, которые опубликовал сам.
+
+    Игрой владеет один воркер: он держит её в памяти и выполняет её
+    действия, а владение записано в ключе с TTL, который владелец
+    продлевает. Остальные воркеры пересылают действия владельцу в его
+    личный канал. Конверт с полем kind, отличным от message, — такое
+    служебное сообщение; общие для всех воркеров (например, изменения
+    лобби) идут в канал workers.
+    """
+
+    def __init__(self, url: str, prefix: str = "battleship"):
+        self.url = url
+        self.pattern = f"{prefix}:game:*"
+        self.prefix = prefix
+        self.origin = uuid.uuid4().hex
+        self.redis = None
+        self.pubsub = None
+        self.reader: Optional[asyncio.Task] = None
+        self.claim_script = None
+        self.release_script = None
+
+    def channel(self, game_id: int) -> str:
+        return f"{self.prefix}:game:{game_id}"
+
+    def worker_channel(self, worker: str) -> str:
+        return f"{self.prefix}:worker:{worker}"
+
+    def workers_channel(self) -> str:
+        return f"{self.prefix}:workers"
+
+    def owner_key(self, game_id: int) -> str:
+        return f"{self.prefix}:owner:{game_id}"
+
+    async def start(self, handler: RemoteHandler):
+        self.redis = redis.from_url(self.url, decode_responses=True)
+        self.claim_script = self.redis.register_script(CLAIM_SCRIPT)
+        self.release_script = self.redis.register_script(RELEASE_SCRIPT)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.psubscribe(self.pattern)
+        await self.pubsub.subscribe(
+            self.worker_channel(self.origin), self.workers_channel()
+        )
+        self.reader = asyncio.create_task(self._read(handler))
+
+    async def _read(self, handler: RemoteHandler):
+        async for message in self.pubsub.listen():
+            if message["type"] not in ("message", "pmessage"):
+                continue
+            try:
+                envelope = loads(message["data"])
+                if envelope["origin"] == self.origin:
+                    continue
+                await handler(envelope)
+            except Exception as e:
+                print(f"Error handling broadcast message: {e}")
+
+    async def publish(
+        self,
+        game_id: int,
+        message: str,
+        user_id: Optional[int] = None,
+        exclude_user: Optional[int] = None,
+    ):
+        envelope = {
+            "origin": self.origin,
+            "kind": "message",
+            "game_id": game_id,
+            "user_id": user_id,
+            "exclude_user": exclude_user,
+            "message": message,
+        }
+        try:
+            await self.redis.publish(self.channel(game_id), dumps(envelope))
+        except Exception as e:
+            print(f"Error publishing to game {game_id}: {e}")
+
+    async def claim(self, game_id: int, ttl: float, stale: Optional[str] = None) -> str:
+        """Захват или продление владения игрой; возвращает владельца.
+
+        stale — воркер, который не принял пересланное действие: его
+        владение можно перехватить, не дожидаясь TTL.
+        """
+        return await self.claim_script(
+            keys=[self.owner_key(game_id)], args=[self.origin, int(ttl), stale or ""]
+        )
+
+    async def owner(self, game_id: int) -> Optional[str]:
+        return await self.redis.get(self.owner_key(game_id))
+
+    async def refresh(self, game_ids: Iterable[int], ttl: float):
+        """Продление владения играми, загруженными в этот воркер."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for game_id in game_ids:
+                await self.claim_script(
+                    keys=[self.owner_key(game_id)], args=[self.origin, int(ttl), ""], client=pipe
+                )
+            await pipe.execute()
+
+    async def release(self, game_id: int):
+        try:
+            await self.release_script(keys=[self.owner_key(game_id)], args=[self.origin])
+        except Exception as e:
+            print(f"Error releasing game {game_id}: {e}")
+
+    async def send(self, worker: str, envelope: dict) -> bool:
+        """Служебное сообщение одному воркеру. False, если его никто не принял."""
+        envelope = {**envelope, "origin": self.origin}
+        return await self.redis.publish(self.worker_channel(worker), dumps(envelope)) > 0
+
+    async def announce(self, envelope: dict):
+        """Служебное сообщение всем остальным воркерам."""
+        envelope = {**envelope, "origin": self.origin}
+        await self.redis.publish(self.workers_channel(), dumps(envelope))
+
+    async def stop(self):
+        if self.reader is not None:
+            self.reader.cancel()
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+def create_broadcast_backend(url: Optional[str] = BROADCAST_URL):
+    """Выбор реализации рассылки по настройкам."""
+    if url:
+        return RedisBroadcast(url)
+    return InProcessBroadcast()
@@ -0,0 +1,196 @@
+# app/game_logic/bitboard.py
+
+from functools import lru_cache
+
+BOARD_SIZE = 10
+
+# Символы клеток в табличном представлении доски
+WATER = "~"
+SHIP = "S"
+HIT = "X"
+MISS = "O"
+
+
+def cell_bit(x, y, size=BOARD_SIZE):
+    """Бит клетки (x, y): строка x, столбец y."""
+    return 1 << (x * size + y)
+
+
+@lru_cache(maxsize=16)
+def _board_masks(size):
+    """Маска всего поля и маски первого и последнего столбцов."""
+    full = (1 << (size * size)) - 1
+    first_col = 0
+    for x in range(size):
+        first_col |= cell_bit(x, 0, size)
+    last_col = first_col << (size - 1)
+    return full, first_col, last_col
+
+
+def dilate(mask, size=BOARD_SIZE):
+    """Расширение маски на все соседние клетки, включая диагонали."""
+    full, first_col, last_col = _board_masks(size)
+    row = (mask | ((mask << 1) & ~first_col) | ((mask >> 1) & ~last_col)) & full
+    return (row | (row << size) | (row >> size)) & full
+
+
+def ship_masks(x, y, ship_size, orientation, size=BOARD_SIZE):
+    """Маска клеток корабля и маска клеток вокруг него.
+
+    Возвращает None, если корабль выходит за границы поля. Границы
+    проверяются до обращения к кэшу: координаты приходят от клиента,
+    и в кэш попадают только допустимые размещения.
+    """
+    if not (isinstance(x, int) and isinstance(y, int) and isinstance(ship_size, int)):
+        return None
+    if x < 0 or y < 0 or ship_size < 1:
+        return None
+    if orientation == "horizontal":
+        if x >= size or y + ship_size > size:
+            return None
+    elif orientation == "vertical":
+        if y >= size or x + ship_size > size:
+            return None
+    else:
+        return None
+    return _ship_masks(x, y, ship_size, orientation == "horizontal", size)
+
+
+# Все размещения на поле 10x10 — 2 * 10 * 10 * 10 = 2000 вариантов
+@lru_cache(maxsize=4096)
+def _ship_masks(x, y, ship_size, horizontal, size):
+    mask = 0
+    for i in range(ship_size):
+        mask |= cell_bit(x, y + i, size) if horizontal else cell_bit(x + i, y, size)
+    return mask, dilate(mask, size)
+
+
+class Bitboard:
+    """Игровое поле в виде битовых масок.
+
+    ships — все клетки кораблей (включая подбитые), hits — попадания,
+    misses — промахи. Клетка поля с индексом x * size + y соответствует
+    одному биту в каждой маске.
+    """
+
+    __slots__ = ("size", "ships", "hits", "misses")
+
+    def __init__(self, size=BOARD_SIZE, ships=0, hits=0, misses=0):
+        self.size = size
+        self.ships = ships
+        self.hits = hits
+        self.misses = misses
+
+    def __len__(self):
+        return self.size
+
+    def __eq__(self, other):
+        if not isinstance(other, Bitboard):
+            return NotImplemented
+        return (self.size, self.ships, self.hits, self.misses) == (
+            other.size,
+            other.ships,
+            other.hits,
+            other.misses,
+        )
+
+    def __repr__(self):
+        return (
+            f"<Bitboard(size={self.size}, ships={self.ships:#x}, "
+            f"hits={self.hits:#x}, misses={self.misses:#x})>"
+        )
+
+    @property
+    def afloat(self):
+        """Неподбитые клетки кораблей."""
+        return self.ships & ~self.hits
+
+    def copy(self):
+        return Bitboard(self.size, self.ships, self.hits, self.misses)
+
+    def can_place_ship(self, x, y, ship_size, orientation):
+        """Проверка размещения корабля: клетки свободны, соседние без кораблей."""
+        masks = ship_masks(x, y, ship_size, orientation, self.size)
+        if masks is None:
+            return False
+        mask, halo = masks
+        if mask & (self.ships | self.misses):
+            return False
+        return not halo & self.afloat
+
+    def place_ship(self, x, y, ship_size, orientation):
+        """Размещение корабля без проверок."""
+        masks = ship_masks(x, y, ship_size, orientation, self.size)
+        if masks is not None:
+            self.ships |= masks[0]
+
+    def shoot(self, x, y):
+        """Выстрел по клетке: hit, miss, already_hit или invalid."""
+        if x < 0 or x >= self.size or y < 0 or y >= self.size:
+            return "invalid"
+
+        bit = cell_bit(x, y, self.size)
+        if (self.hits | self.misses) & bit:
+            return "already_hit"
+        if self.ships & bit:
+            self.hits |= bit
+            return "hit"
+        self.misses |= bit
+        return "miss"
+
+    def all_sunk(self):
+        """Все корабли уничтожены."""
+        return not self.afloat
+
+    def cell(self, x, y):
+        """Символ клетки в табличном представлении."""
+        bit = cell_bit(x, y, self.size)
+        if self.hits & bit:
+            return HIT
+        if self.misses & bit:
+            return MISS
+        if self.ships & bit:
+            return SHIP
+        return WATER
+
+    def to_grid(self, hide_ships=False):
+        """Преобразование в список списков символов.
+
+        hide_ships скрывает неподбитые корабли (вид доски для соперника).
+        """
+        size = self.size
+        ships = 0 if hide_ships else self.ships
+        hits, misses = self.hits, self.misses
+        grid = []
+        bit = 1
+        for _ in range(size):
+            row = []
+            for _ in range(size):
+                if hits & bit:
+                    row.append(HIT)
+                elif misses & bit:
+                    row.append(MISS)
+                elif ships & bit:
+                    row.append(SHIP)
+                else:
+                    row.append(WATER)
+                bit <<= 1
+            grid.append(row)
+        return grid
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Создание битового поля из списка списков символов."""
+        board = cls(len(grid))
+        bit = 1
+        for row in grid:
+            for cell in row:
+                if cell == SHIP:
+                    board.ships |= bit
+                elif cell == HIT:
+                    board.ships |= bit
+                    board.hits |= bit
+                elif cell == MISS:
+                    board.misses |= bit
+                bit <<= 1
+        return board
@@ -1,6 +1,7 @@
 # app/game_logic/board.py
 
-import random
+from app.game_logic.bitboard import Bitboard
+from app.game_logic.fleet import FLEET, random_layout
 
 
 def generate_board(size=10):
@@ -8,24 +9,28 @@ def generate_board(size=10):
     return [["~" for _ in range(size)] for _ in range(size)]
 
 
-def place_ships_auto(board, ships=[4, 3, 3, 2, 2, 2, 1, 1, 1, 1]):
-    """Автоматическое размещение кораблей на поле."""
-    for ship_size in ships:
-        placed = False
-        attempts = 0
-        while not placed and attempts < 100:  # Ограничиваем количество попыток
-            orientation = random.choice(["horizontal", "vertical"])
-            x, y = random.randint(0, len(board) - 1), random.randint(0, len(board) - 1)
+def generate_bitboard(size=10):
+    """Генерация пустого игрового поля в виде битовых масок."""
+    return Bitboard(size)
 
-            if can_place_ship(board, x, y, ship_size, orientation):
-                place_ship_on_board(board, x, y, ship_size, orientation)
-                placed = True
-            attempts += 1
 
-        if not placed:
-            # Если не удалось разместить корабль, возвращаем новую доску
-            return place_ships_auto(generate_board())
+def place_ships_auto(board, ships=FLEET, rng=None):
+    """Автоматическое размещение кораблей на поле.
 
+    Уже стоящие корабли учитываются; если флот не помещается, корабли
+    расставляются на новой пустой доске того же вида. Если флот не
+    помещается и на пустую доску — ValueError.
+    """
+    occupied = board.ships if isinstance(board, Bitboard) else Bitboard.from_grid(board).ships
+    layout = random_layout(ships, len(board), rng, occupied)
+    if layout is None and occupied:
+        board = generate_bitboard(len(board)) if isinstance(board, Bitboard) else generate_board(len(board))
+        layout = random_layout(ships, len(board), rng)
+    if layout is None:
+        raise ValueError("Fleet does not fit on the board")
+
+    for ship_size, orientation, x, y in layout:
+        place_ship_on_board(board, x, y, ship_size, orientation)
     return board
 
 
@@ -39,6 +44,9 @@ def place_ship_manual(board, x, y, size, orientation):
 
 def can_place_ship(board, x, y, size, orientation):
     """Проверка, можно ли разместить корабль на поле."""
+    if isinstance(board, Bitboard):
+        return board.can_place_ship(x, y, size, orientation)
+
     board_size = len(board)
 
     # Проверяем границы
@@ -72,6 +80,10 @@ def can_place_ship(board, x, y, size, orientation):
 
 def place_ship_on_board(board, x, y, size, orientation):
     """Размещение корабля на доске."""
+    if isinstance(board, Bitboard):
+        board.place_ship(x, y, size, orientation)
+        return
+
     if orientation == "horizontal":
         for i in range(size):
             board[x][y + i] = "S"
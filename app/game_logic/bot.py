@@ -0,0 +1,257 @@
+# app/game_logic/bot.py
+
+import asyncio
+import os
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.game_logic.bitboard import BOARD_SIZE, Bitboard, dilate
+from app.game_logic.fleet import FLEET, placements
+
+# Потоки для расчёта ходов ботов, чтобы не занимать цикл событий
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "2"))
+
+bot_executor = ThreadPoolExecutor(max_workers=BOT_WORKERS, thread_name_prefix="bot")
+
+
+def _bits(mask: int):
+    """Номера установленных битов маски."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@lru_cache(maxsize=None)
+def _placement_cells(ship_size: int, size: int):
+    """Клетки каждой позиции корабля и позиции, проходящие через каждую клетку."""
+    cells = [tuple(_bits(mask)) for mask, *_ in placements(ship_size, size)]
+    by_cell: List[List[int]] = [[] for _ in range(size * size)]
+    for index, placement_cells in enumerate(cells):
+        for cell in placement_cells:
+            by_cell[cell].append(index)
+    return cells, by_cell
+
+
+class ProbabilityMap:
+    """Карта плотности: сколько возможных позиций оставшихся кораблей
+    проходит через каждую клетку.
+
+    Карта обновляется после каждого выстрела: удаляются только позиции,
+    проходящие через клетку, где корабля точно нет.
+    """
+
+    def __init__(self, ships=FLEET, size: int = BOARD_SIZE):
+        self.size = size
+        self.remaining = Counter(ships)
+        self.alive: Dict[int, Set[int]] = {}
+        self.counts = [0] * (size * size)
+        for ship_size, number in self.remaining.items():
+            cells, _ = _placement_cells(ship_size, size)
+            self.alive[ship_size] = set(range(len(cells)))
+            for placement_cells in cells:
+                for cell in placement_cells:
+                    self.counts[cell] += number
+
+    def exclude(self, cell: int):
+        """В клетке нет корабля: убираем проходящие через неё позиции."""
+        for ship_size, alive in self.alive.items():
+            cells, by_cell = _placement_cells(ship_size, self.size)
+            number = self.remaining[ship_size]
+            for index in by_cell[cell]:
+                if index in alive:
+                    alive.remove(index)
+                    for other in cells[index]:
+                        self.counts[other] -= number
+
+    def sink(self, ship: int):
+        """Корабль потоплен: минус один корабль его размера, вокруг пусто."""
+        ship_size = bin(ship).count("1")
+        if self.remaining[ship_size] > 0:
+            cells, _ = _placement_cells(ship_size, self.size)
+            for index in self.alive[ship_size]:
+                for cell in cells[index]:
+                    self.counts[cell] -= 1
+            self.remaining[ship_size] -= 1
+
+        for cell in _bits(dilate(ship, self.size)):
+            self.exclude(cell)
+
+    def target_scores(self, open_hits: Set[int], shots: int) -> Dict[int, int]:
+        """Оценки клеток рядом с подбитыми, но не потопленными кораблями.
+
+        Учитываются только позиции через подбитые клетки; чем больше
+        попаданий покрывает позиция, тем она вероятнее.
+        """
+        scores: Dict[int, int] = {}
+        for ship_size, alive in self.alive.items():
+            number = self.remaining[ship_size]
+            if not number:
+                continue
+            cells, by_cell = _placement_cells(ship_size, self.size)
+            seen = set()
+            for hit in open_hits:
+                for index in by_cell[hit]:
+                    if index not in alive or index in seen:
+                        continue
+                    seen.add(index)
+                    covered = sum(1 for cell in cells[index] if cell in open_hits)
+                    weight = number * covered * covered
+                    for cell in cells[index]:
+                        if not shots >> cell & 1:
+                            scores[cell] = scores.get(cell, 0) + weight
+        return scores
+
+
+def opponent_view(board: Bitboard) -> Bitboard:
+    """Доска соперника глазами игрока: только попадания и промахи."""
+    return Bitboard(board.size, ships=board.hits, hits=board.hits, misses=board.misses)
+
+
+class BotPlayer:
+    """Бот: добивает подбитые корабли, иначе стреляет в самую вероятную клетку.
+
+    Бот видит только выстрелы по доске соперника — то же, что видит игрок.
+    Потопленные корабли он выводит сам из попаданий и промахов.
+    """
+
+    def __init__(self, user_id: int, size: int = BOARD_SIZE, seed: Optional[int] = None):
+        self.user_id = user_id
+        self.rng = random.Random(seed)
+        self.map = ProbabilityMap(size=size)
+        self.shots = 0
+        # Клетки, где корабля точно нет: промахи и соседи потопленных кораблей
+        self.water = 0
+        self.open_hits: Set[int] = set()
+        # Флот расставлен
+        self.prepared = False
+        # Future хода: создаётся при запуске расчёта и завершается, когда
+        # ход выполнен или отброшен
+        self.pending: Optional[asyncio.Future] = None
+
+    @property
+    def busy(self) -> bool:
+        """Ход рассчитывается или ждёт в очереди актора."""
+        return self.pending is not None and not self.pending.done()
+
+    def observe(self, board: Bitboard):
+        """Учёт новых выстрелов по доске соперника.
+
+        Читаются только попадания и промахи, корабли соперника бот не видит.
+        """
+        new_shots = (board.hits | board.misses) & ~self.shots
+        if not new_shots:
+            return
+        self.shots |= new_shots
+        size = board.size
+
+        for cell in _bits(new_shots):
+            if board.hits >> cell & 1:
+                self.open_hits.add(cell)
+                # Корабли прямые и не касаются друг друга: по диагоналям
+                # от попадания кораблей нет
+                x, y = divmod(cell, size)
+                for nx, ny in ((x - 1, y - 1), (x - 1, y + 1), (x + 1, y - 1), (x + 1, y + 1)):
+                    if 0 <= nx < size and 0 <= ny < size:
+                        self._mark_water(nx * size + ny)
+            else:
+                self._mark_water(cell)
+
+        for ship in self._sunk_ships(size):
+            self.map.sink(ship)
+            self.water |= dilate(ship, size)
+            self.open_hits.difference_update(_bits(ship))
+
+    def _mark_water(self, cell: int):
+        if not self.water >> cell & 1:
+            self.water |= 1 << cell
+            self.map.exclude(cell)
+
+    def _sunk_ships(self, size: int) -> List[int]:
+        """Маски подбитых кораблей, которые точно потоплены.
+
+        Цепочка соседних попаданий — один корабль. Он потоплен, если его
+        длина равна длине самого большого из оставшихся кораблей или
+        продолжить цепочку некуда: за её концами край поля или вода.
+        """
+        sunk = []
+        seen: Set[int] = set()
+        largest = max((ship for ship, number in self.map.remaining.items() if number), default=0)
+        for start in self.open_hits:
+            if start in seen:
+                continue
+            chain = {start}
+            stack = [start]
+            while stack:
+                x, y = divmod(stack.pop(), size)
+                for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                    if not (0 <= nx < size and 0 <= ny < size):
+                        continue
+                    cell = nx * size + ny
+                    if cell in self.open_hits and cell not in chain:
+                        chain.add(cell)
+                        stack.append(cell)
+            seen |= chain
+
+            if len(chain) < largest and self._can_extend(chain, size):
+                continue
+            sunk.append(sum(1 << cell for cell in chain))
+        return sunk
+
+    def _can_extend(self, chain: Set[int], size: int) -> bool:
+        """Может ли корабль продолжаться за концами цепочки попаданий."""
+        rows = {cell // size for cell in chain}
+        cols = {cell % size for cell in chain}
+        ends = []
+        if len(chain) == 1 or len(rows) == 1:
+            row = next(iter(rows))
+            ends += [(row, min(cols) - 1), (row, max(cols) + 1)]
+        if len(chain) == 1 or len(cols) == 1:
+            col = next(iter(cols))
+            ends += [(min(rows) - 1, col), (max(rows) + 1, col)]
+        known = self.shots | self.water
+        return any(
+            0 <= x < size and 0 <= y < size and not known >> (x * size + y) & 1
+            for x, y in ends
+        )
+
+    def choose_shot(self, board: Bitboard) -> Tuple[int, int]:
+        """Следующий выстрел по доске соперника (x, y)."""
+        self.observe(board)
+
+        scores = None
+        if self.open_hits:
+            scores = self.map.target_scores(self.open_hits, self.shots)
+        if not scores:
+            scores = {
+                cell: count
+                for cell, count in enumerate(self.map.counts)
+                if not self.shots >> cell & 1
+            }
+
+        best = max(scores.values())
+        candidates = [cell for cell, score in scores.items() if score == best]
+        return divmod(self.rng.choice(candidates), board.size)
+
+
+class GameBots:
+    """Боты, играющие в играх этого процесса."""
+
+    def __init__(self):
+        self.bots: Dict[int, List[BotPlayer]] = {}
+
+    def add(self, game_id: int, bot: BotPlayer):
+        self.bots.setdefault(game_id, []).append(bot)
+
+    def of(self, game_id: int) -> List[BotPlayer]:
+        return self.bots.get(game_id, [])
+
+    def remove(self, game_id: int):
+        self.bots.pop(game_id, None)
+
+
+game_bots = GameBots()
+
@@ -0,0 +1,663 @@
+# app/game_logic/engine.py
+
+import asyncio
+import os
+import secrets
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, cast, column, insert, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.game_logic.bitboard import Bitboard
+from app.game_logic.board import generate_bitboard, place_ship_manual
+from app.game_logic.fleet import random_bitboard
+from app.game_logic.replay import (MoveRecord, apply_moves, load_moves,
+                                   shot_count)
+from app.game_logic.utils import (check_winner, decode_board, make_move,
+                                  serialize_board)
+from app.json_codec import dumps
+from app.models import Game, Move
+
+# Статусы, в которых ещё идёт расстановка кораблей
+SETUP_STATUSES = ("waiting", "setup", "player1_ready", "player2_ready")
+
+# Сколько последних событий игры хранится для досылки отставшим клиентам
+EVENT_LOG_SIZE = 128
+# Если клиент пропустил больше событий, ему выгоднее отправить снимок
+RESYNC_MAX_EVENTS = 64
+# Сколько раз повторять действие при конфликте версий строки игры
+CONFLICT_RETRIES = 3
+# Интервал фоновой записи изменённых игр (секунды) и размер пачки,
+# при котором запись запускается досрочно
+FLUSH_INTERVAL = float(os.getenv("GAME_FLUSH_INTERVAL", "0.5"))
+FLUSH_BATCH_SIZE = int(os.getenv("GAME_FLUSH_BATCH_SIZE", "200"))
+
+
+class StaleGameError(Exception):
+    """Строку игры в базе изменил кто-то другой (версия не совпала)."""
+
+
+def _load_board(board_data) -> Bitboard:
+    """Декодирование сохранённой доски в битовое поле."""
+    return decode_board(board_data) or generate_bitboard()
+
+
+class LiveGame:
+    """Состояние активной игры, которое живёт в памяти процесса.
+
+    Пока игра загружена в движок, именно этот объект является источником
+    истины: обработчики WebSocket читают и меняют его, а в базу данных
+    изменения пишутся пачками в фоне и сразу — в конце игры и при уходе
+    последнего игрока.
+
+    Ходы пишутся в журнал moves. Пока идёт игра, доски в пачках не
+    переписываются: при загрузке их догоняют ходы из журнала.
+
+    version — версия строки в базе, по ней сохранение работает как
+    compare-and-swap. revision считает изменения в памяти, чтобы изменения,
+    сделанные во время записи, не терялись. Действия, ещё не записанные в
+    базу, хранятся в unflushed: при конфликте версий они повторяются
+    поверх перечитанного состояния, а не отбрасываются.
+    """
+
+    def __init__(
+        self,
+        game_id: int,
+        player1_id: int,
+        player2_id: Optional[int],
+        status: str,
+        turn: Optional[int],
+        winner_id: Optional[int],
+        board_player1,
+        board_player2,
+        version: int = 1,
+    ):
+        self.id = game_id
+        self.player1_id = player1_id
+        self.player2_id = player2_id
+        self.status = status
+        self.turn = turn
+        self.winner_id = winner_id
+        self.board_player1 = board_player1
+        self.board_player2 = board_player2
+        self.version = version
+        self.revision = 0
+        self.flushed_revision = 0
+        # Сериализует изменения с сохранением внутри процесса
+        self.lock = asyncio.Lock()
+        # Номер последнего события игры и журнал событий для досылки.
+        # Журнал живёт только в памяти и нумеруется заново при каждой
+        # загрузке игры, поэтому номер имеет смысл только вместе с эпохой
+        self.seq = 0
+        self.epoch = secrets.randbits(32)
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+        # Закодированные снимки состояния по ролям зрителей; сбрасываются
+        # при любом изменении игры
+        self.payloads: Dict[Hashable, str] = {}
+        # Номер последнего хода и ходы, ещё не записанные в журнал
+        self.move_seq = shot_count(board_player1, board_player2)
+        self.moves: List[MoveRecord] = []
+        # Расстановка изменилась и доски нужно записать целиком
+        self.boards_changed = False
+        # Незаписанные действия: (revision после действия, действие)
+        self.unflushed: List[Tuple[int, Callable]] = []
+
+    @classmethod
+    def from_model(cls, game: Game) -> "LiveGame":
+        """Создание живой игры из строки таблицы games."""
+        live = cls(
+            game_id=game.id,
+            player1_id=game.player1_id,
+            player2_id=game.player2_id,
+            status=game.status,
+            turn=game.turn,
+            winner_id=game.winner_id,
+            board_player1=_load_board(game.board_player1),
+            board_player2=_load_board(game.board_player2),
+            version=game.version,
+        )
+        # Новые доски ещё не записаны в базу
+        if not (game.board_player1 and game.board_player2):
+            live.boards_changed = True
+            live.touch()
+        return live
+
+    @property
+    def dirty(self) -> bool:
+        return self.revision != self.flushed_revision
+
+    def touch(self):
+        """Отметка изменения состояния в памяти."""
+        self.revision += 1
+        self.payloads.clear()
+
+    def cached_payload(self, role: Hashable, build: Callable[[], dict]) -> str:
+        """Снимок состояния для роли, закодированный один раз до изменения игры."""
+        payload = self.payloads.get(role)
+        if payload is None:
+            payload = self.payloads[role] = dumps(build())
+        return payload
+
+    def column_values(self, boards: bool = True) -> dict:
+        """Значения колонок таблицы games для сохранения."""
+        values = {
+            "player2_id": self.player2_id,
+            "status": self.status,
+            "turn": self.turn,
+            "winner_id": self.winner_id,
+        }
+        if boards:
+            values["board_player1"] = serialize_board(self.board_player1)
+            values["board_player2"] = serialize_board(self.board_player2)
+        return values
+
+    def catch_up(self, moves: List[MoveRecord]):
+        """Применение ходов из журнала, которых нет в сохранённых досках."""
+        if moves:
+            apply_moves(self.board_player1, self.board_player2, self.player1_id, moves)
+            self.move_seq = moves[-1].seq
+
+    def reload_from(self, game: Game):
+        """Замена состояния данными из базы после конфликта версий.
+
+        Незаписанные действия остаются в unflushed, их повторяет движок.
+        """
+        self.player2_id = game.player2_id
+        self.status = game.status
+        self.turn = game.turn
+        self.winner_id = game.winner_id
+        self.board_player1 = _load_board(game.board_player1)
+        self.board_player2 = _load_board(game.board_player2)
+        self.version = game.version
+        self.flushed_revision = self.revision
+        self.move_seq = shot_count(self.board_player1, self.board_player2)
+        self.moves.clear()
+        self.boards_changed = False
+        self.payloads.clear()
+        # Доски, которых ещё нет в базе, созданы заново и требуют записи
+        if not (game.board_player1 and game.board_player2):
+            self.boards_changed = True
+            self.touch()
+
+    def sync_players(self, game: Game):
+        """Подтягивание изменений, сделанных вне движка (присоединение игрока)."""
+        self.player2_id = game.player2_id
+        self.status = game.status
+        self.turn = game.turn
+        self.version = game.version
+        self.payloads.clear()
+
+    def record_event(self, event: dict, visible_to: Optional[int] = None) -> str:
+        """Присвоение событию номера и запись в журнал.
+
+        Возвращает JSON-строку события, чтобы она кодировалась один раз и
+        для рассылки, и для досылки. visible_to ограничивает получателей
+        одним игроком (например, расстановка своих кораблей).
+        """
+        self.seq += 1
+        event["seq"] = self.seq
+        event["epoch"] = self.epoch
+        encoded = dumps(event)
+        # Номер события входит в снимки состояния
+        self.payloads.clear()
+        self.events.append((self.seq, visible_to, encoded))
+        return encoded
+
+    def events_since(
+        self, since: int, user_id: Optional[int], epoch: Optional[int]
+    ) -> Optional[List[str]]:
+        """События после номера since эпохи epoch, видимые игроку.
+
+        None означает, что клиент отстал слишком сильно (или номер ему
+        неизвестен, в том числе из другой загрузки игры) и нужен полный
+        снимок состояния.
+        """
+        if epoch != self.epoch:
+            return None
+        if since > self.seq or self.seq - since > RESYNC_MAX_EVENTS:
+            return None
+        if self.seq > since and (not self.events or self.events[0][0] > since + 1):
+            return None
+
+        return [
+            encoded
+            for seq, visible_to, encoded in self.events
+            if seq > since and visible_to in (None, user_id)
+        ]
+
+    def is_participant(self, user_id: int) -> bool:
+        return user_id in (self.player1_id, self.player2_id)
+
+    def board_of(self, user_id: int) -> Bitboard:
+        """Доска игрока."""
+        if user_id == self.player1_id:
+            return self.board_player1
+        return self.board_player2
+
+    def opponent_of(self, user_id: int) -> Optional[int]:
+        """Идентификатор соперника."""
+        if user_id == self.player1_id:
+            return self.player2_id
+        return self.player1_id
+
+    def is_ready(self, user_id: int) -> bool:
+        """Подтвердил ли игрок готовность."""
+        if user_id == self.player1_id:
+            return self.status == "player1_ready"
+        return self.status == "player2_ready"
+
+    def place_ship(self, user_id: int, x: int, y: int, size: int, orientation: str):
+        """Размещение корабля игрока."""
+        if self.status not in SETUP_STATUSES or self.is_ready(user_id):
+            raise ValueError("Cannot place ships in current game state")
+
+        if not place_ship_manual(self.board_of(user_id), x, y, size, orientation):
+            raise ValueError("Invalid ship placement")
+
+        self.boards_changed = True
+        self.touch()
+
+    def randomize_fleet(self, user_id: int, rng=None):
+        """Случайная расстановка всего флота игрока вместо текущей."""
+        if self.status not in SETUP_STATUSES or self.is_ready(user_id):
+            raise ValueError("Cannot place ships in current game state")
+
+        board = self.board_of(user_id)
+        board.ships = random_bitboard(size=board.size, rng=rng).ships
+        self.boards_changed = True
+        self.touch()
+
+    def set_ready(self, user_id: int):
+        """Отметка готовности игрока. Если готовы оба, игра начинается."""
+        if self.status not in SETUP_STATUSES[1:]:
+            raise ValueError("Cannot set ready in current game state")
+
+        if self.is_ready(user_id):
+            return
+
+        if self.status == "setup":
+            if user_id == self.player1_id:
+                self.status = "player1_ready"
+            else:
+                self.status = "player2_ready"
+        else:
+            self.status = "both_ready"
+
+        # Если оба игрока готовы, начинаем игру
+        if self.status == "both_ready":
+            self.status = "in_progress"
+            self.turn = self.player1_id  # Первый игрок начинает
+
+        self.touch()
+
+    def make_move(self, user_id: int, x: int, y: int) -> str:
+        """Выстрел по доске соперника. Возвращает hit или miss."""
+        if self.status != "in_progress":
+            raise ValueError("Game is not in progress")
+
+        if self.turn != user_id:
+            raise ValueError("Not your turn")
+
+        opponent_id = self.opponent_of(user_id)
+        opponent_board = self.board_of(opponent_id)
+
+        result = make_move(opponent_board, x, y)
+        if result == "invalid":
+            raise ValueError("Invalid move coordinates")
+        if result == "already_hit":
+            raise ValueError("Cell already hit")
+
+        if check_winner(opponent_board):
+            self.status = "finished"
+            self.winner_id = user_id
+        elif result == "miss":
+            # Передаем ход, если промах и игра не закончена
+            self.turn = opponent_id
+
+        self.move_seq += 1
+        self.moves.append(
+            MoveRecord(
+                self.move_seq, user_id, x, y, result, datetime.now(timezone.utc)
+            )
+        )
+        self.touch()
+        return result
+
+
+class GameEngine:
+    """Реестр живых игр процесса с отложенной записью в базу данных.
+
+    Изменённые игры копятся в pending и записываются фоновой задачей
+    раз в FLUSH_INTERVAL или при накоплении FLUSH_BATCH_SIZE игр: одним
+    многострочным UPDATE и одним коммитом на пачку. Поэтому число
+    коммитов зависит от числа тактов записи, а не от числа ходов.
+    """
+
+    def __init__(self):
+        self.games: Dict[int, LiveGame] = {}
+        self.pending: Dict[int, LiveGame] = {}
+        self.session_factory = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.flusher: Optional[asyncio.Task] = None
+        self.conflict_listeners: List[Callable[[LiveGame], None]] = []
+        # Счётчики для метрик: такты записи (коммиты) и записанные игры
+        self.flush_ticks = 0
+        self.flushed_games = 0
+
+    def get(self, game_id: int) -> Optional[LiveGame]:
+        return self.games.get(game_id)
+
+    async def load(self, game_id: int, db: AsyncSession) -> Optional[LiveGame]:
+        """Получение игры из памяти, при первом обращении — из базы."""
+        live = self.games.get(game_id)
+        if live is not None:
+            return live
+
+        game = await db.get(Game, game_id)
+        if not game:
+            return None
+
+        live = LiveGame.from_model(game)
+        live.catch_up(await load_moves(game_id, db, after_seq=live.move_seq))
+
+        # Пока шли запросы, игру мог загрузить другой обработчик
+        return self.games.setdefault(game_id, live)
+
+    async def peek(self, game_id: int, db: AsyncSession) -> Optional[LiveGame]:
+        """Игра для чтения: из памяти или из базы, без загрузки в движок."""
+        live = self.games.get(game_id)
+        if live is not None:
+            return live
+
+        game = await db.get(Game, game_id)
+        if not game:
+            return None
+
+        live = LiveGame.from_model(game)
+        live.catch_up(await load_moves(game_id, db, after_seq=live.move_seq))
+        return live
+
+    def adopt(self, live: LiveGame) -> LiveGame:
+        """Загрузка в движок игры, уже прочитанной через peek."""
+        return self.games.setdefault(live.id, live)
+
+    def schedule(self, live: LiveGame):
+        """Постановка изменённой игры в очередь фоновой записи."""
+        if not live.dirty:
+            return
+        self.pending[live.id] = live
+        if len(self.pending) >= FLUSH_BATCH_SIZE and self.wakeup is not None:
+            self.wakeup.set()
+
+    async def start(self, session_factory):
+        """Запуск фоновой записи изменённых игр."""
+        self.session_factory = session_factory
+        self.wakeup = asyncio.Event()
+        self.flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Остановка фоновой записи с сохранением всех изменённых игр."""
+        if self.flusher is not None:
+            self.flusher.cancel()
+            try:
+                await self.flusher
+            except asyncio.CancelledError:
+                pass
+            self.flusher = None
+
+        if self.session_factory is None:
+            return
+        async with self.session_factory() as db:
+            while self.pending:
+                if not await self.flush_pending(db):
+                    break
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            if not self.pending:
+                continue
+
+            try:
+                async with self.session_factory() as db:
+                    await self.flush_pending(db)
+            except Exception as e:
+                print(f"Error flushing games: {e}")
+
+            if len(self.pending) >= FLUSH_BATCH_SIZE:
+                self.wakeup.set()
+
+    async def flush_pending(self, db: AsyncSession) -> int:
+        """Запись одной пачки изменённых игр. Возвращает размер пачки."""
+        batch: List[LiveGame] = []
+        for game_id, live in list(self.pending.items()):
+            if len(batch) >= FLUSH_BATCH_SIZE:
+                break
+            # Игру сейчас меняет или сохраняет её обработчик — запишем позже
+            if live.lock.locked():
+                continue
+            del self.pending[game_id]
+            if live.dirty:
+                batch.append(live)
+        if not batch:
+            return 0
+
+        # Блокировки свободны, поэтому захватываются без ожидания
+        for live in batch:
+            await live.lock.acquire()
+        try:
+            rows = [
+                (live, live.revision, live.column_values(boards=live.boards_changed))
+                for live in batch
+            ]
+            moves = {live.id: len(live.moves) for live in batch}
+            try:
+                written = await self._write_batch(rows, db)
+                await self._write_moves(
+                    [live for live in batch if live.id in written], db
+                )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                for live in batch:
+                    self.pending.setdefault(live.id, live)
+                raise
+
+            for live, revision, column_values in rows:
+                if live.id in written:
+                    self._written(live, revision, moves[live.id])
+                    if "board_player1" in column_values:
+                        live.boards_changed = False
+                else:
+                    # Строку изменил другой воркер или запрос: перечитываем
+                    # её и повторяем свои действия, запись — в следующей пачке
+                    await self.reload(live, db)
+                    self.schedule(live)
+        finally:
+            for live in batch:
+                live.lock.release()
+
+        self.flush_ticks += 1
+        self.flushed_games += len(batch)
+        return len(batch)
+
+    async def _write_batch(self, rows: list, db: AsyncSession) -> Set[int]:
+        """Compare-and-swap для пачки игр. Возвращает id записанных игр."""
+        if db.bind.dialect.name == "postgresql":
+            # Игры с досками и без пишутся разными запросами
+            groups: Dict[tuple, list] = {}
+            for row in rows:
+                groups.setdefault(tuple(row[2]), []).append(row)
+            written = set()
+            for names, group in groups.items():
+                written |= await self._write_group(list(names), group, db)
+            return written
+
+        # SQLite не умеет UPDATE из VALUES с именами колонок:
+        # по запросу на игру, но в одной транзакции
+        written = set()
+        for live, _, column_values in rows:
+            result = await db.execute(self._cas_update(live, column_values))
+            if result.rowcount:
+                written.add(live.id)
+        return written
+
+    async def _write_group(self, names: list, rows: list, db: AsyncSession) -> Set[int]:
+        """Один UPDATE ... FROM (VALUES ...) RETURNING на группу игр (Postgres)."""
+        types = {name: Game.__table__.c[name].type for name in names}
+        data = values(
+            column("id", Integer),
+            column("version", Integer),
+            *[column(name, types[name]) for name in names],
+            name="batch",
+        ).data(
+            [
+                (live.id, live.version, *column_values.values())
+                for live, _, column_values in rows
+            ]
+        )
+        result = await db.execute(
+            update(Game)
+            .where(Game.id == data.c.id, Game.version == data.c.version)
+            .values(
+                version=Game.version + 1,
+                # NULL в VALUES без приведения типа Postgres считает текстом
+                **{name: cast(data.c[name], types[name]) for name in names},
+            )
+            .returning(Game.id)
+            .execution_options(synchronize_session=False)
+        )
+        return set(result.scalars())
+
+    async def _write_moves(self, games: List[LiveGame], db: AsyncSession):
+        """Добавление новых ходов игр в журнал одним пакетным INSERT."""
+        rows = [move.row(live.id) for live in games for move in live.moves]
+        if rows:
+            await db.execute(insert(Move), rows)
+
+    def _written(self, live: LiveGame, revision: int, moves: int):
+        """Отметка успешной записи игры и её первых moves ходов."""
+        live.version += 1
+        live.flushed_revision = revision
+        del live.moves[:moves]
+        live.unflushed = [entry for entry in live.unflushed if entry[0] > revision]
+
+    @staticmethod
+    def _cas_update(live: LiveGame, column_values: dict):
+        return (
+            update(Game)
+            .where(Game.id == live.id, Game.version == live.version)
+            .values(**column_values, version=live.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def flush(self, live: LiveGame, db: AsyncSession):
+        """Немедленная запись игры в базу (compare-and-swap по версии)."""
+        if not live.dirty:
+            return
+
+        revision, moves = live.revision, len(live.moves)
+        result = await db.execute(self._cas_update(live, live.column_values()))
+        if result.rowcount == 0:
+            await db.rollback()
+            raise StaleGameError(f"Game {live.id} was modified concurrently")
+
+        await self._write_moves([live], db)
+        await db.commit()
+        self._written(live, revision, moves)
+        live.boards_changed = False
+        self.pending.pop(live.id, None)
+
+    async def reload(self, live: LiveGame, db: AsyncSession):
+        """Перечитывание игры из базы и повтор незаписанных действий.
+
+        Действие, которое на новом состоянии стало невозможным, не
+        повторяется; об этом узнают подписчики on_conflict, чтобы
+        разослать игрокам актуальное состояние.
+        """
+        game = await db.get(Game, live.id, populate_existing=True)
+        if game is None:
+            return
+        live.reload_from(game)
+        live.catch_up(await load_moves(live.id, db, after_seq=live.move_seq))
+
+        actions, live.unflushed = live.unflushed, []
+        rejected = 0
+        for _, action in actions:
+            try:
+                action(live)
+            except ValueError:
+                rejected += 1
+                continue
+            live.unflushed.append((live.revision, action))
+        # Читающая транзакция завершается, чтобы долгоживущая сессия
+        # (например, сессия актора игры) не держала соединение из пула
+        await db.commit()
+        if rejected:
+            for listener in self.conflict_listeners:
+                listener(live)
+
+    async def apply(self, live: LiveGame, db: AsyncSession, action: Callable):
+        """Выполнение действия над игрой.
+
+        Действия, не меняющие статус (расстановка, обычные ходы), уходят в
+        фоновую запись. Смена статуса (готовность, начало и конец игры)
+        сохраняется сразу через compare-and-swap: если строку игры успел
+        изменить другой воркер, игра перечитывается из базы и действие
+        повторяется (не более CONFLICT_RETRIES раз).
+        """
+        async with live.lock:
+            for _ in range(CONFLICT_RETRIES):
+                status, revision = live.status, live.revision
+                result = action(live)
+                if live.status == status:
+                    if live.revision != revision:
+                        live.unflushed.append((live.revision, action))
+                    self.schedule(live)
+                    return result
+                try:
+                    await self.flush(live, db)
+                    return result
+                except StaleGameError:
+                    await self.reload(live, db)
+            raise ValueError("Game was modified concurrently, try again")
+
+    async def release(self, game_id: int, db: AsyncSession):
+        """Сохранение и выгрузка игры, когда с ней больше никто не связан.
+
+        При конфликте версий игра перечитывается с повтором незаписанных
+        действий; если записать так и не удалось, она остаётся в очереди
+        фоновой записи.
+        """
+        live = self.games.pop(game_id, None)
+        if live is None:
+            return
+        async with live.lock:
+            for _ in range(CONFLICT_RETRIES):
+                try:
+                    await self.flush(live, db)
+                    return
+                except StaleGameError:
+                    await self.reload(live, db)
+            self.schedule(live)
+
+    def on_conflict(self, listener: Callable[[LiveGame], None]):
+        """Подписка на конфликты, после которых часть действий не повторилась."""
+        self.conflict_listeners.append(listener)
+
+    def metrics(self) -> dict:
+        return {
+            "loaded_games": len(self.games),
+            "pending_games": len(self.pending),
+            "flush_ticks": self.flush_ticks,
+            "flushed_games": self.flushed_games,
+        }
+
+
+game_engine = GameEngine()
@@ -0,0 +1,154 @@
+# app/game_logic/fleet.py
+
+import random
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from app.game_logic.bitboard import BOARD_SIZE, Bitboard, dilate, ship_masks
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен, без него пачка строится по одной
+    np = None
+
+# Стандартный флот: размеры кораблей
+FLEET = (4, 3, 3, 2, 2, 2, 1, 1, 1, 1)
+
+# Сколько раз начинать расстановку заново, если корабль некуда поставить
+MAX_LAYOUT_ATTEMPTS = 100
+# Сколько случайных позиций пробовать до перебора всех допустимых
+QUICK_PICKS = 3
+
+# Позиция корабля: маска клеток, маска с соседними клетками, x, y, ориентация
+Placement = Tuple[int, int, int, int, str]
+
+
+@lru_cache(maxsize=None)
+def placements(ship_size: int, size: int = BOARD_SIZE) -> Tuple[Placement, ...]:
+    """Все позиции корабля на пустом поле."""
+    # У однопалубного корабля обе ориентации дают одну и ту же позицию
+    orientations = ("horizontal",) if ship_size == 1 else ("horizontal", "vertical")
+    result = []
+    for orientation in orientations:
+        for x in range(size):
+            for y in range(size):
+                masks = ship_masks(x, y, ship_size, orientation, size)
+                if masks is not None:
+                    result.append((masks[0], masks[1], x, y, orientation))
+    return tuple(result)
+
+
+def _pick(rng, candidates: Tuple[Placement, ...], blocked: int) -> Optional[Placement]:
+    """Случайная позиция, не задевающая занятые клетки.
+
+    Сначала несколько случайных попыток, и только потом отбор всех
+    допустимых позиций: распределение остаётся равномерным.
+    """
+    for _ in range(QUICK_PICKS):
+        placement = rng.choice(candidates)
+        if not placement[0] & blocked:
+            return placement
+    allowed = [placement for placement in candidates if not placement[0] & blocked]
+    return rng.choice(allowed) if allowed else None
+
+
+def _sample(ships, size: int, rng, occupied: int) -> Optional[List[Tuple[int, Placement]]]:
+    base = dilate(occupied, size) if occupied else 0
+    # Большие корабли ставятся первыми, пока поле свободно
+    order = sorted(ships, reverse=True)
+    for _ in range(MAX_LAYOUT_ATTEMPTS):
+        blocked = base
+        chosen = []
+        for ship_size in order:
+            placement = _pick(rng, placements(ship_size, size), blocked)
+            if placement is None:
+                break
+            blocked |= placement[1]
+            chosen.append((ship_size, placement))
+        else:
+            return chosen
+    return None
+
+
+def random_layout(
+    ships=FLEET, size: int = BOARD_SIZE, rng=None, occupied: int = 0
+) -> Optional[List[Tuple[int, str, int, int]]]:
+    """Случайная расстановка флота: список (size, orientation, x, y).
+
+    occupied — маска уже стоящих кораблей. rng — random.Random для
+    воспроизводимости. None, если флот не помещается.
+    """
+    chosen = _sample(ships, size, rng or random, occupied)
+    if chosen is None:
+        return None
+    return [(ship_size, p[4], p[2], p[3]) for ship_size, p in chosen]
+
+
+def random_bitboard(ships=FLEET, size: int = BOARD_SIZE, rng=None) -> Bitboard:
+    """Поле со случайно расставленным флотом."""
+    chosen = _sample(ships, size, rng or random, 0)
+    if chosen is None:
+        raise ValueError("Fleet does not fit on the board")
+
+    mask = 0
+    for _, placement in chosen:
+        mask |= placement[0]
+    return Bitboard(size, mask)
+
+
+@lru_cache(maxsize=None)
+def _placement_arrays(ship_size: int, size: int):
+    """Маски позиций корабля в виде булевых матриц (позиции x клетки)."""
+    cells = range(size * size)
+    rows = placements(ship_size, size)
+    masks = np.array([[mask >> i & 1 for i in cells] for mask, *_ in rows], dtype=bool)
+    halos = np.array([[halo >> i & 1 for i in cells] for _, halo, *_ in rows], dtype=bool)
+    return masks, halos, masks.T.astype(np.float32)
+
+
+def _numpy_bitboards(count: int, ships, size: int, rng) -> List[Bitboard]:
+    cells = size * size
+    fleets = np.zeros((count, cells), dtype=bool)
+    todo = np.arange(count)
+    for _ in range(MAX_LAYOUT_ATTEMPTS):
+        if not todo.size:
+            break
+
+        n = todo.size
+        rows = np.arange(n)
+        blocked = np.zeros((n, cells), dtype=bool)
+        fleet = np.zeros((n, cells), dtype=bool)
+        placed = np.ones(n, dtype=bool)
+        for ship_size in sorted(ships, reverse=True):
+            masks, halos, masks_t = _placement_arrays(ship_size, size)
+            # Позиция допустима, если не пересекает занятые клетки
+            valid = (blocked.astype(np.float32) @ masks_t) == 0
+            keys = rng.random(valid.shape)
+            keys[~valid] = -1.0
+            choice = keys.argmax(axis=1)
+            placed &= valid[rows, choice]
+            fleet |= masks[choice]
+            blocked |= halos[choice]
+
+        fleets[todo[placed]] = fleet[placed]
+        todo = todo[~placed]
+
+    if todo.size:
+        raise ValueError("Fleet does not fit on the board")
+
+    packed = np.packbits(fleets, axis=1, bitorder="little")
+    return [Bitboard(size, int.from_bytes(row.tobytes(), "little")) for row in packed]
+
+
+def random_bitboards(
+    count: int, ships=FLEET, size: int = BOARD_SIZE, seed: Optional[int] = None
+) -> List[Bitboard]:
+    """Пачка полей со случайным флотом.
+
+    С numpy пачка строится векторно, без него — по одному полю. Одинаковый
+    seed даёт одинаковые поля (при одной и той же реализации).
+    """
+    if np is None:
+        rng = random.Random(seed)
+        return [random_bitboard(ships, size, rng) for _ in range(count)]
+    return _numpy_bitboards(count, ships, size, np.random.default_rng(seed))
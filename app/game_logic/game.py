@@ -1,10 +1,19 @@
 # app/game_logic/game.py
 
+import os
+import secrets
+
 from sqlalchemy.orm import Session
 
 from app.game_logic.board import generate_board
+from app.game_logic.engine import game_engine
+from app.game_logic.lobby import waiting_games
 from app.game_logic.utils import deserialize_board, serialize_board
-from app.models import Game
+from app.models import Game, User
+from app.utils import hash_password
+
+# Имя пользователя, от имени которого играет бот
+BOT_USERNAME = os.getenv("BOT_USERNAME", "bot")
 
 
 def start_game_logic(player1_id: int, db: Session):
@@ -13,26 +22,115 @@ def start_game_logic(player1_id: int, db: Session):
     db.add(new_game)
     db.commit()
     db.refresh(new_game)
+    waiting_games.add(new_game)
     return new_game
 
 
-def join_game_logic(game_id: int, player2_id: int, db: Session):
-    """Присоединение второго игрока к игре."""
-    game = db.query(Game).filter(Game.id == game_id, Game.player2_id == None).first()
-    if not game:
-        raise ValueError("Game not found or already has two players")
+def create_paired_game(player1_id: int, player2_id: int, db: Session):
+    """Создание игры для пары, подобранной матчмейкингом."""
+    new_game = Game(
+        player1_id=player1_id,
+        player2_id=player2_id,
+        status="setup",
+        turn=player1_id,  # Первый игрок начинает
+    )
+    db.add(new_game)
+    db.commit()
+    db.refresh(new_game)
+    return new_game
+
 
-    game.player2_id = player2_id
-    game.status = "setup"  # Изменяем на setup для фазы расстановки кораблей
-    game.turn = game.player1_id  # Первый игрок начинает
+def join_game_logic(game_id: int, player2_id: int, db: Session, lobby_event: str = "game_joined"):
+    """Присоединение второго игрока к игре.
+
+    lobby_event — событие лобби об уходе игры из списка ожидающих.
+    """
+    # Проверка и обновление одним условным UPDATE: из двух одновременных
+    # запросов на присоединение успешен только один
+    updated = (
+        db.query(Game)
+        .filter(
+            Game.id == game_id,
+            Game.player2_id == None,
+            Game.status == "waiting",
+        )
+        .update(
+            {
+                Game.player2_id: player2_id,
+                Game.status: "setup",  # Изменяем на setup для фазы расстановки кораблей
+                Game.turn: Game.player1_id,  # Первый игрок начинает
+                Game.version: Game.version + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        db.rollback()
+        raise ValueError("Game not found or already has two players")
 
     db.commit()
-    db.refresh(game)
+    game = db.query(Game).filter(Game.id == game_id).first()
+    waiting_games.remove(game.id, reason=lobby_event)
+    # Игру в памяти, если она загружена, обновляет вызывающий код в цикле
+    # событий (websocket_handlers.sync_game): здесь поток пула
     return game
 
 
+def get_bot_user(db: Session) -> User:
+    """Пользователь бота; создаётся при первом обращении.
+
+    Бот отличается флагом is_bot, а не именем: имя BOT_USERNAME закрыто
+    для регистрации, но могло быть занято до этого.
+    """
+    user = db.query(User).filter(User.is_bot.is_(True)).order_by(User.id).first()
+    if user is None:
+        username = BOT_USERNAME
+        if db.query(User.id).filter(User.username == username).first():
+            username = f"{BOT_USERNAME}-{secrets.token_hex(4)}"
+        # Пароль случайный: войти под ботом нельзя
+        user = User(
+            username=username,
+            hashed_password=hash_password(secrets.token_urlsafe(32)),
+            is_bot=True,
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+    return user
+
+
+def is_reserved_username(username: str) -> bool:
+    """Имя, под которым нельзя зарегистрироваться."""
+    return username.casefold() == BOT_USERNAME.casefold()
+
+
+def add_bot_logic(game_id: int, player1_id: int, db: Session):
+    """Присоединение бота вторым игроком к игре, созданной player1_id."""
+    game = db.query(Game).filter(Game.id == game_id).first()
+    if not game or game.player1_id != player1_id:
+        raise ValueError("Game not found or you are not its creator")
+
+    bot_user = get_bot_user(db)
+    # Для лобби игра с ботом просто исчезает: к ней больше нельзя присоединиться
+    return join_game_logic(game_id, bot_user.id, db, lobby_event="game_removed")
+
+
 def get_game_status_logic(game_id: int, db: Session):
     """Получение текущего состояния игры."""
+    # Активная игра в памяти новее, чем запись в базе
+    live = game_engine.get(game_id)
+    if live is not None:
+        return {
+            "game_id": live.id,
+            "status": live.status,
+            "player1_id": live.player1_id,
+            "player2_id": live.player2_id,
+            "winner_id": live.winner_id,
+            "turn": live.turn,
+            "board_player1": live.board_player1.to_grid(),
+            "board_player2": live.board_player2.to_grid(),
+        }
+
     game = db.query(Game).filter(Game.id == game_id).first()
     if not game:
         raise ValueError("Game not found")
@@ -0,0 +1,146 @@
+# app/game_logic/lobby.py
+
+import os
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, List
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Game
+
+# Сколько секунд игра ждёт второго игрока, прежде чем истечь и уйти из лобби
+WAITING_GAME_TTL = float(os.getenv("WAITING_GAME_TTL", "3600"))
+
+
+def game_summary(game) -> dict:
+    """Краткое описание игры для лобби."""
+    return {
+        "id": game.id,
+        "status": game.status,
+        "player1_id": game.player1_id,
+    }
+
+
+class WaitingGamesIndex:
+    """Игры, ожидающие второго игрока, в порядке создания.
+
+    Индекс обновляется при создании игры и присоединении к ней, поэтому
+    лобби отдаётся из памяти без запроса к базе. Синхронные маршруты
+    выполняются в пуле потоков, поэтому доступ защищён блокировкой.
+    Подписчики получают события game_created, game_joined и game_removed
+    (игра истекла или к ней присоединился бот) в том потоке, где произошло
+    изменение. События других воркеров применяются через apply, без
+    рассылки подписчикам. Истекают только игры, созданные этим воркером
+    (или загруженные им при старте): остальные снимает их воркер.
+    """
+
+    def __init__(self):
+        self.games: Dict[int, dict] = {}  # game_id -> краткое описание
+        # game_id -> время появления в индексе игр этого воркера
+        self.created: Dict[int, float] = {}
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[[dict], None]] = []
+
+    def subscribe(self, listener: Callable[[dict], None]):
+        self.listeners.append(listener)
+
+    def _emit(self, event: dict):
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Error notifying lobby listener: {e}")
+
+    def add(self, game):
+        summary = game_summary(game)
+        with self.lock:
+            self.games[game.id] = summary
+            self.created[game.id] = time.monotonic()
+        self._emit({"action": "game_created", "game": summary})
+
+    def remove(self, game_id: int, reason: str = "game_removed"):
+        """Удаление игры из лобби; reason — game_joined или game_removed."""
+        with self.lock:
+            removed = self.games.pop(game_id, None)
+            self.created.pop(game_id, None)
+        if removed is not None:
+            self._emit({"action": reason, "game_id": game_id})
+
+    def apply(self, event: dict) -> bool:
+        """Изменение лобби, сделанное другим воркером. False, если индекс
+        уже в этом состоянии."""
+        with self.lock:
+            if event["action"] == "game_created":
+                game = event["game"]
+                if game["id"] in self.games:
+                    return False
+                self.games[game["id"]] = game
+                return True
+            self.created.pop(event["game_id"], None)
+            return self.games.pop(event["game_id"], None) is not None
+
+    def page(self, offset: int = 0, limit: int = 100) -> List[dict]:
+        """Страница списка ожидающих игр."""
+        with self.lock:
+            return list(islice(self.games.values(), offset, offset + limit))
+
+    def __len__(self):
+        return len(self.games)
+
+    async def load(self, db: AsyncSession):
+        """Заполнение индекса из базы при старте приложения."""
+        result = await db.execute(
+            select(Game)
+            .where(Game.status == "waiting", Game.player2_id.is_(None))
+            .order_by(Game.id)
+        )
+        games = {game.id: game_summary(game) for game in result.scalars()}
+        # Возраст игр до перезапуска неизвестен, отсчёт начинается заново
+        now = time.monotonic()
+        with self.lock:
+            self.games = games
+            self.created = dict.fromkeys(games, now)
+
+    def stale(self, keep: Iterable[int] = ()) -> List[int]:
+        """Игры этого воркера, которые ждут второго игрока дольше
+        WAITING_GAME_TTL, кроме игр из keep."""
+        cutoff = time.monotonic() - WAITING_GAME_TTL
+        keep = set(keep)
+        stale = []
+        with self.lock:
+            for game_id, created in self.created.items():
+                if created > cutoff:
+                    break
+                if game_id not in keep:
+                    stale.append(game_id)
+        return stale
+
+    async def expire(self, db: AsyncSession, game_ids: List[int]) -> int:
+        """Истечение ожидающих игр и снятие их из лобби.
+
+        Статус меняется условным UPDATE, поэтому игру, к которой только что
+        присоединились, он не заденет. Возвращает число снятых игр.
+        """
+        if not game_ids:
+            return 0
+
+        await db.execute(
+            update(Game)
+            .where(
+                Game.id.in_(game_ids),
+                Game.status == "waiting",
+                Game.player2_id.is_(None),
+            )
+            .values(status="expired", version=Game.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        for game_id in game_ids:
+            self.remove(game_id)
+        return len(game_ids)
+
+
+waiting_games = WaitingGamesIndex()
@@ -0,0 +1,278 @@
+# app/game_logic/matchmaking.py
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+# Ширина диапазона рейтинга: игроки подбираются только внутри диапазона
+RATING_BAND_WIDTH = int(os.getenv("MATCHMAKING_BAND_WIDTH", "100"))
+# Заявка, ждущая дольше d * BAND_WIDEN_INTERVAL секунд, принимает соперников
+# из диапазонов на d дальше своего, но не дальше MAX_BAND_WIDENING
+BAND_WIDEN_INTERVAL = float(os.getenv("MATCHMAKING_WIDEN_INTERVAL", "10"))
+MAX_BAND_WIDENING = int(os.getenv("MATCHMAKING_MAX_WIDENING", "3"))
+# Redis для общей очереди нескольких воркеров; без него очередь в памяти
+MATCHMAKING_URL = os.getenv("MATCHMAKING_URL")
+# Сколько секунд хранится результат подбора для опроса ожидавшим игроком
+MATCH_RESULT_TTL = 300
+
+
+def rating_band(rating: Optional[int]) -> Optional[int]:
+    """Диапазон рейтинга; None — общий диапазон без учёта рейтинга."""
+    if rating is None:
+        return None
+    return rating // RATING_BAND_WIDTH
+
+
+class Matchmaker:
+    """Очередь подбора соперников в памяти процесса.
+
+    Для каждого диапазона рейтинга — куча по времени постановки в очередь,
+    поэтому постановка и подбор пары занимают O(log n). Если в своём
+    диапазоне никого нет, проверяются головы соседних куч: самая старая
+    заявка диапазона раньше всех расширяет поиск. Отменённые заявки
+    удаляются из кучи лениво. Все операции атомарны под одной блокировкой.
+    """
+
+    def __init__(self):
+        self.bands: Dict[Optional[int], List[Tuple[float, int, int]]] = {}
+        self.tickets: Dict[int, Tuple[Optional[int], int]] = {}  # user_id -> (band, seq)
+        # Соперники, для которых создаётся игра: user_id -> запись кучи
+        self.pairing: Dict[int, Tuple[Optional[int], Tuple[float, int, int]]] = {}
+        self.matches: OrderedDict = OrderedDict()  # user_id -> (expires_at, game_id)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def enqueue(self, user_id: int, rating: Optional[int] = None) -> Optional[int]:
+        """Постановка в очередь. Возвращает соперника, если пара нашлась.
+
+        Соперник ждёт, пока для него не вызовут record_match или requeue.
+        """
+        band = rating_band(rating)
+        now = time.monotonic()
+        with self.lock:
+            self._purge_matches(now)
+            if user_id in self.tickets:
+                return None
+
+            found = self._find(band, now)
+            if found is not None:
+                opponent_band, entry = found
+                heapq.heappop(self.bands[opponent_band])
+                del self.tickets[entry[2]]
+                self.pairing[entry[2]] = (opponent_band, entry)
+                return entry[2]
+
+            seq = next(self.counter)
+            heapq.heappush(self.bands.setdefault(band, []), (now, seq, user_id))
+            self.tickets[user_id] = (band, seq)
+            return None
+
+    def _head(self, band: Optional[int]) -> Optional[Tuple[float, int, int]]:
+        """Самая старая действующая заявка диапазона; под блокировкой."""
+        heap = self.bands.get(band)
+        while heap:
+            entry = heap[0]
+            # Пропускаем отменённые и устаревшие заявки
+            if self.tickets.get(entry[2]) == (band, entry[1]):
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def _find(self, band: Optional[int], now: float):
+        """Соперник из своего диапазона, иначе — из соседних, где заявка
+        ждёт достаточно долго. (диапазон, запись кучи) или None."""
+        head = self._head(band)
+        if head is not None or band is None:
+            return (band, head) if head is not None else None
+
+        found = None
+        for distance in range(1, MAX_BAND_WIDENING + 1):
+            for neighbour in (band - distance, band + distance):
+                entry = self._head(neighbour)
+                if entry is None or now - entry[0] < distance * BAND_WIDEN_INTERVAL:
+                    continue
+                if found is None or entry < found[1]:
+                    found = (neighbour, entry)
+        return found
+
+    def requeue(self, user_id: int) -> bool:
+        """Возврат соперника, для которого не удалось создать игру, на
+        прежнее место в очереди. Пару не подбирает."""
+        with self.lock:
+            pairing = self.pairing.pop(user_id, None)
+            if pairing is None or user_id in self.tickets:
+                return False
+            band, entry = pairing
+            heapq.heappush(self.bands.setdefault(band, []), entry)
+            self.tickets[user_id] = (band, entry[1])
+            return True
+
+    def cancel(self, user_id: int) -> bool:
+        with self.lock:
+            return self.tickets.pop(user_id, None) is not None
+
+    def is_queued(self, user_id: int) -> bool:
+        return user_id in self.tickets
+
+    def record_match(self, user_id: int, game_id: int):
+        """Сохранение найденной игры для игрока, который ждал в очереди."""
+        now = time.monotonic()
+        with self.lock:
+            self.pairing.pop(user_id, None)
+            self._purge_matches(now)
+            # Свежая запись — в конец: словарь упорядочен по сроку хранения
+            self.matches[user_id] = (now + MATCH_RESULT_TTL, game_id)
+            self.matches.move_to_end(user_id)
+
+    def _purge_matches(self, now: float):
+        """Удаление результатов, которые так и не забрали.
+
+        Срок хранения у всех одинаковый, поэтому просроченные записи
+        всегда в начале словаря; вызывается под блокировкой.
+        """
+        while self.matches:
+            expires_at, _ = next(iter(self.matches.values()))
+            if expires_at >= now:
+                return
+            self.matches.popitem(last=False)
+
+    def pop_match(self, user_id: int) -> Optional[int]:
+        with self.lock:
+            expires_at, game_id = self.matches.pop(user_id, (0, None))
+        if expires_at < time.monotonic():
+            return None
+        return game_id
+
+
+# Атомарная постановка в очередь: если в диапазоне (KEYS[1]) уже кто-то
+# ждёт, он извлекается и возвращается как соперник; иначе берётся самая
+# старая из голов соседних очередей (KEYS[4..]), которая ждёт дольше
+# ARGV[4..] * ARGV[3] секунд; иначе игрок добавляется. Очередь и время
+# извлечённой заявки запоминаются в KEYS[3] для requeue.
+ENQUEUE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+    return false
+end
+local found, queue, score
+local head = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if #head > 0 then
+    found, queue, score = head[1], KEYS[1], head[2]
+else
+    for i = 4, #KEYS do
+        local entry = redis.call('ZRANGE', KEYS[i], 0, 0, 'WITHSCORES')
+        if #entry > 0
+            and tonumber(ARGV[2]) - tonumber(entry[2]) >= tonumber(ARGV[i]) * tonumber(ARGV[3])
+            and (not found or tonumber(entry[2]) < tonumber(score)) then
+            found, queue, score = entry[1], KEYS[i], entry[2]
+        end
+    end
+end
+if found then
+    redis.call('ZREM', queue, found)
+    redis.call('HDEL', KEYS[2], found)
+    redis.call('HSET', KEYS[3], found, queue .. '|' .. score)
+    return found
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], KEYS[1])
+return false
+"""
+
+# Возврат извлечённой заявки в её очередь с прежним временем
+REQUEUE_SCRIPT = """
+local entry = redis.call('HGET', KEYS[2], ARGV[1])
+if not entry then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return 0
+end
+local sep = string.find(entry, '|', 1, true)
+local queue = string.sub(entry, 1, sep - 1)
+redis.call('ZADD', queue, string.sub(entry, sep + 1), ARGV[1])
+redis.call('HSET', KEYS[1], ARGV[1], queue)
+return 1
+"""
+
+CANCEL_SCRIPT = """
+local queue = redis.call('HGET', KEYS[1], ARGV[1])
+if not queue then
+    return 0
+end
+redis.call('ZREM', queue, ARGV[1])
+redis.call('HDEL', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisMatchmaker:
+    """Общая очередь подбора для нескольких воркеров на Redis.
+
+    Очередь диапазона — sorted set по времени постановки, подбор пары
+    (вместе с расширением на соседние диапазоны) выполняется Lua-скриптом
+    атомарно (O(log n)).
+    """
+
+    def __init__(self, url: str, prefix: str = "battleship:matchmaking"):
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.tickets_key = f"{prefix}:tickets"
+        self.pairing_key = f"{prefix}:pairing"
+        self.enqueue_script = self.redis.register_script(ENQUEUE_SCRIPT)
+        self.requeue_script = self.redis.register_script(REQUEUE_SCRIPT)
+        self.cancel_script = self.redis.register_script(CANCEL_SCRIPT)
+
+    def queue_key(self, band: Optional[int]) -> str:
+        return f"{self.prefix}:queue:{'any' if band is None else band}"
+
+    def enqueue(self, user_id: int, rating: Optional[int] = None) -> Optional[int]:
+        band = rating_band(rating)
+        neighbours, distances = [], []
+        if band is not None:
+            for distance in range(1, MAX_BAND_WIDENING + 1):
+                for neighbour in (band - distance, band + distance):
+                    neighbours.append(self.queue_key(neighbour))
+                    distances.append(distance)
+        opponent_id = self.enqueue_script(
+            keys=[self.queue_key(band), self.tickets_key, self.pairing_key, *neighbours],
+            args=[user_id, time.time(), BAND_WIDEN_INTERVAL, *distances],
+        )
+        return int(opponent_id) if opponent_id else None
+
+    def requeue(self, user_id: int) -> bool:
+        return bool(
+            self.requeue_script(keys=[self.tickets_key, self.pairing_key], args=[user_id])
+        )
+
+    def cancel(self, user_id: int) -> bool:
+        return bool(self.cancel_script(keys=[self.tickets_key], args=[user_id]))
+
+    def is_queued(self, user_id: int) -> bool:
+        return bool(self.redis.hexists(self.tickets_key, user_id))
+
+    def record_match(self, user_id: int, game_id: int):
+        pipe = self.redis.pipeline()
+        pipe.hdel(self.pairing_key, user_id)
+        pipe.set(f"{self.prefix}:match:{user_id}", game_id, ex=MATCH_RESULT_TTL)
+        pipe.execute()
+
+    def pop_match(self, user_id: int) -> Optional[int]:
+        game_id = self.redis.getdel(f"{self.prefix}:match:{user_id}")
+        return int(game_id) if game_id else None
+
+
+def create_matchmaker(url: Optional[str] = MATCHMAKING_URL):
+    """Выбор реализации очереди подбора по настройкам."""
+    if url:
+        return RedisMatchmaker(url)
+    return Matchmaker()
+
+
+matchmaker = create_matchmaker()
@@ -0,0 +1,208 @@
+# app/game_logic/replay.py
+
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.game_logic.bitboard import Bitboard
+from app.game_logic.utils import decode_board
+from app.models import Game, Move
+
+# Архив завершённой игры: сигнатура, версия формата, игроки, победитель,
+# размер поля, маски кораблей обоих игроков и ходы
+ARCHIVE_MAGIC = b"BSA"
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = struct.Struct("<3sBIIIBH")  # magic, version, p1, p2, winner, size, moves
+
+
+@dataclass(frozen=True)
+class MoveRecord:
+    """Один ход игры."""
+
+    seq: int
+    player_id: int
+    x: int
+    y: int
+    result: str
+    created_at: Optional[datetime] = None
+
+    def row(self, game_id: int) -> dict:
+        """Строка таблицы moves."""
+        return {
+            "game_id": game_id,
+            "seq": self.seq,
+            "player_id": self.player_id,
+            "x": self.x,
+            "y": self.y,
+            "result": self.result,
+            "created_at": self.created_at,
+        }
+
+
+@dataclass
+class GameArchive:
+    """Содержимое архива: расстановка кораблей и ходы."""
+
+    player1_id: int
+    player2_id: int
+    winner_id: Optional[int]
+    board_player1: Bitboard
+    board_player2: Bitboard
+    moves: List[MoveRecord]
+
+
+def shot_count(*boards: Bitboard) -> int:
+    """Число выстрелов по доскам, то есть номер последнего хода."""
+    return sum(bin(board.hits | board.misses).count("1") for board in boards)
+
+
+def apply_moves(
+    board_player1: Bitboard,
+    board_player2: Bitboard,
+    player1_id: int,
+    moves: Iterable[MoveRecord],
+):
+    """Применение ходов к доскам: игрок стреляет по доске соперника."""
+    for move in moves:
+        board = board_player2 if move.player_id == player1_id else board_player1
+        board.shoot(move.x, move.y)
+
+
+def replay(
+    board_player1: Bitboard,
+    board_player2: Bitboard,
+    player1_id: int,
+    player2_id: int,
+    moves: Iterable[MoveRecord],
+) -> Tuple[Bitboard, Bitboard, Optional[int]]:
+    """Восстановление досок по расстановке и ходам.
+
+    Выстрелы исходных досок отбрасываются, учитываются только корабли.
+    Возвращает обе доски и победителя, если игра закончилась.
+    """
+    board1 = Bitboard(board_player1.size, board_player1.ships)
+    board2 = Bitboard(board_player2.size, board_player2.ships)
+    apply_moves(board1, board2, player1_id, moves)
+
+    winner_id = None
+    if board2.ships and board2.all_sunk():
+        winner_id = player1_id
+    elif board1.ships and board1.all_sunk():
+        winner_id = player2_id
+    return board1, board2, winner_id
+
+
+async def load_moves(
+    game_id: int, db: AsyncSession, after_seq: int = 0
+) -> List[MoveRecord]:
+    """Ходы игры из базы по порядку, начиная после after_seq."""
+    result = await db.execute(
+        select(Move)
+        .where(Move.game_id == game_id, Move.seq > after_seq)
+        .order_by(Move.seq)
+    )
+    return [
+        MoveRecord(
+            seq=move.seq,
+            player_id=move.player_id,
+            x=move.x,
+            y=move.y,
+            result=move.result,
+            created_at=move.created_at,
+        )
+        for move in result.scalars()
+    ]
+
+
+def _cell_width(size: int) -> int:
+    # Старший бит занят номером игрока, остальные — номер клетки
+    return 1 if size * size <= 0x80 else 2
+
+
+def encode_archive(archive: GameArchive) -> bytes:
+    """Компактная упаковка игры: около 70 байт на партию 10x10.
+
+    Результаты ходов и время не хранятся — результат восстанавливается
+    по расстановке кораблей.
+    """
+    size = archive.board_player1.size
+    mask_bytes = (size * size + 7) // 8
+    width = _cell_width(size)
+    player_bit = 1 << (8 * width - 1)
+
+    chunks = [
+        ARCHIVE_HEADER.pack(
+            ARCHIVE_MAGIC,
+            ARCHIVE_VERSION,
+            archive.player1_id,
+            archive.player2_id,
+            archive.winner_id or 0,
+            size,
+            len(archive.moves),
+        ),
+        archive.board_player1.ships.to_bytes(mask_bytes, "little"),
+        archive.board_player2.ships.to_bytes(mask_bytes, "little"),
+    ]
+    for move in archive.moves:
+        value = move.x * size + move.y
+        if move.player_id == archive.player2_id:
+            value |= player_bit
+        chunks.append(value.to_bytes(width, "little"))
+    return b"".join(chunks)
+
+
+def decode_archive(data: bytes) -> GameArchive:
+    """Распаковка архива с восстановлением результатов ходов."""
+    magic, version, player1_id, player2_id, winner_id, size, count = (
+        ARCHIVE_HEADER.unpack_from(data)
+    )
+    if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+        raise ValueError("Unsupported game archive")
+
+    mask_bytes = (size * size + 7) // 8
+    width = _cell_width(size)
+    player_bit = 1 << (8 * width - 1)
+    offset = ARCHIVE_HEADER.size
+    ships1 = int.from_bytes(data[offset : offset + mask_bytes], "little")
+    ships2 = int.from_bytes(data[offset + mask_bytes : offset + 2 * mask_bytes], "little")
+    offset += 2 * mask_bytes
+
+    board1, board2 = Bitboard(size, ships1), Bitboard(size, ships2)
+    moves = []
+    for seq in range(1, count + 1):
+        value = int.from_bytes(data[offset : offset + width], "little")
+        offset += width
+        player_id = player2_id if value & player_bit else player1_id
+        x, y = divmod(value & ~player_bit, size)
+        board = board2 if player_id == player1_id else board1
+        moves.append(MoveRecord(seq, player_id, x, y, board.shoot(x, y)))
+
+    return GameArchive(
+        player1_id=player1_id,
+        player2_id=player2_id,
+        winner_id=winner_id or None,
+        board_player1=Bitboard(size, ships1),
+        board_player2=Bitboard(size, ships2),
+        moves=moves,
+    )
+
+
+async def export_game(game_id: int, db: AsyncSession) -> Optional[bytes]:
+    """Архив завершённой игры или None, если игра не найдена или не закончена."""
+    game = await db.get(Game, game_id)
+    if game is None or game.status != "finished":
+        return None
+
+    archive = GameArchive(
+        player1_id=game.player1_id,
+        player2_id=game.player2_id,
+        winner_id=game.winner_id,
+        board_player1=decode_board(game.board_player1),
+        board_player2=decode_board(game.board_player2),
+        moves=await load_moves(game_id, db),
+    )
+    return encode_archive(archive)
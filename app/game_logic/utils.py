@@ -2,9 +2,20 @@
 
 import json
 
+from app.game_logic.bitboard import Bitboard
+
+# Версия двоичного формата хранения доски.
+# Формат v1: [версия][размер поля][маска кораблей][маска выстрелов],
+# маски — little-endian по (size * size + 7) // 8 байт. Вместе это
+# 2 бита на клетку: для поля 10x10 доска занимает 28 байт вместо ~500.
+BOARD_CODEC_VERSION = 1
+
 
 def make_move(board, x, y):
     """Обработка хода игрока."""
+    if isinstance(board, Bitboard):
+        return board.shoot(x, y)
+
     # Проверяем границы
     if x < 0 or x >= len(board) or y < 0 or y >= len(board[0]):
         return "invalid"
@@ -21,16 +32,60 @@ def make_move(board, x, y):
 
 def check_winner(board):
     """Проверка, все ли корабли уничтожены."""
+    if isinstance(board, Bitboard):
+        return board.all_sunk()
     return all(cell != "S" for row in board for cell in row)
 
 
+def _mask_length(size):
+    return (size * size + 7) // 8
+
+
+def encode_board(board) -> bytes:
+    """Упаковка доски (Bitboard или список списков) в двоичный формат."""
+    if not isinstance(board, Bitboard):
+        board = Bitboard.from_grid(board)
+
+    length = _mask_length(board.size)
+    shots = board.hits | board.misses
+    return (
+        bytes((BOARD_CODEC_VERSION, board.size))
+        + board.ships.to_bytes(length, "little")
+        + shots.to_bytes(length, "little")
+    )
+
+
+def decode_board(data):
+    """Распаковка сохранённой доски в Bitboard.
+
+    Понимает двоичный формат и старые JSON-строки.
+    """
+    if not data:
+        return None
+
+    if isinstance(data, str):
+        return Bitboard.from_grid(json.loads(data))
+
+    data = bytes(data)
+    version = data[0]
+    if version != BOARD_CODEC_VERSION:
+        raise ValueError(f"Unsupported board format version: {version}")
+
+    size = data[1]
+    length = _mask_length(size)
+    ships = int.from_bytes(data[2 : 2 + length], "little")
+    shots = int.from_bytes(data[2 + length : 2 + 2 * length], "little")
+    return Bitboard(size, ships=ships, hits=shots & ships, misses=shots & ~ships)
+
+
 def serialize_board(board):
-    """Преобразование доски в JSON строку."""
-    return json.dumps(board)
+    """Преобразование доски в двоичный формат для хранения в базе."""
+    return encode_board(board)
 
 
-def deserialize_board(board_str):
-    """Преобразование JSON строки в доску."""
-    if not board_str:
+def deserialize_board(board_data):
+    """Преобразование сохранённой доски в список списков."""
+    board = decode_board(board_data)
+    if board is None:
         return None
-    return json.loads(board_str)
+    return board.to_grid()
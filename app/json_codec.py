@@ -0,0 +1,22 @@
+# app/json_codec.py
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него используется json
+    orjson = None
+
+
+def dumps(obj) -> str:
+    """Кодирование в компактный JSON (orjson, если установлен)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def loads(data):
+    """Разбор JSON; ошибки — json.JSONDecodeError в обоих вариантах."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
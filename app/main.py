@@ -1,27 +1,65 @@
 # app/main.py
 
-from fastapi import (Depends, FastAPI, HTTPException, Request, Response,
-                     WebSocket, status)
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import (Depends, FastAPI, HTTPException, Query, Request,
+                     Response, WebSocket, status)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
-from app.game_logic.game import (get_game_status_logic, join_game_logic,
-                                 start_game_logic)
+from app.db.session import AsyncSessionLocal, get_async_db, get_db
+from app.game_logic.engine import game_engine
+from app.game_logic.game import (add_bot_logic, create_paired_game,
+                                 get_game_status_logic, is_reserved_username,
+                                 join_game_logic, start_game_logic)
+from app.game_logic.lobby import waiting_games
+from app.game_logic.matchmaking import matchmaker
+from app.game_logic.replay import export_game
 from app.models import Game as ModelGame
 from app.models import User as ModelUser
+from app.pages import page_cache
 from app.schemas import Token
 from app.schemas import User as SchemaUser
 from app.schemas import UserCreate, UserLogin
+from app.services.auth_service import (UserPrincipal, decode_token_cached,
+                                       get_principal, invalidate_token,
+                                       invalidate_user)
 from app.services.user_service import get_users
-from app.utils import (create_access_token, decode_token, hash_password,
-                       verify_password)
-from app.websocket_handlers import websocket_endpoint
-
-app = FastAPI(title="Battleship Game API", version="1.0.0")
+from app.utils import (PasswordHasherBusy, create_access_token,
+                       hash_password_async, verify_password_async)
+from app.websocket_handlers import (game_actors, heartbeat, lobby,
+                                    lobby_endpoint, manager, player_sessions,
+                                    spectator_endpoint, sync_game,
+                                    websocket_endpoint)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых служб приложения."""
+    page_cache.load()
+    async with AsyncSessionLocal() as db:
+        await waiting_games.load(db)
+    await game_engine.start(AsyncSessionLocal)
+    await manager.start()
+    lobby.start()
+    heartbeat.start()
+    yield
+    await heartbeat.stop()
+    await lobby.stop()
+    player_sessions.stop()
+    await game_actors.stop_all()
+    await game_engine.stop()
+    await manager.stop()
+
+
+app = FastAPI(title="Battleship Game API", version="1.0.0", lifespan=lifespan)
 
 # Настройка CORS
 origins = [
@@ -47,10 +85,10 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
 ):
-    """Получение текущего пользователя по JWT."""
-    payload = decode_token(token)
+    """Получение текущего пользователя по JWT (с кэшированием)."""
+    payload = decode_token_cached(token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,7 +96,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     username = payload.get("sub")
-    user = db.query(ModelUser).filter(ModelUser.username == username).first()
+    user = await get_principal(username, db)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -68,12 +106,39 @@ async def get_current_user(
     return user
 
 
+def password_busy_error(error: PasswordHasherBusy) -> HTTPException:
+    """Ответ при переполненной очереди хэширования паролей."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={"Retry-After": "1"},
+    )
+
+
+def render_page(request: Request, name: str, **context) -> Response:
+    """HTML-страница из кэша шаблонов."""
+    template = page_cache.get(name)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return template.render(**context).response(request)
+
+
 @app.get("/health")
 def health():
     """Проверка работоспособности приложения."""
     return {"status": "ok", "message": "Battleship API is running"}
 
 
+@app.get("/metrics/websockets")
+def websocket_metrics():
+    """Метрики очередей исходящих WebSocket-сообщений и записи игр."""
+    return {
+        **manager.metrics(),
+        "persistence": game_engine.metrics(),
+        "reaper": heartbeat.metrics(),
+    }
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home_page(request: Request):
     """Главная страница."""
@@ -88,23 +153,19 @@ async def home_page(request: Request):
         print(f"Error getting token: {e}")
 
     if not token:
-        with open("app/static/home.html", "r", encoding="utf-8") as file:
-            return HTMLResponse(content=file.read())
+        return render_page(request, "home.html")
 
-    payload = decode_token(token)
+    payload = decode_token_cached(token)
     if payload is None:
-        with open("app/static/home.html", "r", encoding="utf-8") as file:
-            return HTMLResponse(content=file.read())
+        return render_page(request, "home.html")
 
     username = payload.get("sub")
-    with open("app/static/authenticated_home.html", "r", encoding="utf-8") as file:
-        content = file.read().replace("{{ username }}", username)
-        return HTMLResponse(content=content)
+    return render_page(request, "authenticated_home.html", username=username)
 
 
 @app.post("/games/start/")
 def start_game(
-    current_user: ModelUser = Depends(get_current_user), db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user), db: Session = Depends(get_db)
 ):
     """Создание новой игры."""
     try:
@@ -120,30 +181,58 @@ def start_game(
 
 
 @app.post("/games/join/")
-def join_game(
+async def join_game(
     game_id: int,
-    current_user: ModelUser = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Присоединение второго игрока к игре."""
     try:
-        game = join_game_logic(game_id, current_user.id, db)
-        return {
-            "success": True,
-            "game_id": game.id,
-            "status": game.status,
-            "player1_id": game.player1_id,
-            "player2_id": game.player2_id,
-        }
+        game = await run_in_threadpool(join_game_logic, game_id, current_user.id, db)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Игра в памяти обновляется в цикле событий, а не в потоке пула
+    await sync_game(game.id)
+    return {
+        "success": True,
+        "game_id": game.id,
+        "status": game.status,
+        "player1_id": game.player1_id,
+        "player2_id": game.player2_id,
+    }
+
+
+@app.post("/games/{game_id}/bot/")
+async def add_bot(
+    game_id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Игра против бота: бот присоединяется вторым игроком."""
+    try:
+        game = await run_in_threadpool(add_bot_logic, game_id, current_user.id, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Бота загруженной игры поднимает sync_game, иначе — загрузка игры
+    await sync_game(game.id)
+    return {
+        "success": True,
+        "game_id": game.id,
+        "status": game.status,
+        "player1_id": game.player1_id,
+        "player2_id": game.player2_id,
+    }
+
 
 @app.get("/games/")
 def list_games(
-    current_user: ModelUser = Depends(get_current_user), db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user), db: Session = Depends(get_db)
 ):
     """Получение списка игр пользователя."""
     games = (
@@ -169,22 +258,55 @@ def list_games(
 
 
 @app.get("/games/waiting/")
-def list_waiting_games(db: Session = Depends(get_db)):
-    """Получение списка игр, ожидающих второго игрока."""
-    games = (
-        db.query(ModelGame)
-        .filter(ModelGame.status == "waiting", ModelGame.player2_id.is_(None))
-        .all()
-    )
+def list_waiting_games(
+    offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)
+):
+    """Получение списка игр, ожидающих второго игрока (из памяти)."""
+    return waiting_games.page(offset=offset, limit=limit)
 
-    return [
-        {
-            "id": game.id,
-            "status": game.status,
-            "player1_id": game.player1_id,
-        }
-        for game in games
-    ]
+
+@app.post("/matchmaking/queue/")
+def enqueue_matchmaking(
+    rating: Optional[int] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Постановка в очередь подбора соперника."""
+    opponent_id = matchmaker.enqueue(current_user.id, rating)
+    if opponent_id is None:
+        return {"status": "queued"}
+
+    try:
+        game = create_paired_game(opponent_id, current_user.id, db)
+    except Exception as e:
+        # Соперник возвращается на своё место в очереди, без подбора пары
+        matchmaker.requeue(opponent_id)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    matchmaker.record_match(opponent_id, game.id)
+    return {
+        "status": "matched",
+        "game_id": game.id,
+        "player1_id": game.player1_id,
+        "player2_id": game.player2_id,
+    }
+
+
+@app.get("/matchmaking/queue/")
+def matchmaking_status(current_user: UserPrincipal = Depends(get_current_user)):
+    """Состояние заявки на подбор: matched, queued или not_queued."""
+    game_id = matchmaker.pop_match(current_user.id)
+    if game_id is not None:
+        return {"status": "matched", "game_id": game_id}
+    if matchmaker.is_queued(current_user.id):
+        return {"status": "queued"}
+    return {"status": "not_queued"}
+
+
+@app.delete("/matchmaking/queue/")
+def cancel_matchmaking(current_user: UserPrincipal = Depends(get_current_user)):
+    """Отмена заявки на подбор."""
+    return {"cancelled": matchmaker.cancel(current_user.id)}
 
 
 @app.get("/users/", response_model=list[SchemaUser])
@@ -194,34 +316,51 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
 
 
 @app.post("/register/", response_model=SchemaUser)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Регистрация нового пользователя."""
+    if is_reserved_username(user.username):
+        raise HTTPException(status_code=400, detail="Username is reserved")
+
     # Проверяем, существует ли пользователь
-    existing_user = (
-        db.query(ModelUser).filter(ModelUser.username == user.username).first()
+    result = await db.execute(
+        select(ModelUser.id).where(ModelUser.username == user.username)
     )
-    if existing_user:
+    if result.first():
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    hashed_password = hash_password(user.password)
+    try:
+        hashed_password = await hash_password_async(user.password)
+    except PasswordHasherBusy as e:
+        raise password_busy_error(e)
+
     new_user = ModelUser(username=user.username, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    invalidate_user(new_user.username)
     return new_user
 
 
 @app.post("/token/", response_model=Token)
-def login(
-    response: Response, user_credentials: UserLogin, db: Session = Depends(get_db)
+async def login(
+    response: Response,
+    user_credentials: UserLogin,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Аутентификация пользователя и выдача JWT."""
-    user = (
-        db.query(ModelUser)
-        .filter(ModelUser.username == user_credentials.username)
-        .first()
+    result = await db.execute(
+        select(ModelUser).where(ModelUser.username == user_credentials.username)
     )
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    user = result.scalars().first()
+
+    try:
+        password_ok = user is not None and await verify_password_async(
+            user_credentials.password, user.hashed_password
+        )
+    except PasswordHasherBusy as e:
+        raise password_busy_error(e)
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -235,14 +374,21 @@ def login(
 
 
 @app.post("/auth/logout")
-def logout(response: Response):
+def logout(request: Request, response: Response):
     """Выход из системы."""
+    token = request.cookies.get("authToken")
+    authorization_header = request.headers.get("Authorization")
+    if not token and authorization_header and authorization_header.startswith("Bearer "):
+        token = authorization_header.split(" ")[1]
+    if token:
+        invalidate_token(token)
+
     response.delete_cookie(key="authToken")
     return {"message": "Logged out successfully"}
 
 
 @app.get("/users/me/", response_model=SchemaUser)
-def read_users_me(current_user: ModelUser = Depends(get_current_user)):
+def read_users_me(current_user: UserPrincipal = Depends(get_current_user)):
     """Получение информации о текущем пользователе."""
     return current_user
 
@@ -250,7 +396,7 @@ def read_users_me(current_user: ModelUser = Depends(get_current_user)):
 @app.get("/games/{game_id}/status/")
 def get_game_status(
     game_id: int,
-    current_user: ModelUser = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Получение текущего состояния игры."""
@@ -268,7 +414,39 @@ def get_game_status(
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.get("/games/{game_id}/archive/")
+async def get_game_archive(
+    game_id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Компактный архив завершённой игры: расстановка кораблей и ходы."""
+    game = await db.get(ModelGame, game_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if current_user.id not in (game.player1_id, game.player2_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    archive = await export_game(game_id, db)
+    if archive is None:
+        raise HTTPException(status_code=400, detail="Game is not finished")
+    return Response(archive, media_type="application/octet-stream")
+
+
+# WebSocket лобби (объявлен до /ws/{game_id}, чтобы не конфликтовать с ним)
+@app.websocket("/ws/lobby")
+async def lobby_websocket_handler(websocket: WebSocket):
+    """WebSocket со списком ожидающих игр."""
+    await lobby_endpoint(websocket)
+
+
 # WebSocket endpoint
+@app.websocket("/ws/{game_id}/spectate")
+async def spectator_websocket_handler(websocket: WebSocket, game_id: int):
+    """WebSocket для зрителей игры (только чтение)."""
+    await spectator_endpoint(websocket, game_id)
+
+
 @app.websocket("/ws/{game_id}")
 async def websocket_handler(websocket: WebSocket, game_id: int):
     """WebSocket endpoint для игры."""
@@ -276,22 +454,18 @@ async def websocket_handler(websocket: WebSocket, game_id: int):
 
 
 @app.get("/auth", response_class=HTMLResponse)
-async def auth_page():
+async def auth_page(request: Request):
     """Страница авторизации."""
-    with open("app/static/auth.html", "r", encoding="utf-8") as file:
-        return HTMLResponse(content=file.read())
+    return render_page(request, "auth.html")
 
 
 @app.get("/game", response_class=HTMLResponse)
-async def game_page():
+async def game_page(request: Request):
     """Главная страница игры."""
-    with open("app/static/index.html", "r", encoding="utf-8") as file:
-        return HTMLResponse(content=file.read())
+    return render_page(request, "index.html")
 
 
 @app.get("/game/{game_id}", response_class=HTMLResponse)
-async def game_room_page(game_id: int):
+async def game_room_page(request: Request, game_id: int):
     """Страница конкретной игры."""
-    with open("app/static/game_room.html", "r", encoding="utf-8") as file:
-        content = file.read().replace("{{ game_id }}", str(game_id))
-        return HTMLResponse(content=content)
+    return render_page(request, "game_room.html", game_id=game_id)
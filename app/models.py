@@ -1,9 +1,9 @@
 # app/models.py
 
-from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer, String,
-                        Text)
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Index, Integer,
+                        LargeBinary, SmallInteger, String, text)
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func
 
 from app.db.session import Base
 
@@ -14,6 +14,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    is_bot = Column(Boolean, nullable=False, default=False, server_default=false())  # Служебный пользователь бота
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Связи
@@ -28,18 +29,51 @@ class Game(Base):
     id = Column(Integer, primary_key=True, index=True)
     player1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     player2_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    board_player1 = Column(Text, nullable=True)  # JSON-строка для игрового поля первого игрока
-    board_player2 = Column(Text, nullable=True)  # JSON-строка для игрового поля второго игрока
-    status = Column(String, default="waiting", nullable=False)  # waiting, setup, player1_ready, player2_ready, both_ready, in_progress, finished
+    board_player1 = Column(LargeBinary, nullable=True)  # Упакованное игровое поле первого игрока (encode_board)
+    board_player2 = Column(LargeBinary, nullable=True)  # Упакованное игровое поле второго игрока (encode_board)
+    status = Column(String, default="waiting", nullable=False)  # waiting, setup, player1_ready, player2_ready, both_ready, in_progress, finished, expired
     winner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     turn = Column(Integer, ForeignKey("users.id"), nullable=True)  # Чей ход
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Версия строки для compare-and-swap
 
     # Связи
     player1 = relationship("User", foreign_keys=[player1_id], back_populates="games_as_player1")
     player2 = relationship("User", foreign_keys=[player2_id], back_populates="games_as_player2")
     winner = relationship("User", foreign_keys=[winner_id], back_populates="won_games")
-    
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        # Список игр пользователя: player1_id = :id OR player2_id = :id
+        Index("ix_games_player1_id_status", "player1_id", "status"),
+        Index("ix_games_player2_id_status", "player2_id", "status"),
+        # Лобби: только игры, ожидающие второго игрока
+        Index(
+            "ix_games_waiting",
+            "id",
+            postgresql_where=text("status = 'waiting' AND player2_id IS NULL"),
+            sqlite_where=text("status = 'waiting' AND player2_id IS NULL"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<Game(id={self.id}, status={self.status}, player1_id={self.player1_id}, player2_id={self.player2_id})>"
+
+
+class Move(Base):
+    """Журнал ходов: строки только добавляются, по ним игра воспроизводится."""
+
+    __tablename__ = "moves"
+
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    seq = Column(Integer, primary_key=True)  # Номер хода в игре, с 1
+    player_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    x = Column(SmallInteger, nullable=False)
+    y = Column(SmallInteger, nullable=False)
+    result = Column(String, nullable=False)  # hit, miss
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
     def __repr__(self):
-        return f"<Game(id={self.id}, status={self.status}, player1_id={self.player1_id}, player2_id={self.player2_id})>"
\ No newline at end of file
+        return f"<Move(game_id={self.game_id}, seq={self.seq}, player_id={self.player_id}, x={self.x}, y={self.y})>"
@@ -0,0 +1,162 @@
+# app/pages.py
+
+import gzip
+import hashlib
+import html
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаём gzip
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent / "static"
+
+# Подстановки вида {{ game_id }}
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Сколько отрисованных вариантов шаблона с подстановками держать в памяти
+RENDER_CACHE_SIZE = 1024
+
+
+# Уровни сжатия: тело сжимается при первом запросе с этой кодировкой,
+# поэтому умеренный уровень вместо максимального
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header: str) -> set:
+    """Кодировки из Accept-Encoding, которые клиент принимает (q > 0)."""
+    encodings = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(name)
+    return encodings
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Слабое сравнение If-None-Match: список ETag через запятую или *."""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class PageVariants:
+    """Готовое тело страницы и его сжатые варианты, у каждого свой ETag."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.digest = hashlib.sha1(body).hexdigest()
+        # Сжатые тела создаются по первому запросу с этой кодировкой
+        self.encoded: Dict[str, bytes] = {}
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        if encoding is None:
+            return '"' + self.digest + '"'
+        return '"' + self.digest + "-" + encoding + '"'
+
+    def encode(self, encoding: str) -> bytes:
+        body = self.encoded.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+            self.encoded[encoding] = body
+        return body
+
+    def negotiate(self, request: Request) -> Optional[str]:
+        """Кодировка ответа по Accept-Encoding; None — без сжатия."""
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted or "*" in accepted:
+            return "gzip"
+        return None
+
+    def response(self, request: Request) -> Response:
+        """Ответ с учётом If-None-Match и Accept-Encoding."""
+        encoding = self.negotiate(request)
+        etag = self.etag(encoding)
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is None:
+            return Response(self.body, media_type="text/html", headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self.encode(encoding), media_type="text/html", headers=headers)
+
+
+class PageTemplate:
+    """HTML-шаблон, заранее разбитый на текст и подстановки."""
+
+    def __init__(self, content: str):
+        # Чётные элементы — текст, нечётные — имена подстановок
+        self.parts = PLACEHOLDER.split(content)
+        self.static = None
+        if len(self.parts) == 1:
+            self.static = PageVariants(content.encode("utf-8"))
+        self.rendered: OrderedDict = OrderedDict()
+
+    def render(self, **context) -> PageVariants:
+        """Страница с подстановками; частые варианты берутся из кэша."""
+        if self.static is not None:
+            return self.static
+
+        key = tuple(sorted(context.items()))
+        variants = self.rendered.get(key)
+        if variants is not None:
+            self.rendered.move_to_end(key)
+            return variants
+
+        chunks = list(self.parts)
+        for i in range(1, len(chunks), 2):
+            chunks[i] = html.escape(str(context.get(chunks[i], "")))
+        variants = PageVariants("".join(chunks).encode("utf-8"))
+
+        self.rendered[key] = variants
+        if len(self.rendered) > RENDER_CACHE_SIZE:
+            self.rendered.popitem(last=False)
+        return variants
+
+
+class PageCache:
+    """Все HTML-страницы из app/static, загруженные один раз."""
+
+    def __init__(self, directory: Path = STATIC_DIR):
+        self.directory = directory
+        self.templates: Dict[str, PageTemplate] = {}
+
+    def load(self):
+        for path in self.directory.glob("*.html"):
+            self.templates[path.name] = PageTemplate(path.read_text(encoding="utf-8"))
+
+    def get(self, name: str) -> Optional[PageTemplate]:
+        return self.templates.get(name)
+
+
+page_cache = PageCache()
@@ -0,0 +1,110 @@
+# app/services/auth_service.py
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from app.utils import decode_token
+
+# Время жизни записей кэша авторизации (секунды) и их максимальное число
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Облегчённые данные пользователя без привязки к сессии БД."""
+
+    id: int
+    username: str
+
+
+class TTLCache:
+    """LRU-кэш с ограниченным временем жизни записей."""
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self.items[key]
+            return None
+
+        self.items.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.items[key] = (time.monotonic() + ttl, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def pop(self, key):
+        self.items.pop(key, None)
+
+    def clear(self):
+        self.items.clear()
+
+
+# token -> расшифрованный payload, username -> UserPrincipal
+token_cache = TTLCache()
+principal_cache = TTLCache()
+
+
+def decode_token_cached(token: str) -> Optional[dict]:
+    """Проверка JWT с кэшированием до истечения срока токена."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    payload = decode_token(token)
+    if payload is None:
+        return None
+
+    expires_in = payload.get("exp", 0) - time.time()
+    token_cache.set(token, payload, ttl=expires_in)
+    return payload
+
+
+async def get_principal(username: str, db: AsyncSession) -> Optional[UserPrincipal]:
+    """Пользователь по имени: из кэша или одним запросом к базе."""
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(User.id, User.username).where(User.username == username)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    principal = UserPrincipal(id=row.id, username=row.username)
+    principal_cache.set(username, principal)
+    return principal
+
+
+def invalidate_token(token: str):
+    """Сброс кэша токена (выход из системы)."""
+    token_cache.pop(token)
+
+
+def invalidate_user(username: str):
+    """Сброс кэша пользователя после изменения его данных."""
+    principal_cache.pop(username)
@@ -0,0 +1,147 @@
+# app/simulation.py
+"""Массовые партии бот против бота без HTTP и базы данных.
+
+Партии играются через app.game_logic: расстановка place_ships_auto, ходы
+make_move, конец игры check_winner. Партии делятся на пачки и играются в
+пуле процессов; у каждой партии свой seed, поэтому результат не зависит
+от числа процессов и совпадает между запусками (контрольная сумма).
+
+Запуск: python -m app.simulation [--games 10000] [--workers 4] [--strategy bot]
+"""
+
+import argparse
+import os
+import random
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List
+
+from app.game_logic.board import generate_bitboard, place_ships_auto
+from app.game_logic.bot import BotPlayer
+from app.game_logic.utils import check_winner, make_move
+
+STRATEGIES = ("bot", "random")
+
+
+class RandomShooter:
+    """Стреляет в случайные клетки без повторов."""
+
+    def __init__(self, rng: random.Random, size: int):
+        self.cells = [divmod(cell, size) for cell in range(size * size)]
+        rng.shuffle(self.cells)
+
+    def choose_shot(self, board):
+        return self.cells.pop()
+
+
+@dataclass
+class SimulationResult:
+    """Итоги пачки партий; пачки складываются в общий итог."""
+
+    games: int = 0
+    moves: int = 0
+    wins: List[int] = field(default_factory=lambda: [0, 0])
+    checksum: int = 0
+
+    def add(self, other: "SimulationResult"):
+        self.games += other.games
+        self.moves += other.moves
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.checksum = (self.checksum + other.checksum) & 0xFFFFFFFF
+
+
+def new_game(seed: int, strategy: str):
+    """Доски и стрелки обоих игроков для партии с данным seed."""
+    rng = random.Random(seed)
+    boards = [place_ships_auto(generate_bitboard(), rng=rng) for _ in range(2)]
+    if strategy == "bot":
+        shooters = [BotPlayer(user_id=i, seed=rng.getrandbits(32)) for i in range(2)]
+    else:
+        shooters = [RandomShooter(rng, boards[0].size) for _ in range(2)]
+    return boards, shooters
+
+
+def play_game(seed: int, strategy: str):
+    """Одна партия. Возвращает номер победителя (0 или 1) и число ходов."""
+    boards, shooters = new_game(seed, strategy)
+    turn = 0
+    moves = 0
+    while True:
+        target = boards[1 - turn]
+        x, y = shooters[turn].choose_shot(target)
+        result = make_move(target, x, y)
+        if result not in ("hit", "miss"):
+            raise RuntimeError(f"Unexpected move result {result} in game {seed}")
+        moves += 1
+        if check_winner(target):
+            return turn, moves
+        if result == "miss":
+            turn = 1 - turn
+
+
+def play_chunk(start: int, count: int, seed: int, strategy: str) -> SimulationResult:
+    """Пачка партий с номерами start..start+count-1."""
+    result = SimulationResult()
+    for index in range(start, start + count):
+        winner, moves = play_game(seed * 1_000_003 + index, strategy)
+        result.games += 1
+        result.moves += moves
+        result.wins[winner] += 1
+        # Сумма по партиям не зависит от того, как они поделены на пачки
+        digest = zlib.crc32(f"{index}:{winner}:{moves}".encode())
+        result.checksum = (result.checksum + digest) & 0xFFFFFFFF
+    return result
+
+
+def memory_per_game(strategy: str, sample: int = 200) -> float:
+    """Средний объём состояния одной партии (доски и стрелки), байт."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [new_game(index, strategy) for index in range(sample)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / sample
+
+
+def run(games: int, workers: int, seed: int, strategy: str, chunk: int) -> SimulationResult:
+    total = SimulationResult()
+    chunks = [(start, min(chunk, games - start)) for start in range(0, games, chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(play_chunk, start, count, seed, strategy)
+            for start, count in chunks
+        ]
+        for future in futures:
+            total.add(future.result())
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="bot")
+    parser.add_argument("--chunk", type=int, default=250, help="партий на задачу пула")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = run(args.games, args.workers, args.seed, args.strategy, args.chunk)
+    elapsed = time.perf_counter() - started
+
+    print(f"games:          {result.games}")
+    print(f"workers:        {args.workers}")
+    print(f"games/sec:      {result.games / elapsed:,.1f}")
+    print(f"moves/sec:      {result.moves / elapsed:,.0f}")
+    print(f"moves/game:     {result.moves / result.games:.1f}")
+    print(f"wins p1/p2:     {result.wins[0]}/{result.wins[1]}")
+    print(f"memory/game:    {memory_per_game(args.strategy) / 1024:.1f} KiB")
+    print(f"checksum:       {result.checksum:08x}")
+
+
+if __name__ == "__main__":
+    main()
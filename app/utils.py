@@ -1,5 +1,8 @@
 # app/utils.py
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from jose import JWTError, jwt
@@ -13,6 +16,21 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 300
 # Настройка контекста для хэширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt отпускает GIL, поэтому хэширование выполняется в отдельном пуле
+# потоков, не занимая пул FastAPI. PASSWORD_HASH_MAX_PENDING ограничивает
+# число задач в работе и в очереди: сверх лимита запросы отклоняются.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+password_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь хэширования паролей переполнена."""
+
 
 def hash_password(password: str) -> str:
     """Хэширует пароль."""
@@ -24,6 +42,25 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def _run_password_task(func, *args):
+    if password_slots.locked():
+        raise PasswordHasherBusy("Too many password operations in progress")
+
+    async with password_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    """Хэширует пароль в пуле потоков."""
+    return await _run_password_task(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверяет пароль в пуле потоков."""
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
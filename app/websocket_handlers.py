@@ -1,421 +1,1504 @@
 # app/websocket_handlers.py
 
+import asyncio
 import json
-from typing import Dict, List
+import os
+import random
+import secrets
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from fastapi import WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.broadcast import RemoteHandler, create_broadcast_backend
+from app.db.session import AsyncSessionLocal
+from app.game_logic.bot import (BotPlayer, bot_executor, game_bots,
+                                opponent_view)
+from app.game_logic.engine import SETUP_STATUSES, LiveGame, game_engine
+from app.game_logic.lobby import waiting_games
+from app.json_codec import dumps, loads
+from app.models import Game, User
+from app.services.auth_service import decode_token_cached, get_principal
+from app.ws_protocol import BINARY_PROTOCOL, decode_frame, encode_frame, negotiate
+
+# Размер очереди исходящих сообщений одного соединения
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# После скольких переполнений очереди медленный клиент отключается
+MAX_QUEUE_OVERFLOWS = int(os.getenv("WS_MAX_QUEUE_OVERFLOWS", "3"))
+RESYNC_REQUIRED = dumps({"status": "success", "action": "resync_required"})
+# Сколько ожидающих игр отправляется новому подписчику лобби
+LOBBY_SNAPSHOT_LIMIT = 1000
+# Статусы игр, доступных для просмотра зрителями
+SPECTATOR_STATUSES = ("in_progress", "finished")
+# Размер очереди действий одной игры
+ACTOR_INBOX_SIZE = int(os.getenv("GAME_ACTOR_INBOX_SIZE", "256"))
+# Сколько секунд игра ждёт отключившегося игрока, прежде чем сообщить
+# сопернику; длина токена возобновления (байт)
+RESUME_GRACE_PERIOD = float(os.getenv("WS_RESUME_GRACE_PERIOD", "15"))
+RESUME_TOKEN_BYTES = 24
+# Интервал пингов и проверки соединений (секунды) и сколько клиент может
+# молчать, прежде чем соединение будет закрыто. Клиент отвечает на ping
+# сообщением pong (или любым другим).
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+PING = dumps({"status": "success", "action": "ping"})
+# Сколько секунд живёт владение игрой без продления (продлевает Heartbeat)
+OWNER_TTL = 3 * HEARTBEAT_INTERVAL
+
+
+class ClientConnection:
+    """WebSocket-соединение с собственной очередью исходящих сообщений.
+
+    Сообщения ставятся в ограниченную очередь без ожидания сокета, а
+    отправляет их отдельная задача-писатель, поэтому медленный клиент
+    не задерживает доставку остальным. При переполнении очередь
+    сбрасывается и клиенту отправляется resync_required (он запросит
+    снимок состояния), а после MAX_QUEUE_OVERFLOWS переполнений
+    соединение закрывается.
+
+    Клиентам протокола battleship.bin события, у которых есть бинарный
+    кадр, отправляются кадром, остальное — JSON-текстом.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int = SEND_QUEUE_SIZE,
+        binary: bool = False,
+    ):
+        self.websocket = websocket
+        self.binary = binary
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.dropped = 0
+        self.overflows = 0
+        self.writer = asyncio.create_task(self._write())
+
+    def send(self, message: str) -> bool:
+        """Постановка сообщения в очередь. False, если соединение закрыто."""
+        if self.closed:
+            return False
 
-from app.db.session import SessionLocal
-from app.game_logic.board import generate_board, place_ship_manual
-from app.game_logic.utils import (check_winner, deserialize_board, make_move,
-                                  serialize_board)
-from app.models import Game as ModelGame
-from app.models import User as ModelUser
-from app.utils import decode_token
+        try:
+            self.queue.put_nowait(encode_frame(message) if self.binary else message)
+        except asyncio.QueueFull:
+            self._overflow()
+        return not self.closed
+
+    def _overflow(self):
+        self.overflows += 1
+        # Вместе с текущим сообщением теряется всё, что было в очереди
+        self.dropped += self.queue.qsize() + 1
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+        if self.overflows >= MAX_QUEUE_OVERFLOWS:
+            self.close(code=1013, reason="Client is too slow")
+        else:
+            self.queue.put_nowait(RESYNC_REQUIRED)
+
+    async def _write(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            self.closed = True
+
+    def close(self, code: int = 1000, reason: str = ""):
+        """Остановка писателя и закрытие сокета."""
+        if self.closed and self.writer.done():
+            return
+        self.closed = True
+        self.writer.cancel()
+        asyncio.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def stop(self):
+        """Остановка писателя после отключения клиента."""
+        self.closed = True
+        self.writer.cancel()
 
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, backend=None):
         self.active_connections: Dict[int, List[WebSocket]] = (
             {}
         )  # game_id -> list of websockets
         self.user_connections: Dict[int, Dict[int, WebSocket]] = (
             {}
         )  # game_id -> {user_id: websocket}
+        self.clients: Dict[WebSocket, ClientConnection] = {}  # websocket -> очередь
+        # game_id -> {websocket: очередь} зрителей игры
+        self.spectators: Dict[int, Dict[WebSocket, ClientConnection]] = {}
+        # Рассылка между воркерами (по умолчанию — только внутри процесса)
+        self.backend = backend or create_broadcast_backend()
+        # Обработчики служебных сообщений других воркеров: kind -> обработчик
+        self.remote_handlers: Dict[str, RemoteHandler] = {}
+        # game_id -> {user_id: время последнего сообщения} игроков, которые
+        # подключены к другим воркерам, а игрой владеет этот
+        self.remote_players: Dict[int, Dict[int, float]] = {}
+        # Статистика уже закрытых соединений
+        self.dropped_messages = 0
+        self.queue_overflows = 0
+        self.reaped_connections = 0
+
+    async def start(self):
+        await self.backend.start(self.handle_remote)
+
+    async def stop(self):
+        await self.backend.stop()
 
     async def connect(self, websocket: WebSocket, game_id: int, user_id: int):
-        await websocket.accept()
+        client = await self._accept(websocket)
         if game_id not in self.active_connections:
             self.active_connections[game_id] = []
             self.user_connections[game_id] = {}
 
         self.active_connections[game_id].append(websocket)
         self.user_connections[game_id][user_id] = websocket
+        self.clients[websocket] = client
 
-    def disconnect(self, websocket: WebSocket, game_id: int, user_id: int):
-        if game_id in self.active_connections:
-            if websocket in self.active_connections[game_id]:
-                self.active_connections[game_id].remove(websocket)
+    async def _accept(self, websocket: WebSocket) -> ClientConnection:
+        """Принятие соединения с протоколом, выбранным клиентом."""
+        protocol = negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=protocol)
+        return ClientConnection(websocket, binary=protocol == BINARY_PROTOCOL)
+
+    def _drop_client(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
+            self.dropped_messages += client.dropped
+            self.queue_overflows += client.overflows
 
-            if (
-                game_id in self.user_connections
-                and user_id in self.user_connections[game_id]
-            ):
-                del self.user_connections[game_id][user_id]
+    def disconnect(self, websocket: WebSocket, game_id: int, user_id: int):
+        self._drop_client(websocket)
+        self._forget(websocket, game_id)
 
-            if not self.active_connections[game_id]:
-                del self.active_connections[game_id]
-                if game_id in self.user_connections:
-                    del self.user_connections[game_id]
+    def _forget(self, websocket: WebSocket, game_id: int):
+        """Удаление сокета игрока из обеих таблиц игры."""
+        connections = self.active_connections.get(game_id)
+        if connections is None:
+            return
+        if websocket in connections:
+            connections.remove(websocket)
+
+        # Пользователь мог уже переподключиться новым сокетом, поэтому
+        # удаляется только запись, указывающая на этот сокет
+        users = self.user_connections.get(game_id, {})
+        for user_id in [user_id for user_id, ws in users.items() if ws is websocket]:
+            del users[user_id]
+
+        if not connections:
+            del self.active_connections[game_id]
+            self.user_connections.pop(game_id, None)
+
+    def reap(self) -> int:
+        """Удаление закрытых соединений, которые ещё числятся в таблицах.
+
+        Возвращает число удалённых соединений.
+        """
+        closed = [ws for ws, client in self.clients.items() if client.closed]
+        for websocket in closed:
+            self._drop_client(websocket)
+
+        for game_id, connections in list(self.active_connections.items()):
+            for websocket in [ws for ws in connections if ws not in self.clients]:
+                self._forget(websocket, game_id)
+        for game_id, watchers in list(self.spectators.items()):
+            for websocket in [ws for ws in watchers if ws not in self.clients]:
+                self.disconnect_spectator(websocket, game_id)
+
+        self.reaped_connections += len(closed)
+        return len(closed)
+
+    def ping(self):
+        """Пинг всех соединений; ответ клиента продлевает его таймаут."""
+        for client in list(self.clients.values()):
+            client.send(PING)
+
+    def is_connected(self, game_id: int, user_id: int) -> bool:
+        return user_id in self.user_connections.get(
+            game_id, {}
+        ) or user_id in self.remote_players.get(game_id, {})
+
+    def connected_games(self) -> Set[int]:
+        """Игры, к которым подключён хотя бы один игрок (здесь или через другой воркер)."""
+        return set(self.active_connections) | set(self.remote_players)
+
+    def touch_remote(self, game_id: int, user_id: int) -> bool:
+        """Сообщение от игрока с другого воркера. True, если он только что появился."""
+        players = self.remote_players.setdefault(game_id, {})
+        joined = user_id not in players
+        players[user_id] = time.monotonic()
+        return joined
+
+    def forget_remote(self, game_id: int, user_id: int):
+        players = self.remote_players.get(game_id)
+        if players is not None:
+            players.pop(user_id, None)
+            if not players:
+                del self.remote_players[game_id]
+
+    def reap_remote(self) -> List[Tuple[int, int]]:
+        """Удалённые игроки, от которых ничего не приходило дольше IDLE_TIMEOUT
+        (их воркер мог упасть); они удаляются из таблицы."""
+        cutoff = time.monotonic() - IDLE_TIMEOUT
+        silent = [
+            (game_id, user_id)
+            for game_id, players in self.remote_players.items()
+            for user_id, seen in players.items()
+            if seen < cutoff
+        ]
+        for game_id, user_id in silent:
+            self.forget_remote(game_id, user_id)
+        return silent
+
+    async def connect_spectator(self, websocket: WebSocket, game_id: int):
+        client = await self._accept(websocket)
+        self.clients[websocket] = client
+        self.spectators.setdefault(game_id, {})[websocket] = client
+
+    def disconnect_spectator(self, websocket: WebSocket, game_id: int):
+        self._drop_client(websocket)
+        watchers = self.spectators.get(game_id)
+        if watchers is not None:
+            watchers.pop(websocket, None)
+            if not watchers:
+                del self.spectators[game_id]
+
+    def _enqueue(self, message: str, websocket: WebSocket) -> bool:
+        client = self.clients.get(websocket)
+        if client is None:
+            return False
+        return client.send(message)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
+        # Действия ботов выполняются без соединения: ответ никому не нужен
+        if websocket is None:
+            return
+        if websocket in self.clients:
+            self._enqueue(message, websocket)
+            return
+
         try:
             await websocket.send_text(message)
         except Exception as e:
             print(f"Error sending personal message: {e}")
 
     async def send_to_user(self, message: str, game_id: int, user_id: int):
+        if not self._send_local_user(message, game_id, user_id):
+            # Пользователь подключён к другому воркеру
+            await self.backend.publish(game_id, message, user_id=user_id)
+
+    async def broadcast_to_game(
+        self, message: str, game_id: int, exclude_user: int = None
+    ):
+        self._broadcast_local(message, game_id, exclude_user)
+        await self.backend.publish(game_id, message, exclude_user=exclude_user)
+
+    def on_remote(self, kind: str, handler: RemoteHandler):
+        """Обработчик служебных сообщений вида kind от других воркеров."""
+        self.remote_handlers[kind] = handler
+
+    async def handle_remote(self, envelope: dict):
+        """Доставка сообщения, опубликованного другим воркером."""
+        kind = envelope.get("kind", "message")
+        if kind != "message":
+            handler = self.remote_handlers.get(kind)
+            if handler is not None:
+                await handler(envelope)
+            return
+
+        game_id = envelope["game_id"]
+        if envelope["user_id"] is not None:
+            self._send_local_user(envelope["message"], game_id, envelope["user_id"])
+        else:
+            self._broadcast_local(
+                envelope["message"], game_id, envelope["exclude_user"]
+            )
+
+    def _send_local_user(self, message: str, game_id: int, user_id: int) -> bool:
         if (
             game_id in self.user_connections
             and user_id in self.user_connections[game_id]
         ):
             websocket = self.user_connections[game_id][user_id]
-            try:
-                await websocket.send_text(message)
-            except Exception as e:
-                print(f"Error sending message to user {user_id}: {e}")
+            if not self._enqueue(message, websocket):
+                print(f"Error sending message to user {user_id}: connection closed")
+            return True
+        return False
 
-    async def broadcast_to_game(
-        self, message: str, game_id: int, exclude_user: int = None
-    ):
+    def _broadcast_local(self, message: str, game_id: int, exclude_user: int = None):
         if game_id in self.active_connections:
             disconnected = []
             for user_id, connection in self.user_connections.get(game_id, {}).items():
                 if exclude_user and user_id == exclude_user:
                     continue
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    print(f"Error broadcasting to user {user_id}: {e}")
+                if not self._enqueue(message, connection):
+                    print(f"Error broadcasting to user {user_id}: connection closed")
                     disconnected.append(connection)
 
             # Удаляем отключенные соединения
             for conn in disconnected:
-                if conn in self.active_connections[game_id]:
-                    self.active_connections[game_id].remove(conn)
+                self._drop_client(conn)
+                self._forget(conn, game_id)
+
+        self._broadcast_spectators(message, game_id)
+
+    def _broadcast_spectators(self, message: str, game_id: int):
+        """Рассылка события зрителям: одна и та же строка во все очереди."""
+        watchers = self.spectators.get(game_id)
+        if not watchers:
+            return
+        for client in list(watchers.values()):
+            # Закрытые медленные зрители удаляются при отключении
+            client.send(message)
+
+    def metrics(self) -> dict:
+        """Глубина очередей и счётчики потерянных сообщений."""
+        depths = [client.queue.qsize() for client in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "spectators": sum(len(watchers) for watchers in self.spectators.values()),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self.dropped_messages
+            + sum(client.dropped for client in self.clients.values()),
+            "queue_overflows": self.queue_overflows
+            + sum(client.overflows for client in self.clients.values()),
+            "reaped_connections": self.reaped_connections,
+            "remote_players": sum(len(players) for players in self.remote_players.values()),
+        }
 
 
 manager = ConnectionManager()
 
 
-async def websocket_endpoint(websocket: WebSocket, game_id: int):
-    """Обработка WebSocket-соединений с проверкой JWT."""
+class LobbyManager:
+    """Подписчики лобби, которым рассылаются изменения списка ожидающих игр.
+
+    Событие кодируется один раз и ставится в очереди всех подключений.
+    Изменения лобби происходят и в пуле потоков (синхронные маршруты),
+    поэтому рассылка всегда переносится в цикл событий. Изменения этого
+    воркера по порядку публикуются остальным, а их изменения
+    применяются к индексу и рассылаются здешним подписчикам.
+    """
+
+    def __init__(self):
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.outbox: Optional[asyncio.Queue] = None
+        self.publisher: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.outbox = asyncio.Queue()
+        self.publisher = asyncio.create_task(self._publish())
+        waiting_games.subscribe(self.notify)
+
+    async def stop(self):
+        if self.publisher is not None:
+            self.publisher.cancel()
+            try:
+                await self.publisher
+            except asyncio.CancelledError:
+                pass
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        client = ClientConnection(websocket)
+        self.clients[websocket] = client
+        client.send(
+            dumps(
+                {
+                    "status": "success",
+                    "action": "lobby_state",
+                    "games": waiting_games.page(limit=LOBBY_SNAPSHOT_LIMIT),
+                }
+            )
+        )
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
+
+    def notify(self, event: dict):
+        """Приём события от индекса ожидающих игр (из любого потока)."""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._local_event, event)
+
+    def _local_event(self, event: dict):
+        self.deliver(event)
+        self.outbox.put_nowait(event)
+
+    def deliver(self, event: dict):
+        """Рассылка события лобби подписчикам этого воркера."""
+        self._fan_out(dumps({"status": "success", **event}))
+
+    async def _publish(self):
+        """Публикация изменений лобби другим воркерам в порядке событий."""
+        while True:
+            event = await self.outbox.get()
+            try:
+                await manager.backend.announce({"kind": "lobby", "event": event})
+            except Exception as e:
+                print(f"Error publishing lobby event: {e}")
+
+    def _fan_out(self, message: str):
+        closed = [
+            websocket
+            for websocket, client in self.clients.items()
+            if not client.send(message)
+        ]
+        for websocket in closed:
+            self.disconnect(websocket)
+
+    def ping(self):
+        """Пинг подписчиков; закрытые соединения удаляются."""
+        self._fan_out(PING)
+
+
+lobby = LobbyManager()
+
+
+async def lobby_endpoint(websocket: WebSocket):
+    """WebSocket лобби: список ожидающих игр и его изменения."""
+    await lobby.connect(websocket)
+    try:
+        while True:
+            # Клиент присылает только pong, ждём отключения или таймаута
+            try:
+                await receive_message(websocket)
+            except ValueError:
+                pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        lobby.disconnect(websocket)
+
+
+class GameActor:
+    """Задача, которая единолично владеет игрой и выполняет её действия.
+
+    Сообщения обоих игроков попадают в одну очередь и обрабатываются по
+    одному, поэтому действия игроков не пересекаются, а состояние игры
+    не нужно перечитывать из базы. У актора своя сессия БД для записи.
+    """
+
+    def __init__(self, game: LiveGame):
+        self.game = game
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=ACTOR_INBOX_SIZE)
+        self.db: AsyncSession = AsyncSessionLocal()
+        self.task = asyncio.create_task(self._run())
+
+    def submit(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        message: dict,
+        done: Optional[asyncio.Future] = None,
+    ) -> bool:
+        """Постановка действия в очередь. False, если очередь переполнена.
+
+        done завершается, когда действие выполнено.
+        """
+        try:
+            self.inbox.put_nowait((websocket, user_id, message, done))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _run(self):
+        self.wake_bots()
+        while True:
+            item = await self.inbox.get()
+            if item is None:
+                break
+
+            websocket, user_id, message, done = item
+            try:
+                await dispatch_action(websocket, self.game, user_id, message, self.db)
+            except Exception as e:
+                print(f"WebSocket error: {e}")
+                # Незавершённая транзакция не должна держать соединение
+                await self.db.rollback()
+                await send_error(websocket, str(e))
+
+            if done is not None and not done.done():
+                done.set_result(None)
+            # Актор мог уже смениться: будится тот, что владеет игрой сейчас
+            game_actors.wake(self.game.id)
+
+    def wake_bots(self):
+        """Ход ботов игры, если сейчас их очередь.
+
+        Боты отправляют действия в ту же очередь, что и игроки, без
+        WebSocket: ответы им не нужны, они смотрят на состояние игры.
+        """
+        game = self.game
+        if game.status == "finished":
+            game_bots.remove(game.id)
+            return
+
+        for bot in game_bots.of(game.id):
+            if bot.busy:
+                continue
+            if game.status in SETUP_STATUSES[1:] and not bot.prepared:
+                bot.prepared = True
+                self.submit(None, bot.user_id, {"action": "randomize_fleet"})
+                self.submit(None, bot.user_id, {"action": "ready"})
+            elif game.status == "in_progress" and game.turn == bot.user_id:
+                bot.pending = asyncio.get_running_loop().create_future()
+                asyncio.create_task(self._bot_move(bot, bot.pending))
+
+    async def _bot_move(self, bot: BotPlayer, pending: asyncio.Future):
+        # Ход считается в пуле потоков по копии выстрелов по доске соперника,
+        # без его кораблей
+        board = opponent_view(self.game.board_of(self.game.opponent_of(bot.user_id)))
+        loop = asyncio.get_running_loop()
+        try:
+            x, y = await loop.run_in_executor(bot_executor, bot.choose_shot, board)
+        except Exception as e:
+            print(f"Bot error in game {self.game.id}: {e}")
+            pending.set_result(None)
+            return
+        # Пока считался ход, актор игры мог смениться или остановиться
+        actor = game_actors.actors.get(self.game.id)
+        move = {"action": "make_move", "x": x, "y": y}
+        if actor is None or not actor.submit(None, bot.user_id, move, pending):
+            pending.set_result(None)
+
+    async def stop(self):
+        """Обработка оставшихся сообщений и остановка задачи."""
+        await self.inbox.put(None)
+        await self.task
+
+
+class GameActors:
+    """Реестр акторов активных игр процесса."""
+
+    def __init__(self):
+        self.actors: Dict[int, GameActor] = {}
+
+    def get(self, game: LiveGame) -> GameActor:
+        actor = self.actors.get(game.id)
+        if actor is None:
+            actor = self.actors[game.id] = GameActor(game)
+        return actor
+
+    async def stop(self, game_id: int) -> bool:
+        """Остановка актора, сохранение и выгрузка игры. False, если актора нет."""
+        actor = self.actors.pop(game_id, None)
+        if actor is None:
+            return False
+
+        try:
+            await actor.stop()
+            # Пока актор доделывал работу, игрок мог переподключиться
+            if game_id not in self.actors:
+                await game_engine.release(game_id, actor.db)
+        finally:
+            await actor.db.close()
+        return True
+
+    def wake(self, game_id: int):
+        """Проверка ботов игры после изменений вне актора."""
+        actor = self.actors.get(game_id)
+        if actor is not None:
+            actor.wake_bots()
+
+    async def stop_all(self):
+        """Остановка всех акторов при завершении приложения."""
+        for game_id in list(self.actors):
+            await self.stop(game_id)
+
+
+game_actors = GameActors()
+
+
+class PlayerSession:
+    """Подключение игрока к игре, которое переживает обрыв сокета."""
+
+    def __init__(self, game_id: int, user_id: int):
+        self.game_id = game_id
+        self.user_id = user_id
+        self.token: Optional[str] = None
+        # Задача, которая по истечении паузы объявит игрока ушедшим
+        self.expiry: Optional[asyncio.Task] = None
+        # Соперник уже получил player_disconnected
+        self.announced = False
+
+
+class PlayerSessions:
+    """Сессии игроков с токенами возобновления.
+
+    При каждом подключении игрок получает одноразовый токен. После обрыва
+    сокета игра и её актор остаются в памяти RESUME_GRACE_PERIOD секунд:
+    клиент, вернувшийся с токеном и номером последнего полученного
+    события, подключается без проверки JWT и запросов к базе и получает
+    только пропущенные события. Соперник узнаёт об отключении, только
+    если игрок не вернулся за это время.
+    """
+
+    def __init__(self, grace_period: float = RESUME_GRACE_PERIOD):
+        self.grace_period = grace_period
+        self.sessions: Dict[Tuple[int, int], PlayerSession] = {}
+        self.tokens: Dict[str, PlayerSession] = {}
+
+    def attach(self, game_id: int, user_id: int) -> PlayerSession:
+        """Подключение игрока: отмена ожидания и новый токен."""
+        session = self.sessions.get((game_id, user_id))
+        if session is None:
+            session = self.sessions[(game_id, user_id)] = PlayerSession(game_id, user_id)
+        if session.expiry is not None:
+            session.expiry.cancel()
+            session.expiry = None
+        self.tokens.pop(session.token, None)
+        session.token = secrets.token_urlsafe(RESUME_TOKEN_BYTES)
+        self.tokens[session.token] = session
+        return session
+
+    def resume(self, token: Optional[str], game_id: int) -> Optional[PlayerSession]:
+        """Сессия по токену возобновления, если он выдан для этой игры."""
+        session = self.tokens.get(token) if token else None
+        if session is None or session.game_id != game_id:
+            return None
+        return session
+
+    def detach(self, session: PlayerSession, on_expire: Callable[[PlayerSession], Awaitable]):
+        """Сокет игрока закрыт: ждём его возвращения, затем on_expire."""
+        if session.expiry is not None:
+            session.expiry.cancel()
+        session.expiry = asyncio.create_task(self._expire(session, on_expire))
+
+    async def _expire(self, session: PlayerSession, on_expire):
+        await asyncio.sleep(self.grace_period)
+        session.expiry = None
+        self.tokens.pop(session.token, None)
+        session.token = None
+        await on_expire(session)
+
+    def pending(self, game_id: int) -> bool:
+        """Есть ли в игре отключившиеся игроки, которые ещё могут вернуться."""
+        return any(
+            session.expiry is not None
+            for (session_game, _), session in self.sessions.items()
+            if session_game == game_id
+        )
+
+    def forget(self, game_id: int):
+        """Удаление сессий выгруженной игры."""
+        for key in [key for key in self.sessions if key[0] == game_id]:
+            session = self.sessions.pop(key)
+            if session.expiry is not None:
+                session.expiry.cancel()
+            self.tokens.pop(session.token, None)
+
+    def stop(self):
+        """Отмена ожиданий при завершении приложения."""
+        for session in self.sessions.values():
+            if session.expiry is not None:
+                session.expiry.cancel()
+        self.sessions.clear()
+        self.tokens.clear()
+
+
+player_sessions = PlayerSessions()
+
+
+async def authenticate(
+    websocket: WebSocket, game_id: int, db: AsyncSession
+) -> Optional[Tuple[LiveGame, int]]:
+    """Проверка JWT и участия в игре. None — соединение уже закрыто.
+
+    Игра только читается (из памяти или из базы): загружает её в движок
+    воркер-владелец, и только после проверки.
+    """
     # Получаем токен из query параметров
     token = websocket.query_params.get("token")
     if not token:
         await websocket.close(code=1008, reason="Token is required")
-        return
+        return None
 
-    payload = decode_token(token)
+    payload = decode_token_cached(token)
     if payload is None:
         await websocket.close(code=1008, reason="Invalid token")
-        return
+        return None
+
+    # Получаем игру: из памяти или из базы данных
+    game = await game_engine.peek(game_id, db)
+    if not game:
+        await websocket.close(code=1008, reason="Game not found")
+        return None
+
+    # Получаем пользователя
+    user = await get_principal(payload.get("sub"), db)
+    if not user:
+        await websocket.close(code=1008, reason="User not found")
+        return None
+
+    # Проверяем, является ли пользователь участником игры
+    if not game.is_participant(user.id):
+        await websocket.close(
+            code=1008, reason="You are not a participant of this game"
+        )
+        return None
 
-    username = payload.get("sub")
-    db: Session = SessionLocal()
+    return game, user.id
 
-    try:
-        # Получаем игру из базы данных
-        game = db.query(ModelGame).filter(ModelGame.id == game_id).first()
-        if not game:
-            await websocket.close(code=1008, reason="Game not found")
-            return
 
-        # Получаем пользователя
-        user = db.query(ModelUser).filter(ModelUser.username == username).first()
-        if not user:
-            await websocket.close(code=1008, reason="User not found")
-            return
-
-        # Проверяем, является ли пользователь участником игры
-        if game.player1_id != user.id and game.player2_id != user.id:
-            await websocket.close(
-                code=1008, reason="You are not a participant of this game"
-            )
-            return
+async def websocket_endpoint(websocket: WebSocket, game_id: int):
+    """Обработка WebSocket-соединений с проверкой JWT.
 
-        await manager.connect(websocket, game_id, user.id)
+    Клиент с токеном возобновления (resume) и номером последнего
+    полученного события (since) подключается к игре в памяти без
+    проверки JWT и получает только пропущенные события. Если игрой
+    владеет другой воркер, действия игрока пересылаются ему.
 
-        # Инициализируем игровые поля если они не созданы
-        if not game.board_player1:
-            game.board_player1 = serialize_board(generate_board())
-        if not game.board_player2:
-            game.board_player2 = serialize_board(generate_board())
+    Сессия БД нужна только на время проверки и загрузки игры: открытый
+    сокет не держит соединение из пула.
+    """
+    user_id = None
+    route = None
 
-        # Инициализируем статусы готовности
-        if not hasattr(game, "player1_ready"):
-            game.player1_ready = False
-        if not hasattr(game, "player2_ready"):
-            game.player2_ready = False
+    try:
+        session = player_sessions.resume(websocket.query_params.get("resume"), game_id)
+        async with AsyncSessionLocal() as db:
+            if session is not None:
+                # Токен возобновления выдан после проверки JWT
+                game, player_id = game_engine.get(game_id), session.user_id
+            else:
+                authenticated = await authenticate(websocket, game_id, db)
+                if authenticated is None:
+                    return
+                game, player_id = authenticated
+
+            # Владение игрой берётся только для проверенного участника
+            owner = await claim_game(game_id)
+            if owner is None:
+                if game is not None:
+                    game = game_engine.adopt(game)
+                else:
+                    game = await game_engine.load(game_id, db)
+                if game is None:
+                    await websocket.close(code=1008, reason="Game not found")
+                    return
+                await restore_bots(game, db)
+        user_id = player_id
+
+        since = websocket.query_params.get("since", "")
+        epoch = websocket.query_params.get("epoch", "")
+        if session is not None and since.isdigit():
+            first_action = {
+                "action": "resync",
+                "since": int(since),
+                "epoch": int(epoch) if epoch.isdigit() else None,
+            }
+        else:
+            first_action = {"action": "get_state"}
 
-        db.commit()
+        await manager.connect(websocket, game_id, user_id)
+        route = PlayerRoute(websocket, game_id, user_id, owner)
+        if owner is None:
+            game_actors.get(game)
+            session = await player_joined(game, user_id)
+        else:
+            # О возвращении игрока соперникам сообщит владелец игры
+            session = player_sessions.attach(game_id, user_id)
+        await manager.send_personal_message(
+            dumps(
+                {
+                    "status": "success",
+                    "action": "session",
+                    "resume_token": session.token,
+                    "grace_period": player_sessions.grace_period,
+                }
+            ),
+            websocket,
+        )
 
-        # Отправляем текущее состояние игры
-        await send_game_state(websocket, game, user.id)
+        # Отправляем состояние игры или пропущенные события (через актора,
+        # по очереди с ходами)
+        await route.submit(first_action)
 
         while True:
             try:
-                data = await websocket.receive_text()
-                message = json.loads(data)
-                action = message.get("action")
-
-                # Обновляем состояние игры из БД
-                db.refresh(game)
-
-                if action == "place_ship":
-                    await handle_place_ship(websocket, game, user.id, message, db)
-                elif action == "ready":
-                    await handle_player_ready(websocket, game, user.id, db)
-                elif action == "make_move":
-                    await handle_make_move(websocket, game, user.id, message, db)
-                elif action == "get_state":
-                    await send_game_state(websocket, game, user.id)
-                else:
-                    await manager.send_personal_message(
-                        json.dumps(
-                            {"status": "error", "message": f"Unknown action: {action}"}
-                        ),
-                        websocket,
-                    )
+                message = await receive_message(websocket)
+                if message.get("action") == "pong":
+                    # Владелец игры на другом воркере тоже должен знать,
+                    # что игрок на месте
+                    if route.owner is not None:
+                        await route.submit(message)
+                    continue
+                if not await route.submit(message):
+                    await send_error(websocket, "Too many pending actions")
 
             except WebSocketDisconnect:
                 break
             except json.JSONDecodeError:
                 await manager.send_personal_message(
-                    json.dumps({"status": "error", "message": "Invalid JSON"}),
+                    dumps({"status": "error", "message": "Invalid JSON"}),
                     websocket,
                 )
-            except Exception as e:
-                print(f"WebSocket error: {e}")
-                await manager.send_personal_message(
-                    json.dumps({"status": "error", "message": str(e)}), websocket
-                )
+            except ValueError as e:
+                await send_error(websocket, str(e))
 
     except Exception as e:
         print(f"WebSocket connection error: {e}")
     finally:
-        manager.disconnect(websocket, game_id, user.id)
-        db.close()
+        if user_id is not None:
+            manager.disconnect(websocket, game_id, user_id)
+            if route is not None:
+                await route.leave()
+            player_left(game_id, user_id)
+        async with AsyncSessionLocal() as db:
+            await release_if_abandoned(game_id, db)
+
+
+async def claim_game(game_id: int, stale: Optional[str] = None) -> Optional[str]:
+    """Воркер, владеющий игрой; None — этот воркер (игра захвачена им).
+
+    stale — владелец, который перестал отвечать.
+    """
+    if game_id in game_actors.actors:
+        return None
+    owner = await manager.backend.claim(game_id, OWNER_TTL, stale)
+    return None if owner == manager.backend.origin else owner
+
+
+async def load_actor(game_id: int) -> Optional[GameActor]:
+    """Актор игры этого воркера; игра загружается из базы, если её нет в памяти."""
+    actor = game_actors.actors.get(game_id)
+    if actor is not None:
+        return actor
+    async with AsyncSessionLocal() as db:
+        game = await game_engine.load(game_id, db)
+        if game is None:
+            return None
+        await restore_bots(game, db)
+    return game_actors.get(game)
+
+
+class PlayerRoute:
+    """Куда уходят действия игрока: актору игры на этом воркере или
+    воркеру-владельцу через рассылку."""
+
+    def __init__(
+        self, websocket: WebSocket, game_id: int, user_id: int, owner: Optional[str]
+    ):
+        self.websocket = websocket
+        self.game_id = game_id
+        self.user_id = user_id
+        self.owner = owner
 
+    async def submit(self, message: dict) -> bool:
+        """Отправка действия. False, если очередь актора переполнена."""
+        while True:
+            if self.owner is None:
+                actor = await load_actor(self.game_id)
+                if actor is None:
+                    raise ValueError("Game not found")
+                return actor.submit(self.websocket, self.user_id, message)
+
+            envelope = {
+                "kind": "action",
+                "game_id": self.game_id,
+                "user_id": self.user_id,
+                "message": message,
+            }
+            if await manager.backend.send(self.owner, envelope):
+                return True
+            # Владелец не отвечает — игру забирает этот или другой живой воркер
+            self.owner = await claim_game(self.game_id, stale=self.owner)
+
+    async def leave(self):
+        """Сообщение владельцу игры об отключении игрока."""
+        if self.owner is not None:
+            await manager.backend.send(
+                self.owner, {"kind": "leave", "game_id": self.game_id, "user_id": self.user_id}
+            )
 
-async def handle_place_ship(
-    websocket: WebSocket, game: ModelGame, user_id: int, message: dict, db: Session
-):
-    """Обработка размещения корабля."""
-    if game.status not in ["setup", "waiting"]:
-        await manager.send_personal_message(
-            json.dumps(
-                {
-                    "status": "error",
-                    "message": "Cannot place ships in current game state",
-                }
-            ),
-            websocket,
-        )
+
+class RemotePlayer:
+    """Игрок, подключённый к другому воркеру, на месте WebSocket в
+    действиях актора: личные ответы ему уходят через рассылку."""
+
+    def __init__(self, game_id: int, user_id: int):
+        self.game_id = game_id
+        self.user_id = user_id
+
+    async def send_text(self, message: str):
+        await manager.send_to_user(message, self.game_id, self.user_id)
+
+
+async def handle_remote_action(envelope: dict):
+    """Действие игрока, который подключён к другому воркеру."""
+    game_id, user_id, message = envelope["game_id"], envelope["user_id"], envelope["message"]
+    owner = await claim_game(game_id)
+    if owner is not None:
+        # Игру успел забрать другой воркер — действие уходит к нему
+        await manager.backend.send(owner, envelope)
+        return
+    actor = await load_actor(game_id)
+    if actor is None:
         return
 
-    x, y = message.get("x"), message.get("y")
-    size = message.get("size")
-    orientation = message.get("orientation")
+    if manager.touch_remote(game_id, user_id):
+        await player_joined(actor.game, user_id)
+    if message.get("action") == "pong":
+        return
+    player = RemotePlayer(game_id, user_id)
+    if not actor.submit(player, user_id, message):
+        await send_error(player, "Too many pending actions")
 
-    if None in [x, y, size, orientation]:
-        await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Missing required parameters"}),
-            websocket,
+
+async def handle_remote_leave(envelope: dict):
+    """Игрок, подключённый к другому воркеру, отключился."""
+    game_id, user_id = envelope["game_id"], envelope["user_id"]
+    manager.forget_remote(game_id, user_id)
+    player_left(game_id, user_id)
+    async with AsyncSessionLocal() as db:
+        await release_if_abandoned(game_id, db)
+
+
+async def handle_remote_lobby(envelope: dict):
+    """Изменение лобби на другом воркере."""
+    event = envelope["event"]
+    if waiting_games.apply(event):
+        lobby.deliver(event)
+
+
+async def handle_remote_sync(envelope: dict):
+    """Игру этого воркера изменили через HTTP на другом воркере."""
+    await sync_game(envelope["game_id"])
+
+
+async def player_joined(game: LiveGame, user_id: int) -> PlayerSession:
+    """Подключение игрока к игре этого воркера: новая сессия и, если
+    соперник успел узнать об отключении, сообщение о возвращении."""
+    session = player_sessions.attach(game.id, user_id)
+    if session.announced:
+        session.announced = False
+        event = game.record_event(
+            {"status": "success", "action": "player_reconnected", "player": user_id}
         )
+        await manager.broadcast_to_game(event, game.id, exclude_user=user_id)
+    return session
+
+
+def player_left(game_id: int, user_id: int):
+    """Игрок отключился: его ждут RESUME_GRACE_PERIOD секунд."""
+    session = player_sessions.sessions.get((game_id, user_id))
+    # Игрок мог уже переподключиться новым сокетом
+    if session is None or manager.is_connected(game_id, user_id):
         return
+    # Игра другого воркера не загружена: здесь хранится только токен
+    live = game_engine.get(game_id)
+    if live is None or live.status != "finished":
+        player_sessions.detach(session, expire_session)
+
+
+async def expire_session(session: PlayerSession):
+    """Игрок не вернулся за отведённое время."""
+    game = game_engine.get(session.game_id)
+    if game is not None and game.status != "finished":
+        session.announced = True
+        event = game.record_event(
+            {
+                "status": "success",
+                "action": "player_disconnected",
+                "player": session.user_id,
+            }
+        )
+        await manager.broadcast_to_game(event, session.game_id)
 
-    # Получаем доску игрока
-    if user_id == game.player1_id:
-        board = deserialize_board(game.board_player1)
-    else:
-        board = deserialize_board(game.board_player2)
+    async with AsyncSessionLocal() as db:
+        await release_if_abandoned(session.game_id, db)
 
-    # Проверяем и размещаем корабль
-    if place_ship_manual(board, x, y, size, orientation):
-        # Сохраняем обновленную доску
-        if user_id == game.player1_id:
-            game.board_player1 = serialize_board(board)
-        else:
-            game.board_player2 = serialize_board(board)
 
-        db.commit()
+async def release_if_abandoned(game_id: int, db: AsyncSession):
+    """Все игроки ушли и никого не ждём — останавливаем актора, сохраняем
+    и выгружаем игру."""
+    if game_id in manager.connected_games() or player_sessions.pending(game_id):
+        return
+    player_sessions.forget(game_id)
+    # Боты создаются заново, если игру загрузят снова (restore_bots)
+    game_bots.remove(game_id)
+    if not await game_actors.stop(game_id):
+        await game_engine.release(game_id, db)
+    await manager.backend.release(game_id)
+
+
+async def sync_game(game_id: int):
+    """Обновление загруженной игры после изменений через HTTP (присоединение
+    второго игрока или бота).
+
+    Строка читается и применяется под блокировкой игры, по очереди с
+    действиями актора и фоновой записью.
+    """
+    live = game_engine.get(game_id)
+    if live is None:
+        # Игрой владеет другой воркер — он и перечитает её
+        owner = await manager.backend.owner(game_id)
+        if owner is not None and owner != manager.backend.origin:
+            await manager.backend.send(owner, {"kind": "sync", "game_id": game_id})
+        return
+    async with AsyncSessionLocal() as db:
+        async with live.lock:
+            game = await db.get(Game, game_id)
+            if game is not None:
+                live.sync_players(game)
+        await restore_bots(live, db)
+    game_actors.wake(game_id)
+
+
+async def restore_bots(game: LiveGame, db: AsyncSession):
+    """Бот выгруженной игры, которая снова загружена."""
+    if game.status == "finished" or game_bots.of(game.id):
+        return
+    result = await db.execute(
+        select(User.id).where(
+            User.is_bot.is_(True), User.id.in_([game.player1_id, game.player2_id])
+        )
+    )
+    bot_id = result.scalar()
+    if bot_id is None:
+        return
+    bot = BotPlayer(bot_id)
+    # Бот заново рассчитает карту по выстрелам на доске соперника
+    bot.prepared = game.status not in SETUP_STATUSES or game.is_ready(bot_id)
+    game_bots.add(game.id, bot)
+
+
+class Heartbeat:
+    """Фоновые пинги и уборка соединений.
+
+    Раз в HEARTBEAT_INTERVAL пингует все соединения, удаляет из таблиц
+    закрытые сокеты и замолчавших игроков других воркеров, снимает из
+    лобби истёкшие ожидающие игры, выгружает игры, к которым никто не
+    подключён и никого не ждут, и продлевает владение остальными. Игра
+    выгружается, только если она была брошена и на прошлом шаге, чтобы
+    не задеть подключение, которое её только что загрузило.
+    """
+
+    def __init__(self, interval: float = HEARTBEAT_INTERVAL):
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.abandoned: Set[int] = set()
+        self.released_games = 0
+        self.expired_games = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
 
-        await manager.send_personal_message(
-            json.dumps(
-                {
-                    "status": "success",
-                    "action": "ship_placed",
-                    "message": f"Ship placed at ({x}, {y})",
-                    "ship": {"x": x, "y": y, "size": size, "orientation": orientation},
-                }
-            ),
-            websocket,
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"Error reaping connections: {e}")
+
+    async def tick(self):
+        manager.reap()
+        for game_id, user_id in manager.reap_remote():
+            player_left(game_id, user_id)
+        manager.ping()
+        lobby.ping()
+
+        connected = manager.connected_games()
+        loaded = set(game_engine.games) | set(game_actors.actors)
+        abandoned = {
+            game_id
+            for game_id in loaded
+            if game_id not in connected and not player_sessions.pending(game_id)
+        }
+        stale, self.abandoned = abandoned & self.abandoned, abandoned - self.abandoned
+        async with AsyncSessionLocal() as db:
+            for game_id in stale:
+                await release_if_abandoned(game_id, db)
+            self.released_games += len(stale)
+            # Ожидающие игры, чей создатель давно ушёл, снимаются из лобби
+            # Игру, загруженную другим воркером, ждёт подключённый к нему создатель
+            expired = [
+                game_id
+                for game_id in waiting_games.stale(keep=connected)
+                if await manager.backend.owner(game_id) in (None, manager.backend.origin)
+            ]
+            self.expired_games += await waiting_games.expire(db, expired)
+        await manager.backend.refresh(
+            set(game_engine.games) | set(game_actors.actors), OWNER_TTL
         )
 
-        # Отправляем обновленное состояние
+    def metrics(self) -> dict:
+        return {"released_games": self.released_games, "expired_games": self.expired_games}
+
+
+heartbeat = Heartbeat()
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    """Следующее сообщение клиента: JSON-текст или бинарный кадр.
+
+    Клиент, молчащий дольше IDLE_TIMEOUT (в том числе не отвечающий на
+    пинги), отключается. Сообщение, не являющееся JSON-объектом, — ValueError.
+    """
+    try:
+        data = await asyncio.wait_for(websocket.receive(), IDLE_TIMEOUT)
+    except asyncio.TimeoutError:
+        try:
+            await websocket.close(code=1001, reason="Idle timeout")
+        except Exception:
+            pass
+        raise WebSocketDisconnect(1001)
+    if data["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(data.get("code", 1000))
+    if data.get("bytes") is not None:
+        return decode_frame(data["bytes"])
+    message = loads(data["text"])
+    if not isinstance(message, dict):
+        raise ValueError("Message must be a JSON object")
+    return message
+
+
+async def dispatch_action(
+    websocket: WebSocket,
+    game: LiveGame,
+    user_id: int,
+    message: dict,
+    db: AsyncSession,
+):
+    """Выполнение одного действия игрока."""
+    action = message.get("action")
+
+    if action == "place_ship":
+        await handle_place_ship(websocket, game, user_id, message, db)
+    elif action == "randomize_fleet":
+        await handle_randomize_fleet(websocket, game, user_id, db)
+    elif action == "ready":
+        await handle_player_ready(websocket, game, user_id, db)
+    elif action == "make_move":
+        await handle_make_move(websocket, game, user_id, message, db)
+    elif action == "get_state":
         await send_game_state(websocket, game, user_id)
+    elif action == "resync":
+        await handle_resync(websocket, game, user_id, message)
     else:
         await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Invalid ship placement"}),
+            dumps({"status": "error", "message": f"Unknown action: {action}"}),
             websocket,
         )
 
 
-async def handle_player_ready(
-    websocket: WebSocket, game: ModelGame, user_id: int, db: Session
+async def send_error(websocket: WebSocket, message: str):
+    """Отправка сообщения об ошибке."""
+    await manager.send_personal_message(
+        dumps({"status": "error", "message": message}), websocket
+    )
+
+
+async def handle_place_ship(
+    websocket: WebSocket,
+    game: LiveGame,
+    user_id: int,
+    message: dict,
+    db: AsyncSession,
 ):
-    """Обработка готовности игрока."""
-    if game.status not in ["setup", "waiting"]:
-        await manager.send_personal_message(
-            json.dumps(
-                {"status": "error", "message": "Cannot set ready in current game state"}
-            ),
-            websocket,
+    """Обработка размещения корабля."""
+    x, y = message.get("x"), message.get("y")
+    size = message.get("size")
+    orientation = message.get("orientation")
+
+    if None in [x, y, size, orientation]:
+        await send_error(websocket, "Missing required parameters")
+        return
+
+    # Проверяем и размещаем корабль (в базу попадёт с ближайшей пачкой)
+    try:
+        await game_engine.apply(
+            game, db, lambda live: live.place_ship(user_id, x, y, size, orientation)
         )
+    except ValueError as e:
+        await send_error(websocket, str(e))
         return
 
-    # Устанавливаем готовность игрока
-    if user_id == game.player1_id:
-        game.status = "player1_ready" if game.status == "setup" else "both_ready"
-    elif user_id == game.player2_id:
-        if game.status == "player1_ready":
-            game.status = "both_ready"
-        else:
-            game.status = "player2_ready"
+    # Событие видно только владельцу доски; полный снимок не нужен —
+    # клиент сам дорисовывает корабль
+    event = game.record_event(
+        {
+            "status": "success",
+            "action": "ship_placed",
+            "message": f"Ship placed at ({x}, {y})",
+            "ship": {"x": x, "y": y, "size": size, "orientation": orientation},
+        },
+        visible_to=user_id,
+    )
+    await manager.send_personal_message(event, websocket)
 
-    # Если оба игрока готовы, начинаем игру
-    if game.status == "both_ready":
-        game.status = "in_progress"
-        game.turn = game.player1_id  # Первый игрок начинает
 
-    db.commit()
+async def handle_randomize_fleet(
+    websocket: WebSocket, game: LiveGame, user_id: int, db: AsyncSession
+):
+    """Обработка случайной расстановки флота."""
+    try:
+        # Зерно фиксируется, чтобы при повторе действия после конфликта
+        # версий получилась та же расстановка, что уже видел игрок
+        seed = secrets.randbits(64)
+        await game_engine.apply(
+            game, db, lambda live: live.randomize_fleet(user_id, random.Random(seed))
+        )
+    except ValueError as e:
+        await send_error(websocket, str(e))
+        return
 
-    # Уведомляем всех участников
-    await manager.broadcast_to_game(
-        json.dumps(
-            {
-                "status": "success",
-                "action": "player_ready",
-                "game_status": game.status,
-                "turn": game.turn,
-                "ready_player": user_id,
-            }
-        ),
-        game.id,
+    # Расстановка видна только владельцу доски
+    event = game.record_event(
+        {
+            "status": "success",
+            "action": "fleet_randomized",
+            "board": game.board_of(user_id).to_grid(),
+        },
+        visible_to=user_id,
     )
+    await manager.send_personal_message(event, websocket)
 
 
-async def handle_make_move(
-    websocket: WebSocket, game: ModelGame, user_id: int, message: dict, db: Session
+async def handle_player_ready(
+    websocket: WebSocket, game: LiveGame, user_id: int, db: AsyncSession
 ):
-    """Обработка хода игрока."""
-    if game.status != "in_progress":
-        await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Game is not in progress"}),
-            websocket,
-        )
+    """Обработка готовности игрока."""
+    try:
+        await game_engine.apply(game, db, lambda live: live.set_ready(user_id))
+    except ValueError as e:
+        await send_error(websocket, str(e))
         return
 
-    if game.turn != user_id:
-        await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Not your turn"}), websocket
-        )
-        return
+    # Уведомляем всех участников
+    event = game.record_event(
+        {
+            "status": "success",
+            "action": "player_ready",
+            "game_status": game.status,
+            "turn": game.turn,
+            "ready_player": user_id,
+        }
+    )
+    await manager.broadcast_to_game(event, game.id)
 
+
+async def handle_make_move(
+    websocket: WebSocket,
+    game: LiveGame,
+    user_id: int,
+    message: dict,
+    db: AsyncSession,
+):
+    """Обработка хода игрока."""
     x, y = message.get("x"), message.get("y")
     if x is None or y is None:
-        await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Missing coordinates"}), websocket
+        await send_error(websocket, "Missing coordinates")
+        return
+
+    # Делаем ход: конец игры сохраняем сразу, остальные ходы — пачками в фоне
+    try:
+        result = await game_engine.apply(
+            game, db, lambda live: live.make_move(user_id, x, y)
         )
+    except ValueError as e:
+        await send_error(websocket, str(e))
         return
 
-    # Определяем доску противника
-    if user_id == game.player1_id:
-        opponent_board = deserialize_board(game.board_player2)
-        opponent_id = game.player2_id
-    else:
-        opponent_board = deserialize_board(game.board_player1)
-        opponent_id = game.player1_id
+    winner = game.winner_id
+
+    # Отправляем результат всем участникам: только изменённая клетка
+    event = game.record_event(
+        {
+            "status": "success",
+            "action": "move_result",
+            "result": result,
+            "game_status": game.status,
+            "winner": winner,
+            "move": {"x": x, "y": y},
+            "player": user_id,
+            "turn": game.turn,
+        }
+    )
+    await manager.broadcast_to_game(event, game.id)
 
-    # Делаем ход
-    result = make_move(opponent_board, x, y)
 
-    if result == "invalid":
-        await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Invalid move coordinates"}),
-            websocket,
-        )
+async def handle_resync(
+    websocket: WebSocket, game: LiveGame, user_id: int, message: dict
+):
+    """Досылка пропущенных событий начиная с номера since."""
+    since = message.get("since")
+    if not isinstance(since, int):
+        await send_error(websocket, "Missing sequence number")
         return
 
-    if result == "already_hit":
-        await manager.send_personal_message(
-            json.dumps({"status": "error", "message": "Cell already hit"}), websocket
-        )
+    events = game.events_since(since, user_id, message.get("epoch"))
+    if events is None:
+        # Клиент отстал слишком сильно или номер из прежней загрузки
+        # игры — отправляем полный снимок
+        await send_game_state(websocket, game, user_id)
         return
 
-    # Сохраняем обновленную доску
-    if user_id == game.player1_id:
-        game.board_player2 = serialize_board(opponent_board)
-    else:
-        game.board_player1 = serialize_board(opponent_board)
+    for event in events:
+        await manager.send_personal_message(event, websocket)
 
-    # Проверяем победителя
-    winner = None
-    if check_winner(opponent_board):
-        game.status = "finished"
-        game.winner_id = user_id
-        winner = user_id
 
-    # Передаем ход, если промах и игра не закончена
-    if result == "miss" and game.status != "finished":
-        game.turn = opponent_id
+async def spectator_endpoint(websocket: WebSocket, game_id: int):
+    """Просмотр идущей или завершённой игры без права действий."""
+    async with AsyncSessionLocal() as db:
+        game = await game_engine.peek(game_id, db)
+    if not game:
+        await websocket.close(code=1008, reason="Game not found")
+        return
+    if game.status not in SPECTATOR_STATUSES:
+        await websocket.close(code=1008, reason="Game has not started yet")
+        return
 
-    db.commit()
+    await manager.connect_spectator(websocket, game_id)
+    try:
+        await send_spectator_state(websocket, game)
+        while True:
+            try:
+                message = await receive_message(websocket)
+            except json.JSONDecodeError:
+                await send_error(websocket, "Invalid JSON")
+                continue
+            except ValueError as e:
+                await send_error(websocket, str(e))
+                continue
+
+            action = message.get("action")
+            if action == "pong":
+                continue
+            # Снимок — из памяти, если игра загружена, иначе из базы
+            live = game_engine.get(game_id) or game
+            if action == "get_state":
+                await send_spectator_state(websocket, live)
+            elif action == "resync":
+                since = message.get("since")
+                events = (
+                    live.events_since(since, None, message.get("epoch"))
+                    if isinstance(since, int)
+                    else None
+                )
+                if events is None:
+                    await send_spectator_state(websocket, live)
+                else:
+                    for event in events:
+                        await manager.send_personal_message(event, websocket)
+            else:
+                await send_error(websocket, "Spectators cannot perform actions")
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Spectator connection error: {e}")
+    finally:
+        manager.disconnect_spectator(websocket, game_id)
+
+
+async def send_spectator_state(websocket: WebSocket, game: LiveGame):
+    """Состояние игры для зрителя: корабли скрыты, пока игра не закончена."""
+    def build():
+        hide_ships = game.status != "finished"
+        return {
+            "status": "success",
+            "action": "game_state",
+            "game_id": game.id,
+            "seq": game.seq,
+            "epoch": game.epoch,
+            "game_status": game.status,
+            "player1_id": game.player1_id,
+            "player2_id": game.player2_id,
+            "turn": game.turn,
+            "board_player1": game.board_player1.to_grid(hide_ships=hide_ships),
+            "board_player2": game.board_player2.to_grid(hide_ships=hide_ships),
+            "winner": game.winner_id,
+        }
+
+    await manager.send_personal_message(game.cached_payload("spectator", build), websocket)
+
+
+async def send_game_state(websocket: WebSocket, game: LiveGame, user_id: int):
+    """Отправка текущего состояния игры."""
+    await manager.send_personal_message(game_state_payload(game, user_id), websocket)
 
-    # Отправляем результат всем участникам
-    response = {
-        "status": "success",
-        "action": "move_result",
-        "result": result,
-        "game_status": game.status,
-        "winner": winner,
-        "move": {"x": x, "y": y},
-        "player": user_id,
-        "turn": game.turn,
-    }
 
-    await manager.broadcast_to_game(json.dumps(response), game.id)
+def game_state_payload(game: LiveGame, user_id: int) -> str:
+    """Снимок состояния игры для игрока, закодированный один раз до изменения игры."""
 
+    def build():
+        # Получаем свою доску и доску противника
+        opponent_id = game.opponent_of(user_id)
+        my_board = game.board_of(user_id).to_grid()
 
-async def send_game_state(websocket: WebSocket, game: ModelGame, user_id: int):
-    """Отправка текущего состояния игры."""
-    # Получаем свою доску
-    if user_id == game.player1_id:
-        my_board = deserialize_board(game.board_player1)
-        opponent_board = deserialize_board(game.board_player2)
-        opponent_id = game.player2_id
-    else:
-        my_board = deserialize_board(game.board_player2)
-        opponent_board = deserialize_board(game.board_player1)
-        opponent_id = game.player1_id
+        # Скрываем корабли противника (показываем только попадания и промахи),
+        # если игра закончена, показываем все корабли
+        hidden_opponent_board = game.board_of(opponent_id).to_grid(
+            hide_ships=game.status != "finished"
+        )
 
-    # Скрываем корабли противника (показываем только попадания и промахи)
-    if opponent_board:
-        if game.status == "finished":
-            # Если игра закончена, показываем все корабли
-            hidden_opponent_board = opponent_board
-        else:
-            # Скрываем неподбитые корабли
-            hidden_opponent_board = [
-                ["~" if cell == "S" else cell for cell in row] for row in opponent_board
-            ]
-    else:
-        hidden_opponent_board = None
-
-    state = {
-        "status": "success",
-        "action": "game_state",
-        "game_id": game.id,
-        "game_status": game.status,
-        "player_id": user_id,
-        "opponent_id": opponent_id,
-        "turn": game.turn,
-        "my_board": my_board,
-        "opponent_board": hidden_opponent_board,
-        "winner": game.winner_id,
-        "is_my_turn": game.turn == user_id if game.turn else False,
-    }
-
-    await manager.send_personal_message(json.dumps(state), websocket)
+        return {
+            "status": "success",
+            "action": "game_state",
+            "game_id": game.id,
+            "seq": game.seq,
+            "epoch": game.epoch,
+            "game_status": game.status,
+            "player_id": user_id,
+            "opponent_id": opponent_id,
+            "turn": game.turn,
+            "my_board": my_board,
+            "opponent_board": hidden_opponent_board,
+            "winner": game.winner_id,
+            "is_my_turn": game.turn == user_id if game.turn else False,
+        }
+
+    return game.cached_payload(("player", user_id), build)
+
+
+async def resend_game_state(game: LiveGame):
+    """Актуальное состояние обоим игрокам, где бы они ни были подключены."""
+    for user_id in (game.player1_id, game.player2_id):
+        if user_id is not None:
+            await manager.send_to_user(game_state_payload(game, user_id), game.id, user_id)
+
+
+def on_game_conflict(game: LiveGame):
+    """Часть действий игроков не повторилась после конфликта версий:
+    то, что они видели, разошлось с базой."""
+    asyncio.get_running_loop().create_task(resend_game_state(game))
+
+
+game_engine.on_conflict(on_game_conflict)
+manager.on_remote("action", handle_remote_action)
+manager.on_remote("leave", handle_remote_leave)
+manager.on_remote("sync", handle_remote_sync)
+manager.on_remote("lobby", handle_remote_lobby)
@@ -0,0 +1,107 @@
+# app/ws_protocol.py
+"""Протоколы WebSocket игры, выбираемые клиентом через Sec-WebSocket-Protocol.
+
+battleship.json — текстовые JSON-сообщения (как и без заголовка).
+battleship.bin — частые сообщения бинарными кадрами фиксированного вида,
+остальные по-прежнему JSON-текстом в том же соединении.
+
+Кадры клиента (первый байт — код):
+    MAKE_MOVE  <B B B>  код, x, y                 — 3 байта
+    GET_STATE  <B>      код                       — 1 байт
+    RESYNC     <B I I>  код, epoch, since         — 9 байт
+    PONG       <B>      код (ответ на ping)       — 1 байт
+
+Кадры сервера:
+    MOVE_RESULT <B I I B B B I I>  код, epoch, seq, x, y, флаги, player, turn
+                                   — 20 байт
+    флаги: бит 0 — попадание, бит 1 — игра окончена (победил player).
+
+epoch — эпоха номеров событий (см. LiveGame.epoch): после новой загрузки
+игры номера seq начинаются заново, и досылка по старым номерам даёт снимок.
+"""
+
+import struct
+from functools import lru_cache
+from typing import List, Optional, Union
+
+from app.json_codec import loads
+
+JSON_PROTOCOL = "battleship.json"
+BINARY_PROTOCOL = "battleship.bin"
+PROTOCOLS = (BINARY_PROTOCOL, JSON_PROTOCOL)
+
+# Коды кадров клиента
+OP_MAKE_MOVE = 1
+OP_GET_STATE = 2
+OP_RESYNC = 3
+OP_PONG = 4
+# Коды кадров сервера
+OP_MOVE_RESULT = 1
+
+MOVE_FRAME = struct.Struct("<BBB")
+RESYNC_FRAME = struct.Struct("<BII")
+MOVE_RESULT_FRAME = struct.Struct("<BIIBBBII")
+
+FLAG_HIT = 1
+FLAG_FINISHED = 2
+
+# Признак события хода в закодированном JSON (json_codec пишет без пробелов)
+MOVE_RESULT_MARKER = '"action":"move_result"'
+
+
+def negotiate(requested: List[str]) -> Optional[str]:
+    """Выбор протокола из предложенных клиентом; None — клиент ничего не просил."""
+    for protocol in PROTOCOLS:
+        if protocol in requested:
+            return protocol
+    return None
+
+
+def decode_frame(data: bytes) -> dict:
+    """Разбор бинарного кадра клиента в то же сообщение, что и JSON."""
+    try:
+        opcode = data[0]
+        if opcode == OP_MAKE_MOVE:
+            _, x, y = MOVE_FRAME.unpack(data)
+            return {"action": "make_move", "x": x, "y": y}
+        if opcode == OP_GET_STATE and len(data) == 1:
+            return {"action": "get_state"}
+        if opcode == OP_RESYNC:
+            _, epoch, since = RESYNC_FRAME.unpack(data)
+            return {"action": "resync", "since": since, "epoch": epoch}
+        if opcode == OP_PONG and len(data) == 1:
+            return {"action": "pong"}
+    except (IndexError, struct.error):
+        pass
+    raise ValueError("Invalid binary frame")
+
+
+def encode_frame(message: str) -> Union[str, bytes]:
+    """Сообщение для клиента battleship.bin: кадр, если у события он есть.
+
+    Остальные сообщения (в том числе крупные снимки состояния) уходят
+    как есть и в кэш не попадают.
+    """
+    if MOVE_RESULT_MARKER not in message:
+        return message
+    return _move_result_frame(message)
+
+
+@lru_cache(maxsize=1024)
+def _move_result_frame(message: str) -> bytes:
+    """Кадр MOVE_RESULT; одна строка события рассылается всем получателям,
+    поэтому кадр строится один раз на событие, а дальше берётся из кэша."""
+    event = loads(message)
+    flags = (FLAG_HIT if event["result"] == "hit" else 0) | (
+        FLAG_FINISHED if event["game_status"] == "finished" else 0
+    )
+    return MOVE_RESULT_FRAME.pack(
+        OP_MOVE_RESULT,
+        event["epoch"],
+        event["seq"],
+        event["move"]["x"],
+        event["move"]["y"],
+        flags,
+        event["player"],
+        event["turn"] or 0,
+    )
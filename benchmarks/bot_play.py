@@ -0,0 +1,102 @@
+# benchmarks/bot_play.py
+"""Скорость и сила бота.
+
+Бот играет против случайно расставленного флота до победы. Считаются
+ходы в секунду и среднее число выстрелов до победы. С --concurrent
+партии идут одновременно через пул потоков ботов, как на сервере, и
+дополнительно замеряется задержка цикла событий.
+
+Запуск: python -m benchmarks.bot_play [--games 500] [--concurrent 200]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.game_logic.bot import BotPlayer, bot_executor
+from app.game_logic.fleet import random_bitboard
+
+
+def play(seed: int) -> int:
+    """Одна партия; возвращает число выстрелов до победы."""
+    board = random_bitboard(rng=random.Random(seed))
+    bot = BotPlayer(user_id=1, seed=seed)
+    shots = 0
+    while not board.all_sunk():
+        board.shoot(*bot.choose_shot(board))
+        shots += 1
+    return shots
+
+
+def run_sequential(games: int, seed: int):
+    started = time.perf_counter()
+    shots = [play(seed + i) for i in range(games)]
+    elapsed = time.perf_counter() - started
+    report(games, shots, elapsed)
+
+
+async def play_async(seed: int) -> int:
+    board = random_bitboard(rng=random.Random(seed))
+    bot = BotPlayer(user_id=1, seed=seed)
+    loop = asyncio.get_running_loop()
+    shots = 0
+    while not board.all_sunk():
+        x, y = await loop.run_in_executor(bot_executor, bot.choose_shot, board.copy())
+        board.shoot(x, y)
+        shots += 1
+    return shots
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.005):
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - started - interval) * 1000)
+    return lags
+
+
+async def run_concurrent(games: int, concurrent: int, seed: int):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop))
+    semaphore = asyncio.Semaphore(concurrent)
+
+    async def limited(game_seed):
+        async with semaphore:
+            return await play_async(game_seed)
+
+    started = time.perf_counter()
+    shots = await asyncio.gather(*(limited(seed + i) for i in range(games)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = sorted(await lag_task)
+
+    report(games, shots, elapsed)
+    print(f"loop lag p50:   {lags[len(lags) // 2]:.2f} ms")
+    print(f"loop lag p99:   {lags[int(len(lags) * 0.99)]:.2f} ms")
+
+
+def report(games: int, shots, elapsed: float):
+    print(f"games:          {games}")
+    print(f"moves/sec:      {sum(shots) / elapsed:,.0f}")
+    print(f"shots to win:   {statistics.mean(shots):.1f} (min {min(shots)}, max {max(shots)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--concurrent", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.concurrent:
+        asyncio.run(run_concurrent(args.games, args.concurrent, args.seed))
+    else:
+        run_sequential(args.games, args.seed)
+
+
+if __name__ == "__main__":
+    main()
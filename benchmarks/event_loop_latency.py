@@ -0,0 +1,114 @@
+# benchmarks/event_loop_latency.py
+"""Задержка цикла событий при одновременных партиях.
+
+Каждая «партия» в цикле читает строку игры и сохраняет её, как это делают
+WebSocket-обработчики. Параллельно пробная задача засыпает на 10 мс и
+измеряет, насколько она опоздала. Сравниваются синхронная сессия,
+вызываемая прямо из корутины (как было раньше), и AsyncSession.
+
+Запуск: python -m benchmarks.event_loop_latency [--matches 1 10 50 100]
+По умолчанию используется SQLite-файл, для реальных цифр задайте
+DATABASE_URL на Postgres.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_event_loop.db")
+
+from app.db.session import (AsyncSessionLocal, Base, SessionLocal,  # noqa: E402
+                            async_engine, engine)
+from app.models import Game, User  # noqa: E402
+
+PROBE_INTERVAL = 0.01
+
+
+def prepare(matches: int):
+    """Создание пользователя и игр для бенчмарка."""
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == "bench").first()
+        if user is None:
+            user = User(username="bench", hashed_password="-")
+            db.add(user)
+            db.commit()
+        games = [Game(player1_id=user.id, status="in_progress") for _ in range(matches)]
+        db.add_all(games)
+        db.commit()
+        return [game.id for game in games]
+    finally:
+        db.close()
+
+
+async def sync_match(game_id: int, stop: asyncio.Event):
+    """Партия с блокирующей сессией прямо в цикле событий."""
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            game = db.query(Game).filter(Game.id == game_id).first()
+            game.turn = game.player1_id
+            db.commit()
+            await asyncio.sleep(0)
+    finally:
+        db.close()
+
+
+async def async_match(game_id: int, stop: asyncio.Event):
+    """Партия с асинхронной сессией."""
+    async with AsyncSessionLocal() as db:
+        while not stop.is_set():
+            game = await db.get(Game, game_id, populate_existing=True)
+            game.turn = game.player1_id
+            await db.commit()
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """Измерение опоздания цикла событий."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def run(match, game_ids, duration: float):
+    stop = asyncio.Event()
+    lags = []
+    tasks = [asyncio.create_task(match(game_id, stop)) for game_id in game_ids]
+    tasks.append(asyncio.create_task(probe(stop, lags)))
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    # Пул соединений привязан к циклу событий, который сейчас закроется
+    await async_engine.dispose()
+    return lags
+
+
+def report(mode: str, matches: int, lags: list):
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{mode:>5} {matches:>7} {statistics.median(lags_ms):>9.2f} "
+        f"{p99:>9.2f} {lags_ms[-1]:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':>5} {'matches':>7} {'p50, ms':>9} {'p99, ms':>9} {'max, ms':>9}")
+    for matches in args.matches:
+        game_ids = prepare(matches)
+        for mode, match in (("sync", sync_match), ("async", async_match)):
+            lags = asyncio.run(run(match, game_ids, args.duration))
+            report(mode, matches, lags)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/fleet_generation.py
+"""Скорость случайной расстановки флота.
+
+Сравнивает прежний подход (случайные попытки на доске из списков),
+генератор на заранее посчитанных масках и пакетную генерацию.
+
+Запуск: python -m benchmarks.fleet_generation [--layouts 10000]
+"""
+
+import argparse
+import random
+import time
+
+from app.game_logic.board import can_place_ship, generate_board, place_ship_on_board
+from app.game_logic.fleet import FLEET, np, random_bitboard, random_bitboards
+
+
+def legacy_layout(rng):
+    """Прежний place_ships_auto: до 100 случайных попыток на корабль."""
+    board = generate_board()
+    for ship_size in FLEET:
+        for _ in range(100):
+            orientation = rng.choice(["horizontal", "vertical"])
+            x, y = rng.randint(0, 9), rng.randint(0, 9)
+            if can_place_ship(board, x, y, ship_size, orientation):
+                place_ship_on_board(board, x, y, ship_size, orientation)
+                break
+        else:
+            return legacy_layout(rng)
+    return board
+
+
+def measure(name: str, layouts: int, generate):
+    started = time.perf_counter()
+    generate()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<16} {layouts / elapsed:>12,.0f} layouts/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--layouts", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    measure("legacy", args.layouts, lambda: [legacy_layout(rng) for _ in range(args.layouts)])
+    measure("bitmask", args.layouts, lambda: [random_bitboard(rng=rng) for _ in range(args.layouts)])
+    if np is not None:
+        measure("numpy batch", args.layouts, lambda: random_bitboards(args.layouts, seed=args.seed))
+    else:
+        print("numpy batch      skipped (numpy is not installed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/login_storm.py
+"""Нагрузка «шторм логинов» на пул хэширования паролей.
+
+Одновременно запускается N проверок пароля через verify_password_async,
+параллельно пробная задача измеряет опоздание цикла событий. Выводятся
+пропускная способность, задержки принятых запросов и число отказов
+из-за переполненной очереди (ответ 503 в API).
+
+Запуск: python -m benchmarks.login_storm [--logins 50 200 1000]
+Размер пула и очереди задаются PASSWORD_HASH_WORKERS и
+PASSWORD_HASH_MAX_PENDING.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.utils import (PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WORKERS,
+                       PasswordHasherBusy, hash_password, verify_password_async)
+
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values, fraction):
+    values = sorted(values) or [0.0]
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def login(hashed: str, latencies: list):
+    started = time.perf_counter()
+    try:
+        await verify_password_async("password", hashed)
+    except PasswordHasherBusy:
+        return False
+    latencies.append(time.perf_counter() - started)
+    return True
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def storm(hashed: str, logins: int):
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login(hashed, latencies) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe_task
+    accepted = sum(results)
+    print(
+        f"{logins:>7} {accepted:>8} {logins - accepted:>8} "
+        f"{accepted / elapsed:>8.1f} {percentile(latencies, 0.5) * 1000:>9.0f} "
+        f"{percentile(latencies, 0.99) * 1000:>9.0f} {percentile(lags, 0.99) * 1000:>11.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, nargs="+", default=[50, 200, 1000])
+    args = parser.parse_args()
+
+    hashed = hash_password("password")
+    print(f"workers={PASSWORD_HASH_WORKERS} max_pending={PASSWORD_HASH_MAX_PENDING}")
+    print(
+        f"{'logins':>7} {'accepted':>8} {'rejected':>8} {'per sec':>8} "
+        f"{'p50, ms':>9} {'p99, ms':>9} {'loop p99, ms':>11}"
+    )
+    for logins in args.logins:
+        asyncio.run(storm(hashed, logins))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/matchmaking_throughput.py
+"""Пропускная способность очереди подбора соперников.
+
+Ставит в очередь N игроков со случайным рейтингом (часть — без рейтинга),
+часть заявок отменяет и считает постановки в секунду и число пар.
+
+Запуск: python -m benchmarks.matchmaking_throughput [--players 100000]
+С --redis-url проверяется RedisMatchmaker вместо очереди в памяти.
+"""
+
+import argparse
+import random
+import time
+
+from app.game_logic.matchmaking import Matchmaker, RedisMatchmaker
+
+
+def run(matchmaker, players: int, seed: int):
+    rng = random.Random(seed)
+    pairs = 0
+    cancelled = 0
+
+    started = time.perf_counter()
+    for user_id in range(1, players + 1):
+        rating = rng.randint(800, 2400) if rng.random() < 0.8 else None
+        if matchmaker.enqueue(user_id, rating) is not None:
+            pairs += 1
+        elif rng.random() < 0.05:
+            matchmaker.cancel(user_id)
+            cancelled += 1
+    elapsed = time.perf_counter() - started
+
+    print(f"players:        {players}")
+    print(f"pairs:          {pairs}")
+    print(f"cancelled:      {cancelled}")
+    print(f"enqueues/sec:   {players / elapsed:,.0f}")
+    print(f"pairs/sec:      {pairs / elapsed:,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    matchmaker = RedisMatchmaker(args.redis_url) if args.redis_url else Matchmaker()
+    run(matchmaker, args.players, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/spectator_fanout.py
+"""Рассылка событий игры тысячам зрителей.
+
+Зрители подключаются к ConnectionManager через сокеты-заглушки, затем
+рассылается пачка событий хода. Режим shared — событие кодируется один
+раз и одна строка ставится во все очереди (как на сервере); режим
+per-recipient — json.dumps для каждого зрителя, как было бы без общей
+строки. Время считается до доставки последнего сообщения.
+
+Запуск: python -m benchmarks.spectator_fanout [--spectators 1000 10000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_spectators.db")
+
+from app.broadcast import InProcessBroadcast  # noqa: E402
+from app.websocket_handlers import ConnectionManager  # noqa: E402
+
+GAME_ID = 1
+
+
+class NullWebSocket:
+    """Сокет, который только считает отправленные сообщения."""
+
+    # Клиент не предлагает подпротоколов — обычный JSON
+    scope = {"subprotocols": []}
+
+    def __init__(self):
+        self.received = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message: str):
+        self.received += 1
+
+
+def move_event(seq: int) -> dict:
+    return {
+        "status": "success",
+        "action": "move_result",
+        "result": "miss",
+        "game_status": "in_progress",
+        "winner": None,
+        "move": {"x": seq % 10, "y": seq // 10 % 10},
+        "player": 1,
+        "turn": 2,
+        "seq": seq,
+        "epoch": 1,
+    }
+
+
+async def run(spectators: int, events: int, mode: str):
+    manager = ConnectionManager(backend=InProcessBroadcast())
+    sockets = [NullWebSocket() for _ in range(spectators)]
+    for websocket in sockets:
+        await manager.connect_spectator(websocket, GAME_ID)
+
+    expected = spectators * events
+    started = time.perf_counter()
+    for seq in range(1, events + 1):
+        event = move_event(seq)
+        if mode == "shared":
+            manager._broadcast_spectators(json.dumps(event), GAME_ID)
+        else:
+            for client in manager.spectators[GAME_ID].values():
+                client.send(json.dumps(event))
+        # Даём писателям поработать, как между ходами на сервере
+        await asyncio.sleep(0)
+
+    while sum(websocket.received for websocket in sockets) < expected:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    for websocket in sockets:
+        manager.disconnect_spectator(websocket, GAME_ID)
+
+    print(
+        f"{spectators:>7} spectators  {mode:<13} "
+        f"{events / elapsed:>10,.0f} events/sec  {expected / elapsed:>12,.0f} messages/sec"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spectators", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--events", type=int, default=100)
+    args = parser.parse_args()
+
+    for spectators in args.spectators:
+        for mode in ("shared", "per-recipient"):
+            asyncio.run(run(spectators, args.events, mode))
+
+
+if __name__ == "__main__":
+    main()
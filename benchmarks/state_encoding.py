@@ -0,0 +1,86 @@
+# benchmarks/state_encoding.py
+"""Кодирование снимков состояния игры для get_state и resync.
+
+Сравнивает сборку и json.dumps снимка на каждый запрос с кэшем
+LiveGame.cached_payload, который кодирует снимок один раз до следующего
+изменения игры. Запросы идут пачками между ходами, как при
+переподключении игроков и зрителей.
+
+Запуск: python -m benchmarks.state_encoding [--requests 100000]
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_state_encoding.db")
+
+from app.game_logic.board import generate_bitboard, place_ships_auto  # noqa: E402
+from app.game_logic.engine import LiveGame  # noqa: E402
+from app.json_codec import orjson  # noqa: E402
+
+
+def spectator_state(game: LiveGame) -> dict:
+    hide_ships = game.status != "finished"
+    return {
+        "status": "success",
+        "action": "game_state",
+        "game_id": game.id,
+        "seq": game.seq,
+        "epoch": game.epoch,
+        "game_status": game.status,
+        "player1_id": game.player1_id,
+        "player2_id": game.player2_id,
+        "turn": game.turn,
+        "board_player1": game.board_player1.to_grid(hide_ships=hide_ships),
+        "board_player2": game.board_player2.to_grid(hide_ships=hide_ships),
+        "winner": game.winner_id,
+    }
+
+
+def new_game(rng: random.Random) -> LiveGame:
+    boards = [place_ships_auto(generate_bitboard(), rng=rng) for _ in range(2)]
+    return LiveGame(1, 1, 2, "in_progress", 1, None, *boards)
+
+
+def run(requests: int, per_move: int, mode: str, seed: int):
+    rng = random.Random(seed)
+    game = new_game(rng)
+    cells = [(x, y) for x in range(10) for y in range(10)]
+    rng.shuffle(cells)
+
+    started = time.perf_counter()
+    total = 0
+    for index in range(requests):
+        if index % per_move == 0:
+            if not cells or game.status == "finished":
+                game = new_game(rng)
+                cells = [(x, y) for x in range(10) for y in range(10)]
+                rng.shuffle(cells)
+            game.make_move(game.turn, *cells.pop())
+        if mode == "cached":
+            payload = game.cached_payload("spectator", lambda: spectator_state(game))
+        else:
+            payload = json.dumps(spectator_state(game))
+        total += len(payload)
+    elapsed = time.perf_counter() - started
+    print(f"{mode:<10} per_move={per_move:<4} {requests / elapsed:>12,.0f} requests/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--per-move", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}")
+    for per_move in args.per_move:
+        for mode in ("uncached", "cached"):
+            run(args.requests, per_move, mode, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/ws_protocol.py
+"""Размер и стоимость кодирования сообщений хода в протоколах WebSocket.
+
+Для выстрела клиента и события move_result сравниваются JSON
+(battleship.json) и бинарные кадры (battleship.bin): байты на кадр,
+разбор входящих выстрелов и кодирование событий. Для move_result в
+режиме bin кадр строится из уже закодированной JSON-строки события,
+как на сервере, с кэшем на событие и без него.
+
+Запуск: python -m benchmarks.ws_protocol [--messages 100000]
+"""
+
+import argparse
+import time
+
+from app.json_codec import dumps, loads, orjson
+from app.ws_protocol import (MOVE_FRAME, OP_MAKE_MOVE, _move_result_frame,
+                             decode_frame, encode_frame)
+
+
+def move_event(seq: int) -> dict:
+    return {
+        "status": "success",
+        "action": "move_result",
+        "result": "hit" if seq % 3 else "miss",
+        "game_status": "in_progress",
+        "winner": None,
+        "move": {"x": seq % 10, "y": seq // 10 % 10},
+        "player": 1041,
+        "turn": 2077,
+        "seq": seq,
+        "epoch": 1,
+    }
+
+
+def measure(name: str, count: int, size: int, work):
+    started = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<34} {size:>5} bytes {count / elapsed:>14,.0f} msgs/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--recipients", type=int, default=2)
+    args = parser.parse_args()
+    count = args.messages
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}")
+    shot_json = dumps({"action": "make_move", "x": 3, "y": 7})
+    shot_frame = MOVE_FRAME.pack(OP_MAKE_MOVE, 3, 7)
+    measure("shot decode json", count, len(shot_json), lambda: [loads(shot_json) for _ in range(count)])
+    measure("shot decode bin", count, len(shot_frame), lambda: [decode_frame(shot_frame) for _ in range(count)])
+
+    events = [dumps(move_event(seq)) for seq in range(count)]
+    frame = encode_frame(events[1])
+    _move_result_frame.cache_clear()
+    recipients = args.recipients
+
+    def fan_out_cached():
+        for event in events:
+            for _ in range(recipients):
+                encode_frame(event)
+
+    def fan_out_uncached():
+        for event in events:
+            for _ in range(recipients):
+                _move_result_frame.__wrapped__(event)
+
+    measure("move_result encode json", count, len(events[1]), lambda: [dumps(move_event(seq)) for seq in range(count)])
+    measure(f"move_result bin x{recipients} uncached", count, len(frame), fan_out_uncached)
+    measure(f"move_result bin x{recipients} cached", count, len(frame), fan_out_cached)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# tests/conftest.py
+"""Общие настройки тестов: отдельная SQLite-база и чистые таблицы на тест.
+
+Переменные окружения задаются до импорта приложения: движки базы данных
+и настройки модулей читаются при импорте.
+"""
+
+import asyncio
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+# Только реализации в памяти процесса, даже если в окружении есть Redis
+os.environ.pop("BROADCAST_URL", None)
+os.environ.pop("MATCHMAKING_URL", None)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db.session import Base, SessionLocal, async_engine, engine  # noqa: E402
+from app.game_logic.engine import game_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Game, User  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Пустые таблицы перед каждым тестом."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield
+    # Игры в памяти (например, ждущие возвращения игрока) относятся к
+    # удалённой базе, а номера игр в новой начинаются заново
+    game_engine.games.clear()
+    game_engine.pending.clear()
+    # Соединения асинхронного пула привязаны к циклу событий теста
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def players():
+    """Два игрока в базе: (player1_id, player2_id)."""
+    db = SessionLocal()
+    try:
+        player1 = User(username="player1", hashed_password="-")
+        player2 = User(username="player2", hashed_password="-")
+        db.add_all([player1, player2])
+        db.commit()
+        return player1.id, player2.id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def create_games(players):
+    """Создание игр двух игроков в базе; возвращает их id."""
+
+    def create(count: int = 1, status: str = "setup"):
+        db = SessionLocal()
+        try:
+            rows = [
+                Game(player1_id=players[0], player2_id=players[1], status=status)
+                for _ in range(count)
+            ]
+            db.add_all(rows)
+            db.commit()
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    return create
+
+
+@pytest.fixture
+def client():
+    """Клиент приложения с запущенными фоновыми задачами."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def register(client):
+    """Регистрация и вход пользователя; возвращает его JWT."""
+
+    def register(username: str) -> str:
+        client.post("/register/", json={"username": username, "password": "secret"})
+        response = client.post("/token/", json={"username": username, "password": "secret"})
+        return response.json()["access_token"]
+
+    return register
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def receive_until(websocket, action: str) -> dict:
+    """Следующее сообщение WebSocket с заданным action."""
+    while True:
+        message = websocket.receive_json()
+        if message.get("action") == action:
+            return message
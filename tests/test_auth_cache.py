@@ -0,0 +1,58 @@
+# tests/test_auth_cache.py
+"""Кэш авторизации: JWT проверяется и пользователь читается из базы один раз,
+а выход из системы и ограничения кэша сбрасывают записи."""
+
+import pytest
+from conftest import bearer
+
+from app.services import auth_service
+from app.services.auth_service import TTLCache, principal_cache, token_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    token_cache.clear()
+    principal_cache.clear()
+    yield
+    token_cache.clear()
+    principal_cache.clear()
+
+
+def test_token_is_verified_once(client, register, monkeypatch):
+    token = register("alice")
+    decoded = []
+    decode_token = auth_service.decode_token
+
+    def counting_decode(token):
+        decoded.append(token)
+        return decode_token(token)
+
+    monkeypatch.setattr(auth_service, "decode_token", counting_decode)
+    for _ in range(3):
+        response = client.get("/users/me/", headers=bearer(token))
+        assert response.json()["username"] == "alice"
+    assert decoded == [token]
+    assert principal_cache.get("alice").username == "alice"
+
+
+def test_logout_drops_cached_token(client, register):
+    token = register("alice")
+    client.get("/users/me/", headers=bearer(token))
+    assert token_cache.get(token) is not None
+
+    client.post("/auth/logout", headers=bearer(token))
+    assert token_cache.get(token) is None
+
+
+def test_ttl_cache_limits():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # Вытесняется давно не использованная запись
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    # Токен, срок которого уже истёк, не кэшируется
+    cache.set("expired", 4, ttl=-1)
+    assert cache.get("expired") is None
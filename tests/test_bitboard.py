@@ -0,0 +1,70 @@
+# tests/test_bitboard.py
+"""Битовые маски доски против прежней реализации на списках: размещение,
+запрет соседства, выстрелы и проверка победы дают те же результаты."""
+
+import random
+
+import pytest
+
+from app.game_logic.bitboard import cell_bit, dilate, ship_masks
+from app.game_logic.board import (can_place_ship, generate_bitboard, generate_board,
+                                  place_ship_manual)
+from app.game_logic.utils import check_winner, make_move
+
+ORIENTATIONS = ("horizontal", "vertical", "diagonal")
+
+
+def neighbourhood(cells, size):
+    """Клетки и их соседи, включая диагонали, перебором."""
+    mask = 0
+    for x, y in cells:
+        for nx in range(x - 1, x + 2):
+            for ny in range(y - 1, y + 2):
+                if 0 <= nx < size and 0 <= ny < size:
+                    mask |= cell_bit(nx, ny, size)
+    return mask
+
+
+@pytest.mark.parametrize("size", [5, 10, 12])
+def test_dilate_matches_neighbourhood(size):
+    rng = random.Random(size)
+    for _ in range(200):
+        count = rng.randint(1, 4)
+        cells = [(rng.randrange(size), rng.randrange(size)) for _ in range(count)]
+        mask = 0
+        for x, y in cells:
+            mask |= cell_bit(x, y, size)
+        assert dilate(mask, size) == neighbourhood(cells, size)
+
+
+def test_ship_masks_bounds():
+    mask, halo = ship_masks(9, 6, 4, "horizontal")
+    assert mask == sum(cell_bit(9, y) for y in range(6, 10))
+    assert halo == neighbourhood([(9, y) for y in range(6, 10)], 10)
+    assert ship_masks(9, 7, 4, "horizontal") is None
+    assert ship_masks(7, 9, 4, "vertical") is None
+    # Списки принимают отрицательные индексы, маски — нет
+    assert ship_masks(-1, 0, 1, "vertical") is None
+    assert not can_place_ship(generate_bitboard(), 0, -1, 1, "horizontal")
+    assert ship_masks(0, 0, 2, "diagonal") is None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_bitboard_matches_list_board(seed):
+    rng = random.Random(seed)
+    grid, bitboard = generate_board(), generate_bitboard()
+
+    for _ in range(60):
+        x, y = rng.randrange(10), rng.randrange(10)
+        ship_size, orientation = rng.randint(1, 5), rng.choice(ORIENTATIONS)
+        allowed = place_ship_manual(grid, x, y, ship_size, orientation)
+        assert place_ship_manual(bitboard, x, y, ship_size, orientation) == allowed
+        assert bitboard.to_grid() == grid
+
+    shots = [(x, y) for x in range(-1, 11) for y in range(-1, 11)] * 2
+    rng.shuffle(shots)
+    for x, y in shots:
+        assert make_move(bitboard, x, y) == make_move(grid, x, y)
+        assert check_winner(bitboard) == check_winner(grid)
+    assert bitboard.to_grid() == grid
+    assert check_winner(bitboard)
@@ -0,0 +1,60 @@
+# tests/test_board_codec.py
+"""Двоичный формат хранения досок (encode_board / decode_board)."""
+
+import json
+import random
+
+import pytest
+
+from app.game_logic.bitboard import HIT, MISS, SHIP, WATER, Bitboard
+from app.game_logic.fleet import random_bitboard
+from app.game_logic.utils import BOARD_CODEC_VERSION, decode_board, encode_board
+
+
+def played_board(seed: int) -> Bitboard:
+    """Поле со случайным флотом и случайными выстрелами."""
+    rng = random.Random(seed)
+    board = random_bitboard(rng=rng)
+    for _ in range(40):
+        board.shoot(rng.randrange(board.size), rng.randrange(board.size))
+    return board
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_round_trip(seed):
+    board = played_board(seed)
+    assert decode_board(encode_board(board)) == board
+
+
+def test_layout():
+    """[версия][размер][корабли LE][выстрелы LE], по 13 байт на маску 10x10."""
+    grid = [[WATER] * 10 for _ in range(10)]
+    grid[0][0] = SHIP
+    grid[0][1] = HIT
+    grid[9][9] = MISS
+    data = encode_board(grid)
+
+    assert len(data) == 2 + 2 * 13
+    assert data[:2] == bytes((BOARD_CODEC_VERSION, 10))
+    assert int.from_bytes(data[2:15], "little") == 0b11
+    assert int.from_bytes(data[15:28], "little") == 0b10 | 1 << 99
+    assert decode_board(data).to_grid() == grid
+
+
+def test_encodes_grids_and_bitboards_alike():
+    board = played_board(1)
+    assert encode_board(board.to_grid()) == encode_board(board)
+
+
+def test_decodes_legacy_json():
+    board = played_board(2)
+    assert decode_board(json.dumps(board.to_grid())) == board
+
+
+def test_empty_and_unknown_version():
+    assert decode_board(None) is None
+    assert decode_board(b"") is None
+    data = bytearray(encode_board(played_board(3)))
+    data[0] = BOARD_CODEC_VERSION + 1
+    with pytest.raises(ValueError):
+        decode_board(bytes(data))
@@ -0,0 +1,56 @@
+# tests/test_bot.py
+"""Бот играет честно: решения зависят только от попаданий и промахов,
+а его пользователь отличается флагом, а не именем."""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db.session import SessionLocal
+from app.game_logic.bot import BotPlayer, opponent_view
+from app.game_logic.fleet import random_bitboard
+from app.game_logic.game import BOT_USERNAME, get_bot_user
+from app.main import app
+from app.models import User
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_bot_sees_only_shots(seed):
+    """С доской без кораблей бот делает те же ходы и топит весь флот."""
+    board = random_bitboard(rng=random.Random(seed))
+    honest, peeking = BotPlayer(1, seed=seed), BotPlayer(1, seed=seed)
+    shots = set()
+    while not board.all_sunk():
+        x, y = honest.choose_shot(opponent_view(board))
+        assert peeking.choose_shot(board) == (x, y)
+        assert (x, y) not in shots
+        shots.add((x, y))
+        board.shoot(x, y)
+    assert len(shots) < 100
+    # Последнее попадание закрывает все подбитые корабли
+    honest.observe(opponent_view(board))
+    assert not honest.open_hits
+
+
+def test_bot_user_is_flagged_not_named(players):
+    """Человек с именем бота не становится ботом."""
+    db = SessionLocal()
+    try:
+        db.add(User(username=BOT_USERNAME, hashed_password="-"))
+        db.commit()
+        bot = get_bot_user(db)
+        assert bot.is_bot and bot.username != BOT_USERNAME
+        assert get_bot_user(db).id == bot.id
+        assert bot.id not in players
+    finally:
+        db.close()
+
+
+def test_bot_name_is_reserved():
+    with TestClient(app) as client:
+        for username in (BOT_USERNAME, BOT_USERNAME.upper()):
+            response = client.post(
+                "/register/", json={"username": username, "password": "secret"}
+            )
+            assert response.status_code == 400
@@ -0,0 +1,157 @@
+# tests/test_connections.py
+"""Соединения: медленный клиент не задерживает остальных, переполнение его
+очереди ведёт к resync_required или закрытию, а молчащие и мёртвые сокеты
+и брошенные игры убираются."""
+
+import asyncio
+
+import pytest
+from conftest import bearer, receive_until
+from starlette.websockets import WebSocketDisconnect
+
+from app import websocket_handlers
+from app.broadcast import InProcessBroadcast
+from app.db.session import AsyncSessionLocal
+from app.game_logic.engine import game_engine
+from app.json_codec import loads
+from app.websocket_handlers import (MAX_QUEUE_OVERFLOWS, ClientConnection,
+                                    ConnectionManager, Heartbeat)
+
+
+class FakeWebSocket:
+    """Сокет, который отправляет сообщения, только когда его отпустят."""
+
+    def __init__(self, slow: bool = False):
+        self.scope = {"subprotocols": []}
+        self.sent = []
+        self.closed_with = None
+        self.released = asyncio.Event()
+        if not slow:
+            self.released.set()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message: str):
+        await self.released.wait()
+        self.sent.append(loads(message))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_slow_client_does_not_delay_broadcast():
+    async def scenario():
+        manager = ConnectionManager(InProcessBroadcast())
+        slow, fast = FakeWebSocket(slow=True), FakeWebSocket()
+        await manager.connect(slow, 1, 1)
+        await manager.connect(fast, 1, 2)
+
+        for seq in range(3):
+            await manager.broadcast_to_game(f'{{"seq":{seq}}}', 1)
+        await settle()
+        assert [message["seq"] for message in fast.sent] == [0, 1, 2]
+        assert slow.sent == []
+        assert manager.metrics()["max_queue_depth"] == 2
+
+        slow.released.set()
+        await settle()
+        assert [message["seq"] for message in slow.sent] == [0, 1, 2]
+        for websocket in (slow, fast):
+            manager.disconnect(websocket, 1, None)
+
+    asyncio.run(scenario())
+
+
+def test_queue_overflow_requires_resync():
+    async def scenario():
+        websocket = FakeWebSocket(slow=True)
+        client = ClientConnection(websocket, queue_size=2)
+        for seq in range(3):
+            assert client.send(f'{{"seq":{seq}}}')
+        assert (client.overflows, client.dropped) == (1, 3)
+
+        websocket.released.set()
+        await settle()
+        assert websocket.sent == [{"status": "success", "action": "resync_required"}]
+        client.stop()
+
+    asyncio.run(scenario())
+
+
+def test_repeated_overflow_closes_connection():
+    async def scenario():
+        websocket = FakeWebSocket(slow=True)
+        client = ClientConnection(websocket, queue_size=1)
+        while not client.closed:
+            client.send('{"seq":0}')
+        await settle()
+        assert client.overflows == MAX_QUEUE_OVERFLOWS
+        assert websocket.closed_with == 1013
+        assert not client.send('{"seq":1}')
+
+    asyncio.run(scenario())
+
+
+class BrokenWebSocket(FakeWebSocket):
+    """Сокет, отправка в который падает (клиент пропал без закрытия)."""
+
+    async def send_text(self, message: str):
+        raise ConnectionResetError("Connection lost")
+
+
+def test_reaper_cleans_closed_sockets():
+    async def scenario():
+        manager = ConnectionManager(InProcessBroadcast())
+        broken, alive = BrokenWebSocket(), FakeWebSocket()
+        await manager.connect(broken, 1, 1)
+        await manager.connect(alive, 1, 2)
+        await manager.connect_spectator(BrokenWebSocket(), 1)
+
+        manager.ping()
+        await settle()
+        assert manager.reap() == 2
+        assert manager.active_connections == {1: [alive]}
+        assert manager.user_connections == {1: {2: alive}}
+        assert manager.spectators == {}
+        assert list(manager.clients) == [alive]
+        assert alive.sent == [{"status": "success", "action": "ping"}]
+        manager.disconnect(alive, 1, 2)
+
+    asyncio.run(scenario())
+
+
+def test_silent_socket_is_closed(client, register, monkeypatch):
+    monkeypatch.setattr(websocket_handlers, "IDLE_TIMEOUT", 0.2)
+    token = register("alice")
+    game_id = client.post("/games/start/", headers=bearer(token)).json()["game_id"]
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token}") as websocket:
+        receive_until(websocket, "game_state")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            while True:
+                websocket.receive_json()
+    assert closed.value.code == 1001
+    assert game_id not in websocket_handlers.manager.user_connections
+
+
+def test_heartbeat_releases_abandoned_game(create_games):
+    (game_id,) = create_games()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await game_engine.load(game_id, db)
+        heartbeat = Heartbeat()
+        # Игра выгружается, только если брошена два шага подряд
+        await heartbeat.tick()
+        assert game_engine.get(game_id) is not None
+        await heartbeat.tick()
+        assert game_engine.get(game_id) is None
+        assert heartbeat.metrics()["released_games"] == 1
+
+    asyncio.run(scenario())
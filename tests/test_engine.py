@@ -0,0 +1,161 @@
+# tests/test_engine.py
+"""Движок живых игр: compare-and-swap по версии строки и отсутствие
+потерянных обновлений при конкурентных изменениях."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.game_logic.engine import GameEngine
+from app.game_logic.fleet import random_bitboard
+from app.game_logic.utils import decode_board
+from app.models import Game, Move
+
+
+class CountingEngine(GameEngine):
+    """Движок, считающий перечитывания игры после конфликтов версий."""
+
+    def __init__(self):
+        super().__init__()
+        self.conflicts = 0
+
+    async def reload(self, live, db):
+        self.conflicts += 1
+        await super().reload(live, db)
+
+
+async def statuses(game_ids):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Game.status).where(Game.id.in_(game_ids)))
+        return [row.status for row in result]
+
+
+async def get_game(game_id):
+    async with AsyncSessionLocal() as db:
+        return await db.get(Game, game_id)
+
+
+async def ready_client(engine: GameEngine, game_id: int, user_id: int):
+    """Клиент: загрузить игру и отправить ready через свою сессию БД."""
+    async with AsyncSessionLocal() as db:
+        live = await engine.load(game_id, db)
+        await asyncio.sleep(0)
+        await engine.apply(live, db, lambda game: game.set_ready(user_id))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_concurrent_ready_loses_no_updates(players, create_games, workers):
+    """Оба игрока одновременно жмут ready — каждая игра начинается.
+
+    С двумя воркерами у каждого клиента свой движок со своей копией игры,
+    и готовность одного из них всегда упирается в конфликт версий.
+    """
+    game_ids = create_games(50)
+    engines = [CountingEngine() for _ in range(workers)]
+
+    async def scenario():
+        await asyncio.gather(
+            *(
+                coroutine
+                for game_id in game_ids
+                for coroutine in (
+                    ready_client(engines[0], game_id, players[0]),
+                    ready_client(engines[-1], game_id, players[1]),
+                )
+            )
+        )
+        return await statuses(game_ids)
+
+    assert asyncio.run(scenario()) == ["in_progress"] * len(game_ids)
+    if workers == 2:
+        assert sum(engine.conflicts for engine in engines) > 0
+
+
+def test_status_change_retries_after_conflict(players, create_games):
+    """ready на устаревшей копии перечитывает игру и повторяется."""
+    (game_id,) = create_games()
+    first, second = CountingEngine(), CountingEngine()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            live1 = await first.load(game_id, db)
+            live2 = await second.load(game_id, db)
+            await first.apply(live1, db, lambda game: game.set_ready(players[0]))
+            await second.apply(live2, db, lambda game: game.set_ready(players[1]))
+            return live2
+
+    live2 = asyncio.run(scenario())
+    row = asyncio.run(get_game(game_id))
+    assert second.conflicts == 1
+    assert live2.status == row.status == "in_progress"
+    assert live2.version == row.version
+    assert row.turn == players[0]
+
+
+def test_batch_conflict_replays_unflushed_actions(players, create_games):
+    """Расстановка из пачки не теряется, если строку изменил другой воркер."""
+    (game_id,) = create_games()
+    first, second = CountingEngine(), CountingEngine()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            live1 = await first.load(game_id, db)
+            await first.flush(live1, db)
+            live2 = await second.load(game_id, db)
+
+            live1.board_player1.ships = 0
+            await first.apply(
+                live1, db, lambda game: game.place_ship(players[0], 0, 0, 4, "horizontal")
+            )
+            await second.apply(live2, db, lambda game: game.set_ready(players[1]))
+
+            # Первая пачка упирается в конфликт, вторая записывает повтор
+            await first.flush_pending(db)
+            assert first.conflicts == 1
+            assert not db.in_transaction()
+            assert live1.status == "player2_ready"
+            assert game_id in first.pending
+            await first.flush_pending(db)
+            assert not first.pending and not live1.unflushed
+
+    asyncio.run(scenario())
+    row = asyncio.run(get_game(game_id))
+    assert row.status == "player2_ready"
+    assert decode_board(row.board_player1).ships == 0b1111
+
+
+def test_rejected_replay_notifies_listeners(players, create_games):
+    """Ход, ставший невозможным после чужой записи, не пишется молча."""
+    (game_id,) = create_games(status="in_progress")
+    first, second = CountingEngine(), CountingEngine()
+    conflicted = []
+    first.on_conflict(conflicted.append)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            live1 = await first.load(game_id, db)
+            live1.board_player1 = random_bitboard()
+            live1.board_player2 = random_bitboard()
+            live1.turn = players[0]
+            await first.flush(live1, db)
+            live2 = await second.load(game_id, db)
+
+            # Оба воркера принимают выстрел в одну и ту же клетку
+            for engine, live in ((first, live1), (second, live2)):
+                await engine.apply(live, db, lambda game: game.make_move(players[0], 5, 5))
+            await second.flush_pending(db)
+            await first.flush_pending(db)
+            return live1
+
+    live1 = asyncio.run(scenario())
+    assert conflicted == [live1]
+    assert not live1.unflushed and not live1.dirty
+
+    async def moves():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Move.seq).where(Move.game_id == game_id))
+            return list(result.scalars())
+
+    assert asyncio.run(moves()) == [1]
@@ -0,0 +1,37 @@
+# tests/test_fleet.py
+"""Автоматическая расстановка флота (place_ships_auto)."""
+
+import random
+
+import pytest
+
+from app.game_logic.board import generate_bitboard, generate_board, place_ships_auto
+from app.game_logic.fleet import FLEET
+
+
+def ship_cells(board) -> int:
+    return sum(row.count("S") for row in board)
+
+
+@pytest.mark.parametrize("make_board", [generate_board, generate_bitboard])
+def test_places_whole_fleet(make_board):
+    board = place_ships_auto(make_board(), rng=random.Random(1))
+    grid = board if isinstance(board, list) else board.to_grid()
+    assert ship_cells(grid) == sum(FLEET)
+
+
+def test_crowded_board_starts_over():
+    """Флот не помещается рядом с уже стоящими кораблями — новая доска."""
+    board = generate_board()
+    for x in range(0, 10, 2):
+        board[x] = ["S"] * 10
+    placed = place_ships_auto(board, rng=random.Random(2))
+    assert placed is not board
+    assert ship_cells(placed) == sum(FLEET)
+
+
+def test_fleet_too_large_for_board():
+    with pytest.raises(ValueError):
+        place_ships_auto(generate_bitboard(5))
+    with pytest.raises(ValueError):
+        place_ships_auto(generate_board(5))
@@ -0,0 +1,46 @@
+# tests/test_join.py
+"""Присоединение второго игрока (человека или бота) к уже загруженной игре."""
+
+from conftest import bearer, receive_until
+
+from app.game_logic.bot import game_bots
+from app.game_logic.engine import game_engine
+
+
+def test_join_updates_loaded_game(client, register):
+    token1, token2 = register("alice"), register("bob")
+    game_id = client.post("/games/start/", headers=bearer(token1)).json()["game_id"]
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token1}") as websocket1:
+        assert receive_until(websocket1, "game_state")["game_status"] == "waiting"
+        response = client.post(f"/games/join/?game_id={game_id}", headers=bearer(token2))
+        assert response.status_code == 200
+
+        live = game_engine.get(game_id)
+        assert (live.player2_id, live.status) == (response.json()["player2_id"], "setup")
+        websocket1.send_json({"action": "get_state"})
+        state = receive_until(websocket1, "game_state")
+        assert state["game_status"] == "setup"
+        assert state["opponent_id"] == live.player2_id
+
+        # Готовность пишется сразу: версия в памяти совпадает с базой
+        websocket1.send_json({"action": "randomize_fleet"})
+        receive_until(websocket1, "fleet_randomized")
+        websocket1.send_json({"action": "ready"})
+        assert receive_until(websocket1, "player_ready")["game_status"] == "player1_ready"
+
+
+def test_bot_joins_loaded_game(client, register):
+    token = register("alice")
+    game_id = client.post("/games/start/", headers=bearer(token)).json()["game_id"]
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token}") as websocket:
+        receive_until(websocket, "game_state")
+        response = client.post(f"/games/{game_id}/bot/", headers=bearer(token))
+        assert response.status_code == 200
+        bot_id = response.json()["player2_id"]
+        assert [bot.user_id for bot in game_bots.of(game_id)] == [bot_id]
+
+        # Бот сам расставляет флот и подтверждает готовность
+        event = receive_until(websocket, "player_ready")
+        assert (event["ready_player"], event["game_status"]) == (bot_id, "player2_ready")
@@ -0,0 +1,62 @@
+# tests/test_lobby.py
+"""Индекс ожидающих игр: игра уходит из лобби, когда к ней присоединился
+бот или когда она истекла."""
+
+import asyncio
+
+from conftest import bearer
+
+from app.db.session import AsyncSessionLocal
+from app.game_logic import lobby
+from app.game_logic.lobby import waiting_games
+from app.models import Game
+
+
+def record_events(monkeypatch):
+    events = []
+    monkeypatch.setattr(waiting_games, "listeners", [])
+    waiting_games.subscribe(
+        lambda event: events.append((event["action"], event.get("game_id") or event["game"]["id"]))
+    )
+    return events
+
+
+def test_bot_game_is_removed(client, register, monkeypatch):
+    token = register("alice")
+    events = record_events(monkeypatch)
+    game_id = client.post("/games/start/", headers=bearer(token)).json()["game_id"]
+    client.post(f"/games/{game_id}/bot/", headers=bearer(token))
+
+    assert events == [("game_created", game_id), ("game_removed", game_id)]
+    assert game_id not in {game["id"] for game in waiting_games.page()}
+
+
+def test_expired_games_are_removed(client, register, monkeypatch):
+    token1, token2 = register("alice"), register("bob")
+    kept, expired, joined = (
+        client.post("/games/start/", headers=bearer(token1)).json()["game_id"]
+        for _ in range(3)
+    )
+    client.post(f"/games/join/?game_id={joined}", headers=bearer(token2))
+    events = record_events(monkeypatch)
+    monkeypatch.setattr(lobby, "WAITING_GAME_TTL", -1)
+
+    async def expire():
+        async with AsyncSessionLocal() as db:
+            removed = await waiting_games.expire(db, waiting_games.stale(keep={kept}))
+            return removed, [(await db.get(Game, game_id)).status for game_id in (kept, expired, joined)]
+
+    assert asyncio.run(expire()) == (1, ["waiting", "expired", "setup"])
+    assert events == [("game_removed", expired)]
+    assert [game["id"] for game in waiting_games.page()] == [kept]
+
+
+def test_waiting_games_page_bounds(client, register):
+    token = register("alice")
+    game_ids = [
+        client.post("/games/start/", headers=bearer(token)).json()["game_id"] for _ in range(3)
+    ]
+    response = client.get("/games/waiting/?offset=1&limit=1")
+    assert [game["id"] for game in response.json()] == game_ids[1:2]
+    for query in ("offset=-1", "limit=0", "limit=501"):
+        assert client.get(f"/games/waiting/?{query}").status_code == 422
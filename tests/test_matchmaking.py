@@ -0,0 +1,93 @@
+# tests/test_matchmaking.py
+"""Очередь подбора соперников: в памяти процесса и на Redis (fakeredis)."""
+
+import fakeredis
+import pytest
+from conftest import bearer
+
+import app.main
+from app.game_logic import matchmaking
+from app.game_logic.matchmaking import Matchmaker, RedisMatchmaker
+
+
+@pytest.fixture(params=["memory", "redis"])
+def matchmaker(request, monkeypatch):
+    if request.param == "memory":
+        return Matchmaker()
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        matchmaking.redis.Redis,
+        "from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs),
+    )
+    return RedisMatchmaker("redis://fake")
+
+
+def test_pairs_inside_rating_band(matchmaker):
+    assert matchmaker.enqueue(1, rating=1000) is None
+    # Другая полоса — пары нет
+    assert matchmaker.enqueue(2, rating=1250) is None
+    assert matchmaker.enqueue(3, rating=1099) == 1
+    assert not matchmaker.is_queued(1) and matchmaker.is_queued(2)
+    # Без рейтинга — общая очередь, отдельная от полос
+    assert matchmaker.enqueue(4) is None
+    assert matchmaker.enqueue(5, rating=1250) == 2
+    assert matchmaker.enqueue(6) == 4
+
+
+def test_band_widens_with_waiting_time(matchmaker, monkeypatch):
+    assert matchmaker.enqueue(1, rating=1000) is None
+    # Соседняя полоса: заявка 1 ждёт меньше BAND_WIDEN_INTERVAL
+    assert matchmaker.enqueue(2, rating=1250) is None
+
+    monkeypatch.setattr(matchmaking, "BAND_WIDEN_INTERVAL", 0.0)
+    # Дальше MAX_BAND_WIDENING поиск не расширяется
+    far = 1250 + (matchmaking.MAX_BAND_WIDENING + 1) * matchmaking.RATING_BAND_WIDTH
+    assert matchmaker.enqueue(3, rating=far) is None
+    # Обе ждущие заявки в пределах расширения — берётся более старая
+    assert matchmaker.enqueue(4, rating=1150) == 1
+    assert matchmaker.is_queued(2) and matchmaker.is_queued(3)
+
+
+def test_cancel(matchmaker):
+    assert matchmaker.enqueue(1, rating=1000) is None
+    assert matchmaker.cancel(1)
+    assert not matchmaker.cancel(1)
+    assert not matchmaker.is_queued(1)
+    assert matchmaker.enqueue(2, rating=1000) is None
+    # Повторная постановка не подбирает игрока самому себе
+    assert matchmaker.enqueue(2, rating=1000) is None
+
+
+def test_requeue_restores_position_without_pairing(matchmaker):
+    assert matchmaker.enqueue(1, rating=1000) is None
+    assert matchmaker.enqueue(2, rating=1000) == 1
+    assert matchmaker.enqueue(3, rating=1000) is None
+
+    # Игру создать не удалось: заявка 1 возвращается впереди заявки 3
+    assert matchmaker.requeue(1)
+    assert not matchmaker.requeue(1)
+    assert matchmaker.is_queued(1) and matchmaker.is_queued(3)
+    assert matchmaker.enqueue(4, rating=1000) == 1
+
+
+def test_record_match(matchmaker):
+    matchmaker.enqueue(1)
+    assert matchmaker.enqueue(2) == 1
+    matchmaker.record_match(1, 42)
+    assert not matchmaker.requeue(1)
+    assert matchmaker.pop_match(1) == 42
+    assert matchmaker.pop_match(1) is None
+
+
+def test_failed_game_keeps_opponent_queued(client, register, monkeypatch):
+    monkeypatch.setattr(app.main, "matchmaker", Matchmaker())
+
+    def fail(*args):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(app.main, "create_paired_game", fail)
+    token1, token2 = register("alice"), register("bob")
+    assert client.post("/matchmaking/queue/", headers=bearer(token1)).json()["status"] == "queued"
+    assert client.post("/matchmaking/queue/", headers=bearer(token2)).status_code == 500
+    assert client.get("/matchmaking/queue/", headers=bearer(token1)).json()["status"] == "queued"
@@ -0,0 +1,80 @@
+# tests/test_pages.py
+"""HTML-страницы из памяти: подстановки, ETag/304 и выбор сжатия по
+Accept-Encoding."""
+
+import gzip
+from types import SimpleNamespace
+
+import pytest
+
+from app import pages
+from app.pages import (STATIC_DIR, PageTemplate, PageVariants, accepted_encodings,
+                       etag_matches)
+
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def test_page_etag_and_not_modified(client):
+    response = client.get("/auth", headers=IDENTITY)
+    assert response.status_code == 200
+    assert response.content == (STATIC_DIR / "auth.html").read_bytes()
+    assert "Content-Encoding" not in response.headers
+    etag = response.headers["ETag"]
+
+    for header in (etag, "W/" + etag, f'"other", {etag}', "*"):
+        cached = client.get("/auth", headers={**IDENTITY, "If-None-Match": header})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+    changed = client.get("/auth", headers={**IDENTITY, "If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+
+def test_gzip_variant_has_own_etag(client):
+    plain = client.get("/auth", headers=IDENTITY)
+    response = client.get("/auth", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    # Клиент распаковывает тело сам
+    assert response.content == plain.content
+    assert response.headers["ETag"] != plain.headers["ETag"]
+
+    # ETag несжатого тела не подходит для сжатого
+    stale = client.get(
+        "/auth", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]}
+    )
+    assert stale.status_code == 200
+
+
+def test_template_substitution():
+    template = PageTemplate("<h1>{{ game_id }}</h1><p>{{username}}</p>")
+    page = template.render(game_id=42, username="<bob>")
+    assert page.body == b"<h1>42</h1><p>&lt;bob&gt;</p>"
+    assert template.render(username="<bob>", game_id=42) is page
+    assert template.render(game_id=43, username="<bob>").etag() != page.etag()
+
+
+def test_accept_encoding_parsing():
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("gzip;q=0, br;q=0.5, *;q=bad") == {"br"}
+    assert accepted_encodings("") == set()
+    assert not etag_matches('"a", "b"', '"c"')
+
+
+def test_compressed_bodies_are_built_once(monkeypatch):
+    variants = PageVariants(b"<html>" + b"x" * 1000 + b"</html>")
+    body = variants.encode("gzip")
+    assert gzip.decompress(body) == variants.body
+    assert variants.encode("gzip") is body
+
+    # Без brotli клиент, принимающий только br, получает несжатое тело
+    monkeypatch.setattr(pages, "brotli", None)
+    request = SimpleNamespace(headers={"accept-encoding": "br"})
+    assert variants.negotiate(request) is None
+
+
+def test_brotli_preferred_when_available(client):
+    if pages.brotli is None:
+        pytest.skip("brotli is not installed")
+    response = client.get("/auth", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
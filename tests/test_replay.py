@@ -0,0 +1,83 @@
+# tests/test_replay.py
+"""Архив завершённой игры: из расстановки и журнала ходов восстанавливаются
+те же доски, что записаны в базу."""
+
+import time
+
+from conftest import bearer, receive_until
+
+from app.db.session import SessionLocal
+from app.game_logic.replay import decode_archive, replay, shot_count
+from app.game_logic.utils import decode_board
+from app.models import Game, Move
+
+
+def play_to_the_end(websockets: dict) -> dict:
+    """Игроки по очереди стреляют по всем клеткам; событие конца игры."""
+    for websocket in websockets.values():
+        websocket.send_json({"action": "randomize_fleet"})
+        receive_until(websocket, "fleet_randomized")
+        websocket.send_json({"action": "ready"})
+    while True:
+        event = receive_until(websockets[min(websockets)], "player_ready")
+        if event["game_status"] == "in_progress":
+            break
+
+    shots = {
+        user_id: iter([(x, y) for x in range(10) for y in range(10)])
+        for user_id in websockets
+    }
+    turn = event["turn"]
+    while True:
+        x, y = next(shots[turn])
+        websockets[turn].send_json({"action": "make_move", "x": x, "y": y})
+        # Событие хода получают оба игрока
+        for websocket in websockets.values():
+            event = receive_until(websocket, "move_result")
+        if event["game_status"] == "finished":
+            return event
+        turn = event["turn"]
+
+
+def stored_game(game_id: int) -> Game:
+    """Строка игры после фоновой записи досок и всех ходов."""
+    for _ in range(500):
+        with SessionLocal() as db:
+            game = db.get(Game, game_id)
+            written = db.query(Move).filter(Move.game_id == game_id).count()
+            if game.status == "finished" and written == shot_count(
+                decode_board(game.board_player1), decode_board(game.board_player2)
+            ):
+                return game
+        time.sleep(0.01)
+    raise AssertionError("Game was not flushed in time")
+
+
+def test_archive_replays_to_stored_boards(client, register):
+    token1, token2 = register("alice"), register("bob")
+    game_id = client.post("/games/start/", headers=bearer(token1)).json()["game_id"]
+    client.post(f"/games/join/?game_id={game_id}", headers=bearer(token2))
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token1}") as websocket1:
+        state1 = receive_until(websocket1, "game_state")
+        with client.websocket_connect(f"/ws/{game_id}?token={token2}") as websocket2:
+            state2 = receive_until(websocket2, "game_state")
+            finished = play_to_the_end(
+                {state1["player_id"]: websocket1, state2["player_id"]: websocket2}
+            )
+
+    game = stored_game(game_id)
+    response = client.get(f"/games/{game_id}/archive/", headers=bearer(token1))
+    assert response.status_code == 200
+    archive = decode_archive(response.content)
+
+    board1, board2, winner_id = replay(
+        archive.board_player1,
+        archive.board_player2,
+        archive.player1_id,
+        archive.player2_id,
+        archive.moves,
+    )
+    assert board1 == decode_board(game.board_player1)
+    assert board2 == decode_board(game.board_player2)
+    assert winner_id == archive.winner_id == game.winner_id == finished["winner"]
@@ -0,0 +1,87 @@
+# tests/test_resume.py
+"""Возобновление сессии игрока после обрыва соединения: досылка
+пропущенных событий по номеру последнего полученного."""
+
+import pytest
+from conftest import bearer, receive_until
+from starlette.websockets import WebSocketDisconnect
+
+from app.db.session import SessionLocal
+from app.game_logic.engine import LiveGame, game_engine
+from app.models import Game
+
+
+def start_game(websocket1, websocket2) -> dict:
+    """Оба игрока расставляют флот и жмут ready; последнее событие второго."""
+    for websocket in (websocket1, websocket2):
+        websocket.send_json({"action": "randomize_fleet"})
+        receive_until(websocket, "fleet_randomized")
+        websocket.send_json({"action": "ready"})
+    while True:
+        event = receive_until(websocket2, "player_ready")
+        if event["game_status"] == "in_progress":
+            return event
+
+
+def test_resume_replays_missed_events(client, register):
+    token1, token2 = register("alice"), register("bob")
+    game_id = client.post("/games/start/", headers=bearer(token1)).json()["game_id"]
+    client.post(f"/games/join/?game_id={game_id}", headers=bearer(token2))
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token1}") as websocket1:
+        receive_until(websocket1, "game_state")
+        with client.websocket_connect(f"/ws/{game_id}?token={token2}") as websocket2:
+            session = receive_until(websocket2, "session")
+            last = start_game(websocket1, websocket2)
+
+        # Второй игрок отключился; первый ходит, пока не промахнётся
+        missed = []
+        shots = iter((x, y) for x in range(10) for y in range(10))
+        while game_engine.get(game_id).turn == last["turn"] and len(missed) < 3:
+            x, y = next(shots)
+            websocket1.send_json({"action": "make_move", "x": x, "y": y})
+            missed.append(receive_until(websocket1, "move_result")["seq"])
+
+        resume_url = (
+            f"/ws/{game_id}?resume={session['resume_token']}"
+            f"&since={last['seq']}&epoch={last['epoch']}"
+        )
+        with client.websocket_connect(resume_url) as websocket2:
+            resumed = websocket2.receive_json()
+            assert resumed["action"] == "session"
+            assert resumed["resume_token"] != session["resume_token"]
+            replayed = [websocket2.receive_json() for _ in missed]
+            assert [event["seq"] for event in replayed] == missed
+            assert all(event["action"] == "move_result" for event in replayed)
+
+        # Токен одноразовый: повторное возобновление с ним отклоняется
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(resume_url) as websocket2:
+                websocket2.receive_json()
+
+        # Номер из другой загрузки игры: вместо досылки — полный снимок
+        stale_url = (
+            f"/ws/{game_id}?resume={resumed['resume_token']}"
+            f"&since={last['seq']}&epoch={last['epoch'] + 1}"
+        )
+        with client.websocket_connect(stale_url) as websocket2:
+            assert websocket2.receive_json()["action"] == "session"
+            state = websocket2.receive_json()
+            assert state["action"] == "game_state"
+            assert state["epoch"] == last["epoch"]
+
+
+def test_events_are_numbered_per_load(create_games):
+    (game_id,) = create_games()
+    with SessionLocal() as db:
+        row = db.get(Game, game_id)
+        before, after = LiveGame.from_model(row), LiveGame.from_model(row)
+
+    # Обе загрузки нумеруют события с единицы
+    for live in (before, after):
+        live.record_event({"action": "player_ready"})
+        live.record_event({"action": "player_ready"})
+    assert before.epoch != after.epoch
+
+    assert after.events_since(1, None, before.epoch) is None
+    assert len(after.events_since(1, None, after.epoch)) == 1
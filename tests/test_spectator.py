@@ -0,0 +1,55 @@
+# tests/test_spectator.py
+"""Зритель получает ходы идущей игры, но не видит корабли игроков до её
+окончания и не может действовать."""
+
+from conftest import bearer, receive_until
+
+from app.websocket_handlers import manager
+
+
+def ship_cells(state: dict) -> int:
+    boards = (state["board_player1"], state["board_player2"])
+    return sum(row.count("S") for board in boards for row in board)
+
+
+def test_spectator_watches_move(client, register):
+    token1, token2 = register("alice"), register("bob")
+    game_id = client.post("/games/start/", headers=bearer(token1)).json()["game_id"]
+    client.post(f"/games/join/?game_id={game_id}", headers=bearer(token2))
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token1}") as websocket1:
+        player1 = receive_until(websocket1, "game_state")["player_id"]
+        with client.websocket_connect(f"/ws/{game_id}?token={token2}") as websocket2:
+            player2 = receive_until(websocket2, "game_state")["player_id"]
+            players = {player1: websocket1, player2: websocket2}
+            for websocket in players.values():
+                websocket.send_json({"action": "randomize_fleet"})
+                receive_until(websocket, "fleet_randomized")
+                websocket.send_json({"action": "ready"})
+            for websocket in players.values():
+                while True:
+                    event = receive_until(websocket, "player_ready")
+                    if event["game_status"] == "in_progress":
+                        break
+            player = players[event["turn"]]
+
+            with client.websocket_connect(f"/ws/{game_id}/spectate") as spectator:
+                state = spectator.receive_json()
+                assert state["action"] == "game_state"
+                assert state["game_status"] == "in_progress"
+                assert ship_cells(state) == 0
+                assert len(manager.spectators[game_id]) == 1
+
+                player.send_json({"action": "make_move", "x": 0, "y": 0})
+                move = receive_until(player, "move_result")
+                watched = spectator.receive_json()
+                assert watched == move
+                assert not any("board" in key for key in watched)
+
+                spectator.send_json({"action": "get_state"})
+                state = spectator.receive_json()
+                assert state["seq"] == move["seq"]
+                assert ship_cells(state) == 0
+
+                spectator.send_json({"action": "make_move", "x": 1, "y": 1})
+                assert spectator.receive_json()["status"] == "error"
@@ -0,0 +1,102 @@
+# tests/test_state_cache.py
+"""Кодирование сообщений один раз: JSON-кодек с orjson и без него, бинарные
+кадры из готовой строки события и снимки состояния до изменения игры."""
+
+import json
+
+import pytest
+
+from app import json_codec
+from app.game_logic.board import generate_bitboard, place_ships_auto
+from app.game_logic.engine import LiveGame
+from app.websocket_handlers import game_state_payload
+from app.ws_protocol import (FLAG_FINISHED, FLAG_HIT, MOVE_FRAME, MOVE_RESULT_FRAME,
+                             OP_MAKE_MOVE, OP_MOVE_RESULT, OP_RESYNC, RESYNC_FRAME,
+                             decode_frame, encode_frame)
+
+MESSAGE = {
+    "status": "success",
+    "action": "game_state",
+    "seq": 7,
+    "winner": None,
+    "is_my_turn": True,
+    "my_board": [["~", "S"], ["X", "O"]],
+    "username": "игрок",
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_codec, "orjson", None)
+    elif json_codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    return json_codec
+
+
+def test_json_round_trip(codec):
+    encoded = codec.dumps(MESSAGE)
+    assert isinstance(encoded, str)
+    assert " " not in encoded
+    assert codec.loads(encoded) == MESSAGE
+    assert codec.loads(encoded.encode()) == MESSAGE
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads("{not json")
+
+
+def test_frames_round_trip():
+    assert decode_frame(MOVE_FRAME.pack(OP_MAKE_MOVE, 9, 0)) == {
+        "action": "make_move",
+        "x": 9,
+        "y": 0,
+    }
+    assert decode_frame(RESYNC_FRAME.pack(OP_RESYNC, 5, 12)) == {
+        "action": "resync",
+        "since": 12,
+        "epoch": 5,
+    }
+    with pytest.raises(ValueError):
+        decode_frame(b"\x01\x02")
+
+    event = {
+        "status": "success",
+        "action": "move_result",
+        "result": "hit",
+        "game_status": "finished",
+        "winner": 11,
+        "move": {"x": 2, "y": 8},
+        "player": 11,
+        "turn": None,
+        "seq": 40,
+        "epoch": 3,
+    }
+    encoded = json_codec.dumps(event)
+    frame = encode_frame(encoded)
+    assert encode_frame(encoded) is frame
+    assert MOVE_RESULT_FRAME.unpack(frame) == (
+        OP_MOVE_RESULT, 3, 40, 2, 8, FLAG_HIT | FLAG_FINISHED, 11, 0
+    )
+    # Снимки состояния уходят JSON-текстом
+    assert encode_frame(json_codec.dumps(MESSAGE)) == json_codec.dumps(MESSAGE)
+
+
+def test_snapshot_is_encoded_once_per_change():
+    game = LiveGame(
+        game_id=1,
+        player1_id=1,
+        player2_id=2,
+        status="in_progress",
+        turn=1,
+        winner_id=None,
+        board_player1=place_ships_auto(generate_bitboard()),
+        board_player2=place_ships_auto(generate_bitboard()),
+        version=1,
+    )
+    first = game_state_payload(game, 1)
+    assert game_state_payload(game, 1) is first
+    assert game_state_payload(game, 2) != first
+
+    game.make_move(1, 0, 0)
+    changed = game_state_payload(game, 1)
+    assert changed is not first
+    assert json_codec.loads(changed)["opponent_board"][0][0] in ("X", "O")
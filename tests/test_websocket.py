@@ -0,0 +1,58 @@
+# tests/test_websocket.py
+"""Игровые WebSocket-соединения: проверка игрока и ресурсы, которые держит
+открытый сокет."""
+
+from contextlib import ExitStack
+
+import pytest
+from conftest import bearer, receive_until
+from starlette.websockets import WebSocketDisconnect
+
+from app import websocket_handlers
+from app.db.session import async_engine
+from app.game_logic.engine import game_engine
+
+# Больше, чем пул асинхронного движка (5 + 10 переполнения)
+SOCKETS = 20
+
+
+def test_open_sockets_hold_no_db_connections(client, register):
+    token = register("alice")
+    game_ids = [
+        client.post("/games/start/", headers=bearer(token)).json()["game_id"]
+        for _ in range(SOCKETS)
+    ]
+
+    with ExitStack() as stack:
+        for game_id in game_ids:
+            websocket = stack.enter_context(
+                client.websocket_connect(f"/ws/{game_id}?token={token}")
+            )
+            assert receive_until(websocket, "game_state")["game_id"] == game_id
+        assert async_engine.pool.checkedout() == 0
+
+
+def test_only_participants_claim_game(client, register, monkeypatch):
+    claimed = []
+    claim_game = websocket_handlers.claim_game
+
+    async def recording_claim(game_id, stale=None):
+        claimed.append(game_id)
+        return await claim_game(game_id, stale)
+
+    monkeypatch.setattr(websocket_handlers, "claim_game", recording_claim)
+    token = register("alice")
+    stranger = register("mallory")
+    game_id = client.post("/games/start/", headers=bearer(token)).json()["game_id"]
+    game_engine.games.pop(game_id, None)
+
+    for query in ("token=broken", f"token={stranger}"):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(f"/ws/{game_id}?{query}") as websocket:
+                websocket.receive_json()
+    assert claimed == []
+    assert game_engine.get(game_id) is None
+
+    with client.websocket_connect(f"/ws/{game_id}?token={token}") as websocket:
+        assert receive_until(websocket, "game_state")["game_id"] == game_id
+    assert claimed == [game_id]
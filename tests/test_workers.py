@@ -0,0 +1,194 @@
+# tests/test_workers.py
+"""Несколько воркеров через Redis (fakeredis): игрой владеет один воркер,
+а действия игроков, подключённых к другим воркерам, пересылаются ему."""
+
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app import broadcast, websocket_handlers
+from app.broadcast import RedisBroadcast
+from app.game_logic.engine import game_engine
+from app.game_logic.lobby import waiting_games
+from app.json_codec import loads
+from app.websocket_handlers import (ConnectionManager, PlayerRoute, claim_game,
+                                    game_actors, lobby, player_sessions)
+
+REDIS_URL = "redis://fake"
+
+
+class RecordingManager(ConnectionManager):
+    """Воркер без сокетов: сообщения его игрокам записываются."""
+
+    def __init__(self, players):
+        super().__init__(RedisBroadcast(REDIS_URL))
+        self.players = players
+        self.received = {user_id: [] for user_id in players}
+
+    def _send_local_user(self, message, game_id, user_id):
+        self.received[user_id].append(loads(message))
+        return True
+
+    def _broadcast_local(self, message, game_id, exclude_user=None):
+        for user_id in self.players:
+            if user_id != exclude_user:
+                self.received[user_id].append(loads(message))
+
+    def actions(self, user_id):
+        return [message.get("action") for message in self.received[user_id]]
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Общий сервер fakeredis для всех воркеров теста."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        broadcast.redis,
+        "from_url",
+        lambda url, **kwargs: fakeredis.aioredis.FakeRedis(server=server, **kwargs),
+    )
+    return server
+
+
+@pytest.fixture
+def owner(redis_server, monkeypatch):
+    """Воркер приложения (модульный manager) с рассылкой через Redis."""
+    manager = ConnectionManager(RedisBroadcast(REDIS_URL))
+    manager.remote_handlers = websocket_handlers.manager.remote_handlers
+    monkeypatch.setattr(websocket_handlers, "manager", manager)
+    return manager
+
+
+async def until(condition, timeout: float = 5):
+    """Ожидание доставки сообщений через pub/sub."""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition was not met in time")
+
+
+async def shutdown(*managers):
+    await game_actors.stop_all()
+    player_sessions.stop()
+    for manager in managers:
+        await manager.stop()
+
+
+def test_one_owner_per_game(redis_server):
+    async def scenario():
+        first, second = RedisBroadcast(REDIS_URL), RedisBroadcast(REDIS_URL)
+        for backend in (first, second):
+            await backend.start(lambda envelope: asyncio.sleep(0))
+        try:
+            assert await first.claim(1, 60) == first.origin
+            assert await second.claim(1, 60) == first.origin
+            # Чужое владение не освобождается и не продлевается
+            await second.release(1)
+            await second.refresh([1], 60)
+            assert await second.owner(1) == first.origin
+            # Владение воркера, который не принял сообщение, перехватывается
+            assert await second.claim(1, 60, stale=first.origin) == second.origin
+            await second.release(1)
+            assert await first.owner(1) is None
+        finally:
+            await first.stop()
+            await second.stop()
+
+    asyncio.run(scenario())
+
+
+def test_actions_are_routed_to_owner(owner, players, create_games):
+    """Оба игрока подключены ко второму воркеру, игра живёт только у владельца."""
+    (game_id,) = create_games()
+    other = RecordingManager(players)
+
+    async def send(user_id, message, kind="action"):
+        envelope = {"kind": kind, "game_id": game_id, "user_id": user_id, "message": message}
+        assert await other.backend.send(owner.backend.origin, envelope)
+
+    async def scenario():
+        await owner.start()
+        await other.start()
+        try:
+            assert await claim_game(game_id) is None
+            assert await other.backend.claim(game_id, 60) == owner.backend.origin
+
+            for user_id in players:
+                for action in ("get_state", "randomize_fleet", "ready"):
+                    await send(user_id, {"action": action})
+            await until(lambda: other.actions(players[1]).count("player_ready") == 2)
+
+            live = game_engine.get(game_id)
+            assert live.status == "in_progress"
+            assert set(owner.remote_players[game_id]) == set(players)
+            for user_id in players:
+                # Личные ответы владельца дошли до игрока через его воркер
+                assert {"game_state", "fleet_randomized"} <= set(other.actions(user_id))
+                assert other.received[user_id][-1]["game_status"] == "in_progress"
+
+            for user_id in players:
+                await send(user_id, None, kind="leave")
+            await until(lambda: game_id not in owner.remote_players)
+            assert player_sessions.pending(game_id)
+        finally:
+            await shutdown(owner, other)
+
+    asyncio.run(scenario())
+
+
+def test_silent_owner_is_replaced(owner, players, create_games):
+    """Действие, которое никто не принял, забирает игру себе."""
+    (game_id,) = create_games()
+
+    async def scenario():
+        await owner.start()
+        try:
+            await owner.backend.redis.set(owner.backend.owner_key(game_id), "gone")
+            route = PlayerRoute(None, game_id, players[0], owner="gone")
+            assert await route.submit({"action": "get_state"})
+            assert route.owner is None
+            assert game_id in game_actors.actors
+            assert await owner.backend.owner(game_id) == owner.backend.origin
+        finally:
+            await shutdown(owner)
+
+    asyncio.run(scenario())
+
+
+def test_lobby_is_shared(owner, monkeypatch):
+    """Изменения лобби одного воркера видны в индексе другого."""
+    monkeypatch.setattr(waiting_games, "listeners", [])
+    monkeypatch.setattr(waiting_games, "games", {})
+    monkeypatch.setattr(waiting_games, "created", {})
+    for attribute in ("loop", "outbox", "publisher"):
+        monkeypatch.setattr(lobby, attribute, getattr(lobby, attribute))
+    other = ConnectionManager(RedisBroadcast(REDIS_URL))
+    events = []
+    other.on_remote("lobby", lambda envelope: asyncio.sleep(0, events.append(envelope["event"])))
+
+    async def scenario():
+        await owner.start()
+        await other.start()
+        lobby.start()
+        try:
+            # Игра, созданная на этом воркере, публикуется остальным
+            waiting_games.add(SimpleNamespace(id=1, status="waiting", player1_id=7))
+            waiting_games.remove(1)
+            await until(lambda: len(events) == 2)
+            assert [event["action"] for event in events] == ["game_created", "game_removed"]
+
+            # Игра другого воркера попадает в индекс, но не истекает здесь
+            created = {"action": "game_created", "game": {"id": 2, "status": "waiting", "player1_id": 8}}
+            await other.backend.announce({"kind": "lobby", "event": created})
+            await until(lambda: len(waiting_games) == 1)
+            assert waiting_games.page() == [created["game"]]
+            assert waiting_games.stale() == []
+            assert len(events) == 2
+        finally:
+            await lobby.stop()
+            await shutdown(owner, other)
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+# tests/test_ws_protocol.py
+"""Бинарный подпротокол battleship.bin: выбор при подключении и кадры ходов."""
+
+from conftest import bearer, receive_until
+
+from app.ws_protocol import (BINARY_PROTOCOL, FLAG_HIT, MOVE_FRAME,
+                             MOVE_RESULT_FRAME, OP_MAKE_MOVE, OP_MOVE_RESULT)
+
+
+def receive_frame(websocket) -> bytes:
+    """Следующий бинарный кадр; JSON-сообщения между ними пропускаются."""
+    while True:
+        message = websocket.receive()
+        if message.get("bytes") is not None:
+            return message["bytes"]
+
+
+def test_move_result_frame(client, register):
+    token1, token2 = register("alice"), register("bob")
+    game_id = client.post("/games/start/", headers=bearer(token1)).json()["game_id"]
+    client.post(f"/games/join/?game_id={game_id}", headers=bearer(token2))
+
+    url = f"/ws/{game_id}?token={token1}"
+    with client.websocket_connect(url, subprotocols=[BINARY_PROTOCOL]) as websocket1:
+        assert websocket1.accepted_subprotocol == BINARY_PROTOCOL
+        with client.websocket_connect(f"/ws/{game_id}?token={token2}") as websocket2:
+            assert websocket2.accepted_subprotocol is None
+            for websocket in (websocket1, websocket2):
+                websocket.send_json({"action": "randomize_fleet"})
+                receive_until(websocket, "fleet_randomized")
+                websocket.send_json({"action": "ready"})
+            while receive_until(websocket2, "player_ready")["game_status"] != "in_progress":
+                pass
+
+            # Ход первого игрока бинарным кадром; ему приходит кадр,
+            # сопернику — тот же результат JSON-текстом
+            websocket1.send_bytes(MOVE_FRAME.pack(OP_MAKE_MOVE, 3, 4))
+            frame = receive_frame(websocket1)
+            event = receive_until(websocket2, "move_result")
+
+    opcode, epoch, seq, x, y, flags, player, turn = MOVE_RESULT_FRAME.unpack(frame)
+    assert (opcode, x, y) == (OP_MOVE_RESULT, 3, 4)
+    assert (epoch, seq) == (event["epoch"], event["seq"])
+    assert (player, turn) == (event["player"], event["turn"])
+    assert bool(flags & FLAG_HIT) == (event["result"] == "hit")